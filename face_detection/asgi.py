@@ -11,15 +11,31 @@ import os
 
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
+from django.apps import apps
 from django.core.asgi import get_asgi_application
 
 from .routing import websocket_urlpatterns
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "face_detection.settings")
 
+django_asgi_app = get_asgi_application()
+
+from face_detector.executor import warm_up_executor  # noqa: E402
+from face_detector.registry import warm_up  # noqa: E402
+from face_detector.serving import PREFORK_ENV  # noqa: E402
+
+warm_up()
+# Workers forked by `manage.py serve` start their executor after the fork
+if PREFORK_ENV not in os.environ:
+    warm_up_executor()
+
+websocket_app = URLRouter(websocket_urlpatterns)
+if apps.is_installed("django.contrib.auth"):
+    websocket_app = AuthMiddlewareStack(websocket_app)
+
 application = ProtocolTypeRouter(
     {
-        "http": get_asgi_application(),
-        "websocket": AuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+        "http": django_asgi_app,
+        "websocket": websocket_app,
     }
 )
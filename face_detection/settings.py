@@ -73,14 +73,236 @@ TEMPLATES = [
 WSGI_APPLICATION = "face_detection.wsgi.application"
 ASGI_APPLICATION = "face_detection.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
+# Channel layers notifications can go through, picked with the
+# FACE_DETECTION_CHANNEL_LAYER environment variable. "redis" stores a copy of
+# every group message for each subscribed connection. "pubsub" publishes a group
+# message once and each server process hands it to its own connections, which
+# scales to many idle dashboard sockets. "memory" needs no Redis but only
+# reaches connections of the same process: run `manage.py serve --workers 1`
+# with the "local" jobs backend. Compare them with `manage.py fanout_benchmark`.
+CHANNEL_LAYER_BACKENDS = {
+    "redis": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
             "hosts": [("redis", 6379)],
         },
     },
+    "pubsub": {
+        "BACKEND": "channels_redis.pubsub.RedisPubSubChannelLayer",
+        "CONFIG": {
+            "hosts": [("redis", 6379)],
+        },
+    },
+    "memory": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
 }
+
+CHANNEL_LAYERS = {
+    "default": CHANNEL_LAYER_BACKENDS[
+        os.environ.get("FACE_DETECTION_CHANNEL_LAYER", "redis")
+    ],
+}
+
+# Face detection
+# Number of CascadeClassifier instances kept per cascade in each worker process,
+# None sizes the pool to the number of CPUs.
+FACE_DETECTOR_POOL_SIZE = None
+# Load the cascades and fill the pools when the ASGI/WSGI application starts.
+FACE_DETECTOR_WARM_UP = True
+# Serve uploads with the native async view on the ASGI event loop instead of
+# the sync view, which Django would run in a thread.
+FACE_DETECTION_ASYNC_VIEWS = True
+# Where upload_image runs detection. "process" uses a pool of worker processes
+# with preloaded cascades, "thread" a thread pool and "inline" the request
+# thread. WORKERS defaults to the number of CPUs and each worker lets OpenCV use
+# OPENCV_THREADS threads. Once QUEUE_SIZE uploads are queued or running, new
+# ones are rejected with 503 and a Retry-After of RETRY_AFTER seconds.
+FACE_DETECTION_EXECUTOR = {
+    "KIND": "process",
+    "WORKERS": None,
+    "QUEUE_SIZE": 64,
+    "OPENCV_THREADS": 1,
+    "RETRY_AFTER": 1,
+}
+# Detection profiles trading recall against throughput, selectable per upload
+# with the "profile" field. Large images are downscaled so their longest side is
+# at most "max_dimension" pixels, or so that a face covering "min_face_fraction"
+# of the shorter side is "min_size" pixels. "cascade" is a file name from
+# cv2.data.haarcascades, "scale_factor" and "min_neighbors" are passed to
+# detectMultiScale. Boxes are always reported in original image coordinates.
+# Compare profiles on labelled images with `manage.py evaluate_profiles`.
+FACE_DETECTION_PROFILES = {
+    "default": {"min_size": 30},
+    "fast": {
+        "min_size": 30,
+        "max_dimension": 1280,
+        "min_face_fraction": 0.05,
+        "scale_factor": 1.2,
+        "min_neighbors": 4,
+    },
+    "balanced": {
+        "min_size": 30,
+        "max_dimension": 2048,
+        "cascade": "haarcascade_frontalface_alt2.xml",
+    },
+    "accurate": {
+        "min_size": 24,
+        "cascade": "haarcascade_frontalface_alt.xml",
+        "scale_factor": 1.05,
+        "min_neighbors": 6,
+    },
+}
+FACE_DETECTION_DEFAULT_PROFILE = "default"
+# When enabled, working images of at least MIN_PIXELS are split into TILE_SIZE
+# square tiles overlapping by OVERLAP pixels and the tiles are detected on
+# WORKERS threads. Faces wider than OVERLAP can be cut by every tile, they are
+# found by an extra pass over the whole image downscaled to TILE_SIZE, but
+# parts of them may still be reported as faces, so tiling is off by default.
+# Faces found twice are merged when their intersection covers NMS_THRESHOLD of
+# the smaller box. With the process executor every worker process has its own
+# WORKERS threads.
+FACE_DETECTION_TILING = {
+    "ENABLED": False,
+    "MIN_PIXELS": 16_000_000,
+    "TILE_SIZE": 2048,
+    "OVERLAP": 256,
+    "WORKERS": 4,
+    "NMS_THRESHOLD": 0.5,
+}
+# Keep a copy of every original upload under MEDIA_ROOT/uploaded. The copy is
+# written by a background thread, detection decodes the upload from memory.
+FACE_DETECTION_SAVE_UPLOADS = True
+# Limits checked before an image upload is read whole or decoded: its size in
+# bytes, and its width times height as declared in the image header, which
+# refuses decompression bombs. Only the first SNIFF_BYTES are used to detect
+# the file type. Uploads over FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to a
+# temporary file while the request is parsed instead of being held in memory.
+FACE_DETECTION_UPLOAD_LIMITS = {
+    "MAX_BYTES": 25 * 1024 * 1024,
+    "MAX_PIXELS": 40_000_000,
+    "SNIFF_BYTES": 2048,
+}
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440
+# Limits of the batch upload endpoint: number of images per request and size
+# of a single image, also applied to members of zip/tar archives.
+FACE_DETECTION_BATCH_MAX_ITEMS = 1000
+FACE_DETECTION_BATCH_MAX_MEMBER_BYTES = 50 * 1024 * 1024
+DATA_UPLOAD_MAX_NUMBER_FILES = FACE_DETECTION_BATCH_MAX_ITEMS
+# Uploads sent with async=1 are answered with 202 and a job id and processed by
+# a worker pool. "local" runs the workers in the server process, "redis" queues
+# jobs in Redis for separate `manage.py detection_worker` processes. The local
+# backend queues at most QUEUE_SIZE jobs, further async uploads are answered
+# with 503 and a Retry-After of RETRY_AFTER seconds. Jobs detect faces on the
+# FACE_DETECTION_EXECUTOR like uploads, waiting for a free slot, so WORKERS
+# jobs add no detection threads of their own.
+FACE_DETECTION_JOBS = {
+    "BACKEND": "local",
+    "WORKERS": 2,
+    "QUEUE_SIZE": 100,
+    "RETRY_AFTER": 5,
+    "REDIS_URL": "redis://redis:6379/1",
+    "RESULT_TTL": 3600,
+}
+# Video uploads are processed as jobs: full detection runs every DETECT_EVERY
+# frames (overridable per request) and faces are tracked with optical flow in
+# between. Progress is pushed to WebSocket clients every PROGRESS_EVERY frames.
+FACE_DETECTION_VIDEO = {
+    "DETECT_EVERY": 10,
+    "PROGRESS_EVERY": 50,
+    "MAX_UPLOAD_BYTES": 500 * 1024 * 1024,
+}
+# Cache of detection results keyed by a hash of the uploaded bytes, so repeated
+# uploads of the same image skip decoding, detection and encoding. Entries are
+# kept in a per-process LRU of MAX_ENTRIES for TTL seconds and, when REDIS_URL
+# is set, shared between processes through Redis.
+FACE_DETECTION_RESULT_CACHE = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 10000,
+    "TTL": 24 * 3600,
+    "REDIS_URL": None,
+}
+# Every served image result is stored as a DetectionRecord, listed newest first
+# at /detections with cursor pagination. Records are buffered and inserted
+# BATCH_SIZE at a time at least every FLUSH_INTERVAL seconds, beyond MAX_PENDING
+# buffered records new ones are dropped. PAGE_SIZE is the default page length
+# and MAX_PAGE_SIZE the longest page a client may ask for.
+FACE_DETECTION_HISTORY = {
+    "ENABLED": True,
+    "BATCH_SIZE": 500,
+    "FLUSH_INTERVAL": 1.0,
+    "MAX_PENDING": 50_000,
+    "PAGE_SIZE": 50,
+    "MAX_PAGE_SIZE": 500,
+}
+# Default encoding of annotated images, uploads may override it with the
+# "format", "quality" and "max_dimension" fields or ask for "output=boxes" only.
+# QUALITY None keeps the OpenCV default, MAX_DIMENSION None keeps the size.
+FACE_DETECTION_OUTPUT = {
+    "FORMAT": "jpeg",
+    "QUALITY": None,
+    "MAX_DIMENSION": None,
+}
+# Render annotated images on their first download instead of at upload time.
+# Rendered images are kept in an LRU cache of CACHE_BYTES per process and, with
+# PERSIST, also written to MEDIA_ROOT/processed. Lazy rendering keeps the
+# original upload regardless of FACE_DETECTION_SAVE_UPLOADS, it is rendered from it.
+# The original and the render record are written in the background.
+FACE_DETECTION_RENDER = {
+    "LAZY": True,
+    "CACHE_BYTES": 64 * 1024 * 1024,
+    "PERSIST": False,
+}
+# Per-stage timings and counters exposed at /metrics. With several server
+# processes, set DIRECTORY to a path they share: each process writes its
+# metrics there every FLUSH_INTERVAL seconds and /metrics adds them up.
+# Without DIRECTORY, the "process" executor gets a private temporary one so
+# classifier pool counters of its workers are exported too. Counters start
+# at zero with each process: the files of processes that exited are removed,
+# so totals drop after a restart, which Prometheus rate() treats as a reset.
+FACE_DETECTION_METRICS = {
+    "ENABLED": True,
+    "DIRECTORY": None,
+    "FLUSH_INTERVAL": 5,
+}
+# Capture cProfile profiles of image uploads that carry HEADER (with TOKEN as
+# its value, or from a loopback address when TOKEN is None) or are sampled at
+# SAMPLE_RATE. One request is profiled at a time. Profiles are written to
+# DIRECTORY, keeping the latest MAX_PROFILES, see "manage.py profiles".
+FACE_DETECTION_PROFILING = {
+    "ENABLED": False,
+    "HEADER": "X-Face-Detection-Profile",
+    "TOKEN": None,
+    "SAMPLE_RATE": 0.0,
+    "DIRECTORY": os.path.join(BASE_DIR, "profiles"),
+    "MAX_PROFILES": 100,
+}
+# Retention of MEDIA_ROOT/uploaded and MEDIA_ROOT/processed. Files are spread
+# over SHARD_DEPTH levels of 256 hashed subdirectories each. `manage.py
+# sweep_media`, run from cron or with --interval, deletes files older than TTL
+# seconds, then the oldest files until a directory is under MAX_BYTES, deleting
+# BATCH_SIZE files at a time with BATCH_PAUSE seconds in between. None disables
+# a limit. Empty shard directories are removed once unmodified for PRUNE_GRACE
+# seconds, so one a writer has just created is left alone.
+FACE_DETECTION_RETENTION = {
+    "SHARD_DEPTH": 2,
+    "BATCH_SIZE": 500,
+    "BATCH_PAUSE": 0.05,
+    "PRUNE_GRACE": 300,
+    "DIRECTORIES": {
+        "uploaded": {"TTL": 7 * 24 * 3600, "MAX_BYTES": 20 * 1024**3},
+        "processed": {"TTL": 24 * 3600, "MAX_BYTES": 10 * 1024**3},
+    },
+}
+# Bundle broadcasts reaching a WebSocket client within this many milliseconds
+# into one "notifications_batch" message, 0 sends every broadcast on its own.
+FACE_DETECTION_NOTIFY_COALESCE_MS = 0
+# Face count thresholds with their own channel layer group, clients subscribing
+# to "min_faces" only receive uploads from their bucket upwards.
+FACE_DETECTION_MIN_FACES_GROUPS = (1, 2, 5, 10)
+# Threads used for work moved off the response path, such as saving uploads.
+FACE_DETECTION_BACKGROUND_WORKERS = 2
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
@@ -0,0 +1,83 @@
+import os
+import tempfile
+
+from .settings import *
+
+# Settings for `manage.py serve`, the pre-forking production server. Only the
+# API is served: the admin, sessions, auth and messages apps and their
+# middleware are left out, so requests skip their session and user lookups.
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", SECRET_KEY)
+
+ALLOWED_HOSTS = os.environ.get("DJANGO_ALLOWED_HOSTS", "*").split(",")
+
+# "daphne" is only needed for runserver. Its app imports the Twisted reactor,
+# which must not happen before serve forks its workers.
+INSTALLED_APPS = [
+    "face_detector",
+    "django.contrib.contenttypes",
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+            ],
+        },
+    },
+]
+
+AUTH_PASSWORD_VALIDATORS = []
+
+# Workers write the detection history concurrently, with WAL readers do not
+# wait for writers and writers take the lock up front instead of on upgrade.
+DATABASES = {
+    "default": {
+        **DATABASES["default"],
+        "OPTIONS": {
+            "init_command": "PRAGMA journal_mode=WAL;",
+            "transaction_mode": "IMMEDIATE",
+        },
+    }
+}
+
+# Every serve worker is a process of its own, detection runs on a few threads
+# per worker instead of a process pool per worker.
+FACE_DETECTION_EXECUTOR = {
+    **FACE_DETECTION_EXECUTOR,
+    "KIND": "thread",
+    "WORKERS": 2,
+}
+
+# Job state must be visible to every worker and survive worker restarts, so
+# async uploads and videos are queued in Redis and run by separate
+# `manage.py detection_worker` processes.
+FACE_DETECTION_JOBS = {
+    **FACE_DETECTION_JOBS,
+    "BACKEND": "redis",
+    "REDIS_URL": os.environ.get(
+        "FACE_DETECTION_JOBS_REDIS_URL", FACE_DETECTION_JOBS["REDIS_URL"]
+    ),
+}
+
+# Add up the metrics of all workers at /metrics.
+FACE_DETECTION_METRICS = {
+    **FACE_DETECTION_METRICS,
+    "DIRECTORY": os.environ.get(
+        "FACE_DETECTION_METRICS_DIR",
+        os.path.join(tempfile.gettempdir(), "face-detection-metrics"),
+    ),
+}
@@ -15,9 +15,17 @@ CHANNEL_LAYERS = {
     },
 }
 
+FACE_DETECTION_EXECUTOR = {
+    **FACE_DETECTION_EXECUTOR,
+    "KIND": "thread",
+    "WORKERS": 2,
+}
 
 MEDIA_ROOT = tempfile.mkdtemp()
 
+# The flushing thread would write outside of the test transactions
+FACE_DETECTION_HISTORY = {**FACE_DETECTION_HISTORY, "ENABLED": False}
+
 THROTTLE_RATES = {
     "user": None,
     "anon": None,
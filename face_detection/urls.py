@@ -15,10 +15,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.contrib import admin
+from django.apps import apps
 from django.urls import include, path
 
 urlpatterns = [
     path("", include("face_detector.urls")),
-    path("admin/", admin.site.urls),
 ]
+
+# The production settings leave the admin out
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns.append(path("admin/", admin.site.urls))
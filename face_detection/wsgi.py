@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "face_detection.settings")
 
 application = get_wsgi_application()
+
+from face_detector.executor import warm_up_executor  # noqa: E402
+from face_detector.registry import warm_up  # noqa: E402
+
+warm_up()
+warm_up_executor()
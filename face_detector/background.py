@@ -0,0 +1,59 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(
+                        settings, "FACE_DETECTION_BACKGROUND_WORKERS", 2
+                    ),
+                    thread_name_prefix="face-detection-background",
+                )
+    return _executor
+
+
+def _log_failure(future: Future) -> None:
+    exception = future.exception()
+    if exception is not None:
+        logger.error("Background task failed", exc_info=exception)
+
+
+def submit(fn: Callable, *args, **kwargs) -> Future:
+    """
+    Run a function off the request path in a small shared thread pool.
+
+    Failures are logged rather than raised, as nobody waits for these tasks.
+
+    Args:
+        fn: callable to run
+        *args: positional arguments passed to ``fn``
+        **kwargs: keyword arguments passed to ``fn``
+
+    Returns:
+        Future of the submitted task
+    """
+    future = _get_executor().submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the background pool, waiting for queued tasks by default."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
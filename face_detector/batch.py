@@ -0,0 +1,273 @@
+import functools
+import io
+import os
+import tarfile
+import uuid
+import zipfile
+from collections import deque
+from typing import IO, Callable, Iterable, Iterator, Tuple
+
+from django.conf import settings
+
+from . import background, history
+from .cache import content_hash, content_key, get_result_cache
+from .detector import FaceDetector, OutputOptions, default_output
+from .executor import ExecutorBusy, detect_bytes, get_executor
+from .metrics import inc, record_timings
+from .rendering import defer_render, renders_lazily
+from .storage import save_upload
+from .validation import UploadRejected, check_pixels, detect_content_type
+
+BatchItem = Tuple[str, bytes]
+
+
+class BatchError(ValueError):
+    """
+    Raised when a batch as a whole cannot be processed.
+
+    Attributes:
+        results: results of the items processed before the batch was stopped
+    """
+
+    def __init__(self, message: str, results: list[dict] | None = None):
+        super().__init__(message)
+        self.results = results or []
+
+
+def max_items() -> int:
+    return getattr(settings, "FACE_DETECTION_BATCH_MAX_ITEMS", 1000)
+
+
+def max_member_bytes() -> int:
+    return getattr(settings, "FACE_DETECTION_BATCH_MAX_MEMBER_BYTES", 50 * 1024 * 1024)
+
+
+def count_members(archive: IO[bytes]) -> int | None:
+    """
+    Count the files of a zip archive from its central directory.
+
+    Returns:
+        Number of files, ``None`` for tar archives, which are only counted
+        while they are streamed
+    """
+    if not zipfile.is_zipfile(archive):
+        return None
+    archive.seek(0)
+    with zipfile.ZipFile(archive) as zip_file:
+        return sum(not info.is_dir() for info in zip_file.infolist())
+
+
+def iter_archive(archive: IO[bytes]) -> Iterator[BatchItem]:
+    """
+    Yield the regular files of a zip or tar archive one at a time.
+
+    Members are read lazily, so only the members currently being processed
+    are held in memory. Members larger than
+    ``FACE_DETECTION_BATCH_MAX_MEMBER_BYTES`` yield empty content and are
+    rejected during validation.
+
+    Args:
+        archive: seekable file object with a zip or (optionally compressed) tar archive
+
+    Yields:
+        Tuples of member name and member content
+
+    Raises:
+        BatchError: if the file is neither a zip nor a tar archive
+    """
+    limit = max_member_bytes()
+    if zipfile.is_zipfile(archive):
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    continue
+                if info.file_size > limit:
+                    yield info.filename, b""
+                    continue
+                with zip_file.open(info) as member:
+                    yield info.filename, member.read(limit + 1)
+        return
+
+    archive.seek(0)
+    try:
+        tar_file = tarfile.open(fileobj=archive, mode="r|*")
+    except tarfile.TarError as e:
+        raise BatchError("Archive must be a zip or tar file") from e
+    with tar_file:
+        for member in tar_file:
+            if not member.isfile():
+                continue
+            if member.size > limit:
+                yield member.name, b""
+                continue
+            member_file = tar_file.extractfile(member)
+            yield member.name, member_file.read(limit + 1)
+
+
+def start_item(
+    detector: FaceDetector,
+    name: str,
+    content: bytes,
+    media_url: str,
+    output: OutputOptions | None = None,
+    source: str | None = None,
+) -> Callable[[], dict]:
+    """
+    Validate a single batch member and submit it to the detection executor.
+
+    Validation and the result cache lookup run in the calling thread,
+    detection goes through ``get_executor`` like single uploads, so batches
+    share its queue bound.
+
+    Args:
+        detector: detector whose profile is used for the item
+        name: original file name of the item
+        content: raw bytes of the item
+        media_url: absolute URL prefix of the media directory
+        output: how the result is produced, defaults to ``FACE_DETECTION_OUTPUT``
+        source: source tag of the batch, stored in the detection history
+
+    Returns:
+        Callable waiting for the detection and returning the per-item result,
+        ``success`` tells whether the item was processed
+
+    Raises:
+        ExecutorBusy: if the detection queue is full
+    """
+
+    def failed(error: str) -> Callable[[], dict]:
+        return lambda: {"name": name, "success": False, "error": error}
+
+    if not content or len(content) > max_member_bytes():
+        return failed("File is empty or too large")
+
+    # Counted once the item is settled, an item is started again when the
+    # queue was full
+    count_bytes = functools.partial(
+        inc, "face_detection_upload_bytes_total", len(content)
+    )
+    content_type = detect_content_type(content)
+    if not content_type.startswith("image/"):
+        count_bytes()
+        return failed(f"File is not an image. Detected type: {content_type}")
+    try:
+        check_pixels(io.BytesIO(content))
+    except UploadRejected as e:
+        count_bytes()
+        return failed(str(e))
+
+    output = output or default_output()
+    profile = detector.profile.name
+    result_cache = get_result_cache()
+    digest = content_hash(content)
+    cache_key = content_key(content, profile, output.key, digest=digest)
+    cached = result_cache.get(cache_key) if result_cache else None
+    if cached is not None:
+        count_bytes()
+        return lambda: finish_item(name, cached, digest, profile, media_url, source)
+
+    unique_id = str(uuid.uuid4())
+    upload_name = f"upload_{unique_id}{os.path.splitext(name)[1]}"
+    lazy = renders_lazily(output)
+    future = get_executor().submit(
+        detect_bytes,
+        content,
+        unique_id,
+        profile=profile,
+        output=OutputOptions(annotate=False) if lazy else output,
+    )
+    count_bytes()
+    if not lazy and getattr(settings, "FACE_DETECTION_SAVE_UPLOADS", True):
+        background.submit(save_upload, upload_name, content)
+
+    def wait() -> dict:
+        try:
+            detection = future.result()
+        except Exception as e:
+            return {"name": name, "success": False, "error": str(e)}
+        if lazy:
+            detection = defer_render(
+                upload_name, unique_id, detection, output, content=content
+            )
+        record_timings(detection.timings)
+        inc("face_detection_faces_total", detection.faces_detected)
+        result = detection.as_dict()
+        if result_cache:
+            result_cache.set(cache_key, result)
+        return finish_item(
+            name, result, digest, profile, media_url, source, detection.timings
+        )
+
+    return wait
+
+
+def finish_item(
+    name: str,
+    result: dict,
+    digest: str,
+    profile: str,
+    media_url: str,
+    source: str | None = None,
+    timings: dict | None = None,
+) -> dict:
+    """Record a served batch result in the history and build its item result."""
+    history.record(result, digest, profile, source, timings or {})
+
+    item = {
+        "name": name,
+        "success": True,
+        "faces_detected": len(result["boxes"]),
+        "boxes": result["boxes"],
+    }
+    if result["processed_path"] is not None:
+        item["image_url"] = f"{media_url}{result['processed_path']}"
+    return item
+
+
+def process_batch(
+    items: Iterable[BatchItem],
+    start: Callable[[str, bytes], Callable[[], dict]],
+    window: int,
+) -> list[dict]:
+    """
+    Process batch items while keeping only a bounded window in flight.
+
+    Items are pulled from ``items`` lazily, so an archive is never fully
+    extracted into memory. When the detection queue is full, the batch
+    waits for its own oldest item before submitting more. Results keep the
+    order of the input.
+
+    Args:
+        items: iterable of name and content tuples
+        start: callable submitting a single item, see ``start_item``
+        window: number of items submitted but not finished at once
+
+    Returns:
+        List with one result per item
+
+    Raises:
+        BatchError: if the batch has more items than
+            ``FACE_DETECTION_BATCH_MAX_ITEMS``, with the results so far
+        ExecutorBusy: if the detection queue is full and none of the items
+            of the batch are in flight
+    """
+    limit = max_items()
+    results = []
+    pending = deque()
+    for count, (name, content) in enumerate(items, start=1):
+        if count > limit:
+            results.extend(wait() for wait in pending)
+            raise BatchError(f"Batch exceeds the limit of {limit} images", results)
+        while True:
+            try:
+                pending.append(start(name, content))
+                break
+            except ExecutorBusy:
+                if not pending:
+                    raise
+                results.append(pending.popleft()())
+        if len(pending) >= window:
+            results.append(pending.popleft()())
+    results.extend(wait() for wait in pending)
+    return results
@@ -0,0 +1,328 @@
+import json
+import math
+import os
+import platform
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List
+
+import cv2
+import numpy as np
+from cv2 import INTER_AREA, imencode, imread, resize, typing
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, override_settings
+
+from .detector import decode_image
+
+# Name -> (width, height), from VGA to 24 megapixels
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "12mp": (4000, 3000),
+    "24mp": (6000, 4000),
+}
+FACE_COUNTS = (0, 1, 4, 16)
+STAGES = ("detect_faces", "process_image", "upload_image")
+
+
+@dataclass
+class BenchmarkImage:
+    """
+    Encoded image a benchmark case runs on.
+
+    Attributes:
+        name: name of the image, e.g. ``hd-4faces`` or ``fixture-face1``
+        content: JPEG encoded image
+        width: width of the image
+        height: height of the image
+        faces: number of faces placed in the image, ``None`` for fixtures
+    """
+
+    name: str
+    content: bytes
+    width: int
+    height: int
+    faces: int | None = None
+
+
+def synthetic_image(
+    width: int, height: int, faces: int, face_photo: typing.MatLike, seed: int = 0
+) -> typing.MatLike:
+    """
+    Build a reproducible test image with a given number of faces.
+
+    The background is seeded noise, faces are copies of a portrait photo laid
+    out on a grid, so the same arguments always produce the same pixels.
+
+    Args:
+        width: width of the image
+        height: height of the image
+        faces: number of copies of the portrait to place
+        face_photo: photo with a single face
+        seed: seed of the background noise
+
+    Returns:
+        BGR image
+    """
+    rng = np.random.default_rng(seed)
+    img = rng.integers(96, 160, size=(height, width, 3), dtype=np.uint8)
+    if faces == 0:
+        return img
+
+    columns = math.ceil(math.sqrt(faces))
+    rows = math.ceil(faces / columns)
+    cell_width, cell_height = width // columns, height // rows
+    photo_height, photo_width = face_photo.shape[:2]
+    scale = min(cell_width / photo_width, cell_height / photo_height)
+    photo = resize(
+        face_photo,
+        (int(photo_width * scale), int(photo_height * scale)),
+        interpolation=INTER_AREA,
+    )
+    for index in range(faces):
+        x = (index % columns) * cell_width
+        y = (index // columns) * cell_height
+        img[y : y + photo.shape[0], x : x + photo.shape[1]] = photo
+    return img
+
+
+def benchmark_images(
+    resolutions: List[str], face_counts: List[int], fixtures: List[Path]
+) -> List[BenchmarkImage]:
+    """
+    Build the synthetic images of every resolution and face count, plus the fixtures.
+
+    Args:
+        resolutions: names from ``RESOLUTIONS``
+        face_counts: numbers of faces per synthetic image
+        fixtures: real photos, the first one is also used as the portrait
+            placed in synthetic images
+
+    Returns:
+        Images in a stable order
+    """
+    face_photo = imread(str(fixtures[0]))
+    if face_photo is None:
+        raise ValueError(f"Failed to load fixture {fixtures[0]}")
+
+    images = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for faces in face_counts:
+            img = synthetic_image(width, height, faces, face_photo)
+            images.append(
+                BenchmarkImage(
+                    f"{resolution}-{faces}faces",
+                    imencode(".jpg", img)[1].tobytes(),
+                    width,
+                    height,
+                    faces,
+                )
+            )
+    for fixture in fixtures:
+        content = fixture.read_bytes()
+        height, width = decode_image(memoryview(content)).shape[:2]
+        images.append(BenchmarkImage(f"fixture-{fixture.stem}", content, width, height))
+    return images
+
+
+def summarize(durations: List[float]) -> dict:
+    """
+    Compute throughput and latency percentiles of timed runs.
+
+    Args:
+        durations: wall time of every run in seconds
+
+    Returns:
+        Number of runs, ops/s and p50/p95/p99/mean latency in milliseconds
+    """
+    durations_ms = np.asarray(durations) * 1000
+    p50, p95, p99 = np.percentile(durations_ms, [50, 95, 99])
+    return {
+        "runs": len(durations),
+        "ops_per_sec": round(len(durations) / sum(durations), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(durations_ms.mean()), 3),
+    }
+
+
+def measure(run: Callable[[], object], iterations: int, warmup: int) -> dict:
+    """
+    Time a callable, after a few untimed warm-up calls.
+
+    Args:
+        run: code under test
+        iterations: number of timed calls
+        warmup: number of calls made before timing
+
+    Returns:
+        Summary as returned by ``summarize``
+    """
+    for _ in range(warmup):
+        run()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+@contextmanager
+def isolated_environment() -> Iterator[Path]:
+    """
+    Run the benchmark against a scratch media directory.
+
+    Results and notifications stay in process: the channel layer is in
+    memory, the result cache is off so every upload runs detection,
+    detection runs inline so timings do not depend on the executor queue,
+    and results are not written to the detection history.
+
+    Yields:
+        Path of the scratch media directory
+    """
+    from . import cache, executor, registry, rendering
+
+    media_root = Path(tempfile.mkdtemp(prefix="face-detection-benchmark-"))
+    overrides = override_settings(
+        MEDIA_ROOT=str(media_root),
+        CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+        FACE_DETECTION_RESULT_CACHE={"ENABLED": False},
+        FACE_DETECTION_EXECUTOR={"KIND": "inline"},
+        FACE_DETECTION_SAVE_UPLOADS=False,
+        FACE_DETECTION_HISTORY={"ENABLED": False},
+        ALLOWED_HOSTS=["*"],
+    )
+    resets = (
+        registry.reset,
+        executor.reset_executor,
+        cache.reset_result_cache,
+        rendering.reset_render_cache,
+    )
+    try:
+        with overrides:
+            for reset in resets:
+                reset()
+            yield media_root
+    finally:
+        for reset in resets:
+            reset()
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def run_benchmarks(
+    images: List[BenchmarkImage],
+    stages: List[str],
+    iterations: int,
+    warmup: int = 1,
+    progress: Callable[[str, dict], None] | None = None,
+) -> dict:
+    """
+    Benchmark the detector and the upload pipeline on every image.
+
+    Args:
+        images: images built by ``benchmark_images``
+        stages: names from ``STAGES``
+        iterations: timed runs per case
+        warmup: untimed runs per case
+        progress: callback receiving the name and summary of every finished case
+
+    Returns:
+        Report with the environment and one summary per ``stage/image`` case
+    """
+    from .registry import get_detector
+
+    results = {}
+    with isolated_environment() as media_root:
+        detector = get_detector()
+        client = Client()
+        for image in images:
+            path = media_root / f"{image.name}.jpg"
+            path.write_bytes(image.content)
+            decoded = decode_image(memoryview(image.content))
+            cases = {
+                "detect_faces": lambda: detector.detect_faces(decoded),
+                "process_image": lambda: detector.process_image(
+                    path, str(uuid.uuid4())
+                ),
+                "upload_image": lambda: upload(client, path.name, image.content),
+            }
+            for stage in stages:
+                name = f"{stage}/{image.name}"
+                summary = measure(cases[stage], iterations, warmup)
+                summary["faces_detected"] = len(detector.detect_faces(decoded))
+                results[name] = summary
+                if progress:
+                    progress(name, summary)
+
+    return {"environment": environment(), "results": results}
+
+
+def upload(client: Client, name: str, content: bytes) -> None:
+    """Post an image to the upload endpoint, failing loudly on error responses."""
+    response = client.post("/image", {"image": SimpleUploadedFile(name, content)})
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"Upload failed with {response.status_code}: {response.content!r}"
+        )
+
+
+def environment() -> dict:
+    """Describe the machine and library versions, to tell comparable runs apart."""
+    return {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[dict]:
+    """
+    Compare the median latency of every case with a saved baseline.
+
+    Args:
+        report: report returned by ``run_benchmarks``
+        baseline: earlier report, e.g. loaded from the JSON baseline file
+        tolerance: allowed relative slowdown, e.g. ``0.1`` for 10%
+
+    Returns:
+        One entry per case present in both reports, with the relative change
+        of p50 and whether it is a regression
+    """
+    comparison = []
+    for name, summary in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None or not previous["p50_ms"]:
+            continue
+        change = summary["p50_ms"] / previous["p50_ms"] - 1
+        comparison.append(
+            {
+                "case": name,
+                "baseline_p50_ms": previous["p50_ms"],
+                "p50_ms": summary["p50_ms"],
+                "change": round(change, 4),
+                "regression": change > tolerance,
+            }
+        )
+    return comparison
+
+
+def save_report(report: dict, path: Path) -> None:
+    """Write a report as the JSON baseline later runs are compared against."""
+    path.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+
+def load_report(path: Path) -> dict:
+    """Read a JSON baseline written by ``save_report``."""
+    return json.loads(path.read_text())
@@ -0,0 +1,353 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path, PurePath
+from typing import IO, Callable, Iterable, Iterator, Tuple
+
+from cv2 import imwrite
+
+from .detector import OutputOptions, decode_image, draw_boxes
+from .executor import DetectionExecutor
+from .validation import UploadRejected, check_pixels
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+MANIFEST_FIELDS = (
+    "path",
+    "success",
+    "faces_detected",
+    "width",
+    "height",
+    "boxes",
+    "output",
+    "error",
+)
+
+# Relative name of a file in the manifest and its path on disk
+BulkFile = Tuple[str, Path]
+
+
+def iter_directory(root: Path) -> Iterator[BulkFile]:
+    """
+    Walk a directory tree for images, in a stable order.
+
+    Directories are listed one at a time, so trees with millions of files are
+    never listed in memory as a whole.
+
+    Yields:
+        Name relative to ``root`` and path of every image file
+    """
+    for current, directories, files in os.walk(root):
+        directories.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                path = Path(current) / name
+                yield str(path.relative_to(root)), path
+
+
+def iter_file_list(file_list: IO[str]) -> Iterator[BulkFile]:
+    """
+    Read image paths from a text file with one path per line.
+
+    Blank lines and lines starting with ``#`` are skipped.
+
+    Yields:
+        Path as listed and path of every image file
+    """
+    for line in file_list:
+        name = line.strip()
+        if name and not name.startswith("#"):
+            yield name, Path(name)
+
+
+class OutputNames:
+    """
+    Picks the path of the annotated copy of every file below an output directory.
+
+    Names mirror the input names, relative to the input root. Absolute names
+    from a file list lose their anchor and names escaping the directory with
+    ``..`` are rejected, so no input file is ever overwritten. Names that
+    would collide, e.g. ``a.jpg`` and ``a.png``, get a hash of the input
+    name appended.
+    """
+
+    def __init__(self, output_dir: Path, extension: str, taken: Iterable[str] = ()):
+        self.output_dir = Path(output_dir)
+        self.extension = extension
+        self.taken = set(taken)
+        self._resolved_dir = self.output_dir.resolve()
+
+    def path(self, name: str) -> Path:
+        """
+        Claim the output path of a file.
+
+        Args:
+            name: name of the file as written in the manifest
+
+        Returns:
+            Path below the output directory no other file was given
+
+        Raises:
+            ValueError: if the name has no file name or leads outside the directory
+        """
+        relative = PurePath(name)
+        if relative.anchor:
+            relative = PurePath(*relative.parts[1:])
+        path = (self.output_dir / relative).with_suffix(self.extension)
+        if not path.resolve().is_relative_to(self._resolved_dir):
+            raise ValueError(f"{name} would be written outside of the output directory")
+        if str(path) in self.taken:
+            digest = hashlib.blake2b(name.encode(), digest_size=4).hexdigest()
+            path = path.with_name(f"{path.stem}-{digest}{self.extension}")
+        self.taken.add(str(path))
+        return path
+
+
+def _repair(manifest: Path) -> None:
+    # A crash may leave half a record at the end, drop it so appends stay valid
+    with open(manifest, "rb+") as f:
+        content = f.read()
+        if content and not content.endswith(b"\n"):
+            f.truncate(content.rfind(b"\n") + 1)
+
+
+def read_manifest(manifest: Path) -> Iterator[dict]:
+    """
+    Read the records of a JSONL or CSV manifest, skipping damaged ones.
+
+    Yields:
+        Records with the ``MANIFEST_FIELDS``, ``boxes`` decoded
+    """
+    if not manifest.exists():
+        return
+    with open(manifest, newline="") as f:
+        if manifest.suffix == ".csv":
+            for row in csv.DictReader(f):
+                if None in row.values():
+                    continue
+                row["success"] = row["success"] == "True"
+                row["boxes"] = json.loads(row["boxes"] or "[]")
+                yield row
+            return
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class ManifestWriter:
+    """
+    Appends results to a JSONL or CSV manifest, picked by the file extension.
+
+    Every record is flushed as soon as it is written, so after a crash the
+    manifest lists everything processed up to it.
+    """
+
+    def __init__(self, manifest: Path):
+        self.csv = manifest.suffix == ".csv"
+        if manifest.exists():
+            _repair(manifest)
+        new = not manifest.exists() or manifest.stat().st_size == 0
+        self.file = open(manifest, "a", newline="")
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=MANIFEST_FIELDS)
+            if new:
+                self.writer.writeheader()
+
+    def write(self, record: dict) -> None:
+        if self.csv:
+            self.writer.writerow({**record, "boxes": json.dumps(record["boxes"])})
+        else:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "ManifestWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def detect_file(
+    content: bytes,
+    name: str,
+    profile: str | None = None,
+    output_path: str | None = None,
+    output: OutputOptions | None = None,
+) -> dict:
+    """
+    Detect faces in one file and optionally write the annotated image.
+
+    Module level so it can be pickled and executed in a worker process.
+
+    Args:
+        content: encoded image
+        name: name of the file in the manifest
+        profile: name of the detection profile
+        output_path: path the annotated image is written to, ``None`` for none,
+            see ``OutputNames``
+        output: encoding of annotated images
+
+    Returns:
+        Manifest record of the file
+    """
+    from .registry import get_detector
+
+    try:
+        check_pixels(io.BytesIO(content))
+        img = decode_image(memoryview(content))
+    except (UploadRejected, ValueError) as e:
+        return failure(name, str(e))
+    height, width = img.shape[:2]
+    boxes = [
+        [int(value) for value in face]
+        for face in get_detector(profile).detect_faces(img)
+    ]
+
+    if output_path is not None:
+        output = output or OutputOptions()
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        img = draw_boxes(img, boxes, output.max_dimension)
+        if not imwrite(output_path, img, output.imwrite_params()):
+            return failure(name, f"Failed to write {output_path}")
+    return {
+        "path": name,
+        "success": True,
+        "faces_detected": len(boxes),
+        "width": width,
+        "height": height,
+        "boxes": boxes,
+        "output": output_path,
+        "error": None,
+    }
+
+
+def failure(name: str, error: str) -> dict:
+    """Build the manifest record of a file that could not be processed."""
+    return {
+        "path": name,
+        "success": False,
+        "faces_detected": 0,
+        "width": None,
+        "height": None,
+        "boxes": [],
+        "output": None,
+        "error": error,
+    }
+
+
+@dataclass
+class BulkProgress:
+    """
+    Counters of a bulk run.
+
+    Attributes:
+        processed: files with a record written in this run
+        failed: files among them that could not be processed
+        faces: faces detected in this run
+        skipped: files skipped as already in the manifest
+        started: monotonic time the run started at
+    """
+
+    processed: int = 0
+    failed: int = 0
+    faces: int = 0
+    skipped: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def rate(self) -> float:
+        """Return the number of files processed per second."""
+        elapsed = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+
+def run_bulk(
+    files: Iterable[BulkFile],
+    executor: DetectionExecutor,
+    writer: ManifestWriter,
+    done: set[str] = frozenset(),
+    prefetch: int = 16,
+    progress: Callable[[BulkProgress], None] | None = None,
+    outputs: OutputNames | None = None,
+    **options,
+) -> BulkProgress:
+    """
+    Detect faces in every file not yet in the manifest.
+
+    Files are read ahead by a pool of reader threads, at most ``prefetch``
+    at a time, while the executor runs detection, so workers do not wait on
+    the disk. Records are written in input order.
+
+    Args:
+        files: relative names and paths, e.g. from ``iter_directory``
+        executor: executor running ``detect_file``
+        writer: manifest the records are appended to
+        done: names already in the manifest, skipped
+        prefetch: files read ahead of detection
+        progress: callback receiving the counters after every record
+        outputs: paths of annotated images, ``None`` to write none
+        **options: passed to ``detect_file``, e.g. ``profile`` or ``output``
+
+    Returns:
+        BulkProgress of the run
+    """
+    stats = BulkProgress()
+    prefetch = max(prefetch, 1)
+
+    def finish(name: str, future: Future) -> None:
+        try:
+            record = future.result()
+        except Exception as e:
+            # A crashed worker fails the file rather than the whole run
+            record = failure(name, str(e))
+        writer.write(record)
+        stats.processed += 1
+        stats.failed += not record["success"]
+        stats.faces += record["faces_detected"]
+        if progress:
+            progress(stats)
+
+    def detect(name: str, read: Future) -> None:
+        try:
+            output_path = str(outputs.path(name)) if outputs else None
+            content = read.result()
+        except (OSError, ValueError) as e:
+            future = Future()
+            future.set_result(failure(name, str(e)))
+        else:
+            future = executor.submit(
+                detect_file,
+                content,
+                name,
+                block=True,
+                output_path=output_path,
+                **options,
+            )
+        detections.append((name, future))
+        while detections and (detections[0][1].done() or len(detections) > prefetch):
+            finish(*detections.popleft())
+
+    reads = deque()
+    detections = deque()
+    with ThreadPoolExecutor(max_workers=min(prefetch, 8)) as reader:
+        for name, path in files:
+            if name in done:
+                stats.skipped += 1
+                continue
+            reads.append((name, reader.submit(path.read_bytes)))
+            if len(reads) >= prefetch:
+                detect(*reads.popleft())
+        while reads:
+            detect(*reads.popleft())
+        while detections:
+            finish(*detections.popleft())
+    return stats
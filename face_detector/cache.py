@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from . import background
+from .metrics import inc
+from .rendering import record_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_CONFIG = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 10000,
+    "TTL": 24 * 3600,
+    "REDIS_URL": None,
+    "KEY_PREFIX": "face_detection:result:",
+}
+
+
+def cache_config() -> dict:
+    """Return the ``FACE_DETECTION_RESULT_CACHE`` setting merged over the defaults."""
+    return {
+        **DEFAULT_CACHE_CONFIG,
+        **getattr(settings, "FACE_DETECTION_RESULT_CACHE", {}),
+    }
+
+
+def content_hash(content: bytes) -> str:
+    """
+    Return the digest of an upload's bytes.
+
+    BLAKE2b is used as it is both fast and collision resistant, so identical
+    uploads share a digest and different uploads never do in practice.
+    """
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def content_key(
+    content: bytes, profile: str, output: str = "", digest: str | None = None
+) -> str:
+    """
+    Build the cache key of an upload from its bytes.
+
+    Args:
+        content: raw bytes of the upload
+        profile: name of the detection profile, as results differ per profile
+        output: key of the output options, as results differ per options too
+        digest: ``content_hash`` of ``content``, if already computed
+
+    Returns:
+        Hex digest prefixed with the profile name and the output key
+    """
+    return f"{profile}:{output}:{digest or content_hash(content)}"
+
+
+class ResultCache:
+    """
+    Two-tier cache of detection results keyed by upload content.
+
+    The local tier is a size and TTL bounded LRU held in process memory. When
+    ``REDIS_URL`` is configured, results are also shared between processes
+    through Redis. Entries whose processed image no longer exists are dropped.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        redis_url: str | None = None,
+        key_prefix: str = DEFAULT_CACHE_CONFIG["KEY_PREFIX"],
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.redis = None
+        if redis_url:
+            import redis
+
+            self.redis = redis.Redis.from_url(redis_url)
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _get_local(self, key: str) -> dict | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, key: str) -> dict | None:
+        if self.redis is None:
+            return None
+        try:
+            value = self.redis.get(self.key_prefix + key)
+        except Exception:
+            logger.warning("Shared result cache is unavailable", exc_info=True)
+            return None
+        return json.loads(value) if value is not None else None
+
+    def _set_shared(self, key: str, value: dict) -> None:
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(self.key_prefix + key, json.dumps(value), ex=int(self.ttl))
+        except Exception:
+            logger.warning("Shared result cache is unavailable", exc_info=True)
+
+    def get(self, key: str) -> dict | None:
+        """
+        Look up a cached result.
+
+        Args:
+            key: key built by ``content_key``
+
+        Returns:
+            Cached result with ``processed_path``, ``boxes``, ``width`` and ``height``,
+            or ``None`` on a miss. ``processed_path`` is ``None`` for boxes only results
+        """
+        value = self._get_local(key)
+        tier = "local"
+        if value is None:
+            value = self._get_shared(key)
+            tier = "shared"
+        if (
+            value is not None
+            and value["processed_path"] is not None
+            and not default_storage.exists(value["processed_path"])
+            and not default_storage.exists(record_name(value["processed_path"]))
+        ):
+            self.delete(key)
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            elif tier == "local":
+                self.local_hits += 1
+            else:
+                self.shared_hits += 1
+        outcome = "miss" if value is None else f"{tier}_hit"
+        inc("face_detection_result_cache_total", outcome=outcome)
+        if value is not None and tier == "shared":
+            self._set_local(key, value)
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        """
+        Store a result in every tier.
+
+        The shared tier is written by a background thread, so storing
+        never waits for Redis.
+
+        Args:
+            key: key built by ``content_key``
+            value: JSON-serializable result
+        """
+        self._set_local(key, value)
+        if self.redis is not None:
+            background.submit(self._set_shared, key, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.redis is not None:
+            try:
+                self.redis.delete(self.key_prefix + key)
+            except Exception:
+                logger.warning("Shared result cache is unavailable", exc_info=True)
+
+    def stats(self) -> dict:
+        """Return hit and miss counters of this process."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+            }
+
+
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache | None:
+    """Return the process-wide result cache, or ``None`` if caching is disabled."""
+    global _cache
+    config = cache_config()
+    if not config["ENABLED"]:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(
+                    config["MAX_ENTRIES"],
+                    config["TTL"],
+                    config["REDIS_URL"],
+                    config["KEY_PREFIX"],
+                )
+    return _cache
+
+
+def reset_result_cache() -> None:
+    """Drop the process-wide result cache, mainly for tests."""
+    global _cache
+    with _cache_lock:
+        _cache = None
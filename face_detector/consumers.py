@@ -1,16 +1,56 @@
+import asyncio
 import json
+import time
+from collections import deque
 
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from .executor import ExecutorBusy, detect_frame, get_executor
+from .notifications import FACES_GROUP, encode_client_message, subscription_groups
+from .validation import UploadRejected, check_frame
 
 
 class FaceDetectionConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time face detection notifications.
+
+    Clients receive every broadcast until they send a ``subscribe`` message
+    with ``job_ids``, a ``source`` tag and/or ``min_faces``. The consumer
+    then moves to the groups of those filters, so the channel layer only
+    delivers matching notifications. ``unsubscribe`` restores the default.
+
+    Broadcasts arrive already serialized and are relayed as-is. With
+    ``FACE_DETECTION_NOTIFY_COALESCE_MS`` set, broadcasts arriving within that
+    window are sent to the client as one ``notifications_batch`` message.
+
+    Clients may also send encoded frames as binary messages to get the face
+    boxes back. Only the latest frame is kept while a detection is running,
+    so a client sending faster than frames are processed gets bounded latency
+    instead of a growing queue.
     """
 
+    pending_frame: bytes | None = None
+    frame_task: asyncio.Task | None = None
+    coalesce_window: float = 0.0
+    flush_task: asyncio.Task | None = None
+    subscribed_groups: list[str] = [FACES_GROUP]
+    min_faces: int | None = None
+    seen_events: deque | None = None
+
     async def connect(self):
         """Handle connection setup for a new WebSocket client."""
-        await self.channel_layer.group_add("faces", self.channel_name)
+        self.coalesce_window = (
+            getattr(settings, "FACE_DETECTION_NOTIFY_COALESCE_MS", 0) / 1000
+        )
+        self.coalesced = []
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.processed_at = deque(maxlen=30)
+        self.subscribed_groups = [FACES_GROUP]
+        self.seen_events = deque(maxlen=100)
+        await self.channel_layer.group_add(FACES_GROUP, self.channel_name)
         await self.accept()
         await self.send(
             text_data=json.dumps(
@@ -23,19 +63,182 @@ class FaceDetectionConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Handle disconnection of a WebSocket client."""
-        await self.channel_layer.group_discard("faces", self.channel_name)
+        for task in (self.frame_task, self.flush_task):
+            if task is not None:
+                task.cancel()
+        for group in self.subscribed_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Handle messages from WebSocket clients."""
+        if bytes_data is not None:
+            self.receive_frame(bytes_data)
+        elif text_data is not None:
+            try:
+                command = json.loads(text_data)
+            except ValueError:
+                return
+            if not isinstance(command, dict):
+                return
+            if command.get("type") == "subscribe":
+                await self.subscribe(command)
+            elif command.get("type") == "unsubscribe":
+                await self.subscribe({})
 
-    async def face_detection_notification(self, event):
-        """Send face detection results to the WebSocket client."""
+    async def subscribe(self, filters: dict):
+        """Replace the subscription filters of this client."""
+        try:
+            groups = subscription_groups(filters)
+        except ValueError as e:
+            await self.send(
+                text_data=json.dumps({"type": "subscription_error", "error": str(e)})
+            )
+            return
+
+        for group in set(self.subscribed_groups) - set(groups):
+            await self.channel_layer.group_discard(group, self.channel_name)
+        for group in set(groups) - set(self.subscribed_groups):
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.subscribed_groups = groups
+        self.min_faces = filters.get("min_faces")
         await self.send(
             text_data=json.dumps(
                 {
-                    "type": "face_detection_result",
-                    "image_url": event["image_url"],
-                    "faces_detected": event["faces_detected"],
+                    "type": "subscribed",
+                    "job_ids": filters.get("job_ids") or [],
+                    "source": filters.get("source"),
+                    "min_faces": self.min_faces,
                 }
             )
         )
+
+    def wants(self, event: dict) -> bool:
+        """
+        Tell whether a broadcast matches the subscription of this client.
+
+        Groups already select the notifications. This drops the ones from
+        the lower end of a face count bucket, and duplicates delivered
+        through more than one subscribed group.
+        """
+        faces = event.get("faces_detected")
+        if self.min_faces is not None and faces is not None and faces < self.min_faces:
+            return False
+        event_id = event.get("event_id")
+        if len(self.subscribed_groups) > 1 and event_id is not None:
+            if event_id in self.seen_events:
+                return False
+            self.seen_events.append(event_id)
+        return True
+
+    def receive_frame(self, frame: bytes) -> None:
+        """Queue a frame for detection, replacing a frame that is still waiting."""
+        self.frames_received += 1
+        if self.pending_frame is not None:
+            self.frames_dropped += 1
+        self.pending_frame = frame
+        if self.frame_task is None or self.frame_task.done():
+            self.frame_task = asyncio.create_task(self.process_frames())
+
+    async def process_frames(self):
+        """Detect faces in queued frames until no frame is waiting."""
+        while self.pending_frame is not None:
+            frame, self.pending_frame = self.pending_frame, None
+            sequence = self.frames_received
+            try:
+                check_frame(frame)
+                future = get_executor().submit(detect_frame, frame)
+            except ExecutorBusy:
+                self.frames_dropped += 1
+                continue
+            except UploadRejected as e:
+                await self.send_frame_error(sequence, e)
+                continue
+            try:
+                boxes, width, height = await asyncio.wrap_future(future)
+            except Exception as e:
+                await self.send_frame_error(sequence, e)
+                continue
+
+            self.frames_processed += 1
+            self.processed_at.append(time.monotonic())
+            await self.send(
+                text_data=json.dumps(
+                    {
+                        "type": "face_boxes",
+                        "frame": sequence,
+                        "width": width,
+                        "height": height,
+                        "boxes": boxes,
+                        "fps": round(self.fps(), 2),
+                        "dropped": self.frames_dropped,
+                    }
+                )
+            )
+
+    async def send_frame_error(self, sequence: int, error: Exception):
+        """Tell the client a frame could not be processed."""
+        await self.send(
+            text_data=json.dumps(
+                {"type": "frame_error", "frame": sequence, "error": str(error)}
+            )
+        )
+
+    def fps(self) -> float:
+        """Return the rate of processed frames over the last few frames."""
+        if len(self.processed_at) < 2:
+            return 0.0
+        elapsed = self.processed_at[-1] - self.processed_at[0]
+        return (len(self.processed_at) - 1) / elapsed if elapsed > 0 else 0.0
+
+    async def relay(self, handler: str, event: dict):
+        """
+        Forward a broadcast to the client, coalescing messages if configured.
+
+        Events sent through ``face_detector.notifications`` carry the client
+        message already encoded in ``text``, which is sent unchanged.
+        """
+        if not self.wants(event):
+            return
+        text = event.get("text") or encode_client_message(event, handler)
+        if not self.coalesce_window:
+            await self.send(text_data=text)
+            return
+
+        self.coalesced.append(text)
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(
+                self.flush_after(self.coalesce_window)
+            )
+
+    async def flush_after(self, delay: float):
+        """Send the messages collected during the coalescing window."""
+        await asyncio.sleep(delay)
+        texts, self.coalesced = self.coalesced, []
+        if len(texts) == 1:
+            await self.send(text_data=texts[0])
+        elif texts:
+            await self.send(
+                text_data='{"type": "notifications_batch", "messages": ['
+                + ", ".join(texts)
+                + "]}"
+            )
+
+    async def face_detection_notification(self, event):
+        """Send face detection results to the WebSocket client."""
+        await self.relay("face_detection_notification", event)
+
+    async def face_detection_job_failed(self, event):
+        """Tell the WebSocket client that an async detection job failed."""
+        await self.relay("face_detection_job_failed", event)
+
+    async def face_detection_batch_notification(self, event):
+        """Send the results of a batch upload to the WebSocket client."""
+        await self.relay("face_detection_batch_notification", event)
+
+    async def face_detection_progress_notification(self, event):
+        """Send the progress of a video job to the WebSocket client."""
+        await self.relay("face_detection_progress_notification", event)
+
+    async def face_detection_video_notification(self, event):
+        """Send the results of a processed video to the WebSocket client."""
+        await self.relay("face_detection_video_notification", event)
@@ -1,31 +1,169 @@
 import uuid
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Sequence, Tuple
+from typing import Dict, List, Sequence, Tuple
 
 import numpy as np
 from cv2 import (
     COLOR_BGR2GRAY,
-    CascadeClassifier,
+    IMREAD_COLOR,
+    IMWRITE_JPEG_QUALITY,
+    IMWRITE_WEBP_QUALITY,
+    INTER_AREA,
     cvtColor,
-    data,
+    imdecode,
     imread,
     imwrite,
     rectangle,
+    resize,
     typing,
 )
 from django.conf import settings
 
+from .metrics import stopwatch
+from .profiles import DetectionProfile, get_profile
+from .registry import ClassifierPool, get_pool
+from .retention import sharded_name
+from .tiling import detect_tiled, uses_tiles
+
+# Output format -> file extension and the imwrite flag taking the quality
+OUTPUT_FORMATS = {
+    "jpeg": (".jpg", IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", IMWRITE_WEBP_QUALITY),
+    "png": (".png", None),
+}
+
+DEFAULT_OUTPUT_CONFIG = {
+    "FORMAT": "jpeg",
+    "QUALITY": None,
+    "MAX_DIMENSION": None,
+}
+
+
+@dataclass(frozen=True)
+class OutputOptions:
+    """
+    How the result of an upload is produced.
+
+    Attributes:
+        annotate: draw boxes and save the image, ``False`` only returns the boxes
+        format: ``jpeg``, ``webp`` or ``png``
+        quality: encoder quality from 1 to 100, ignored for lossless PNG,
+            ``None`` keeps the OpenCV default
+        max_dimension: downscale the saved image so its longest side fits
+    """
+
+    annotate: bool = True
+    format: str = "jpeg"
+    quality: int | None = None
+    max_dimension: int | None = None
+
+    def __post_init__(self):
+        if self.format not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"format must be one of {', '.join(OUTPUT_FORMATS)}, got {self.format}"
+            )
+        if self.quality is not None and not 1 <= self.quality <= 100:
+            raise ValueError(f"quality must be between 1 and 100, got {self.quality}")
+        if self.max_dimension is not None and self.max_dimension < 1:
+            raise ValueError(
+                f"max_dimension must be a positive integer, got {self.max_dimension}"
+            )
+
+    @property
+    def extension(self) -> str:
+        return OUTPUT_FORMATS[self.format][0]
+
+    @property
+    def key(self) -> str:
+        """Identify the options, results differ between keys."""
+        if not self.annotate:
+            return "boxes"
+        return f"{self.format}-q{self.quality or ''}-m{self.max_dimension or ''}"
+
+    def imwrite_params(self) -> List[int]:
+        """Return the ``imwrite`` parameters setting the quality."""
+        flag = OUTPUT_FORMATS[self.format][1]
+        if flag is None or self.quality is None:
+            return []
+        return [flag, self.quality]
+
+
+def output_config() -> dict:
+    """Return the ``FACE_DETECTION_OUTPUT`` setting merged over the defaults."""
+    return {**DEFAULT_OUTPUT_CONFIG, **getattr(settings, "FACE_DETECTION_OUTPUT", {})}
+
+
+def default_output() -> OutputOptions:
+    """Return the output options used when a request does not set them."""
+    config = output_config()
+    return OutputOptions(
+        format=config["FORMAT"],
+        quality=config["QUALITY"],
+        max_dimension=config["MAX_DIMENSION"],
+    )
+
+
+@dataclass
+class DetectionResult:
+    """
+    Outcome of processing a single image.
+
+    Attributes:
+        processed_path: path of the annotated image relative to MEDIA_ROOT,
+            ``None`` if only the boxes were requested
+        boxes: face bounding boxes as ``[x, y, width, height]`` in original coordinates
+        width: width of the original image
+        height: height of the original image
+        timings: seconds spent in each processing stage, e.g. ``detect``
+    """
+
+    processed_path: Path | None
+    boxes: List[List[int]]
+    width: int
+    height: int
+    timings: Dict[str, float] = field(default_factory=dict, compare=False)
+
+    @property
+    def faces_detected(self) -> int:
+        return len(self.boxes)
+
+    def as_dict(self) -> dict:
+        """Return the result as a JSON-serializable dictionary."""
+        return {
+            "processed_path": (
+                str(self.processed_path) if self.processed_path is not None else None
+            ),
+            "boxes": self.boxes,
+            "width": self.width,
+            "height": self.height,
+        }
+
 
 class FaceDetector:
-    def __init__(self):
+    def __init__(
+        self,
+        pool: ClassifierPool | None = None,
+        profile: DetectionProfile | None = None,
+    ):
         """
-        Load the pre-trained face detection model
-        using the default Haar Cascade classifier for face detection
-        Default has higher recall (more true and false positives) while
-        alt_tree has higher precision (less true positives, less false positives).
+        Load the pre-trained face detection model chosen by the profile.
+
+        The profile picks a Haar cascade shipped with OpenCV: default has higher
+        recall (more true and false positives) while alt_tree has higher
+        precision (less true positives, less false positives).
+
+        Classifiers are borrowed from a process-wide pool, so constructing
+        a detector only parses the cascade the first time it is used.
+
+        Args:
+            pool: classifier pool to use, defaults to the shared pool of the
+                profile's cascade
+            profile: detection parameters, defaults to the configured default profile
         """
-        face_cascade_path = data.haarcascades + "haarcascade_frontalface_default.xml"
-        self.face_cascade = CascadeClassifier(face_cascade_path)
+        self.profile = profile or get_profile()
+        self.pool = pool or get_pool(self.profile.cascade)
+        self.pool.prime()
         self.processed_dir = Path(settings.MEDIA_ROOT) / "processed"
         self.processed_dir.mkdir(parents=True, exist_ok=True)
 
@@ -33,38 +171,130 @@ class FaceDetector:
         self, image_path: Path = Path(), unique_id: str = str(uuid.uuid4())
     ) -> Tuple[Path, int]:
         """
-        Process the uploaded image by detecting faces, drawing boxes and saving the result.
+        Process the uploaded image: detect faces, draw boxes and save the result.
 
         Args:
             image_path: path to the image file, defaults to an empty path
-            unique_id: unique identifier for the processed image, defaults to a random UUID
+            unique_id: unique identifier for the processed image, defaults to a
+                random UUID
 
         Returns:
-            Tuple containing the path to the processed image and the number of faces detected
+            Tuple containing the path to the processed image and the number of
+            faces detected
         """
         try:
-            img = imread(str(image_path))
+            timings = {}
+            with stopwatch(timings, "read_image"):
+                img = imread(str(image_path))
             if img is None:
                 raise ValueError(f"Failed to load image from {image_path}")
 
-            faces = self.detect_faces(img)
+            result = self._annotate_and_save(img, unique_id, default_output(), timings)
+            return result.processed_path, result.faces_detected
+        except Exception as e:
+            raise RuntimeError(f"Failed to process image: {str(e)}") from e
+
+    def process_bytes(self, content: bytes, unique_id: str) -> Tuple[Path, int]:
+        """
+        Process an encoded image held in memory, without writing it to disk first.
+
+        Args:
+            content: encoded image bytes, e.g. the body of an uploaded file
+            unique_id: unique identifier for the processed image
+
+        Returns:
+            Tuple containing the path to the processed image and the number of
+            faces detected
+        """
+        return self.process_buffer(memoryview(content), unique_id)
+
+    def process_buffer(self, buffer: memoryview, unique_id: str) -> Tuple[Path, int]:
+        """
+        Process an encoded image exposed through the buffer protocol.
 
-            for x, y, w, h in faces:
-                rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        The buffer is decoded in place, so the only additional copy
+        held in memory is the decoded image itself.
 
-            output_filename = f"faces_{unique_id}.jpg"
-            output_path = Path("processed") / output_filename
-            full_output_path = self.processed_dir / output_filename
-            imwrite(str(full_output_path), img)
+        Args:
+            buffer: buffer with the encoded image, e.g. a memoryview over the upload
+            unique_id: unique identifier for the processed image
+
+        Returns:
+            Tuple containing the path to the processed image and the number of
+            faces detected
+        """
+        result = self.analyze_buffer(buffer, unique_id)
+        return result.processed_path, result.faces_detected
+
+    def analyze_buffer(
+        self,
+        buffer: memoryview,
+        unique_id: str,
+        output: OutputOptions | None = None,
+    ) -> DetectionResult:
+        """
+        Process an encoded image like ``process_buffer`` and return the full result.
+
+        Args:
+            buffer: buffer with the encoded image, e.g. a memoryview over the upload
+            unique_id: unique identifier for the processed image
+            output: how the result is produced, defaults to ``FACE_DETECTION_OUTPUT``
 
-            return output_path, len(faces)
+        Returns:
+            DetectionResult with the processed image path and the face boxes
+        """
+        try:
+            timings = {}
+            with stopwatch(timings, "decode"):
+                img = decode_image(buffer)
+            return self._annotate_and_save(
+                img, unique_id, output or default_output(), timings
+            )
         except Exception as e:
             raise RuntimeError(f"Failed to process image: {str(e)}") from e
 
+    def _annotate_and_save(
+        self,
+        img: typing.MatLike,
+        unique_id: str,
+        output: OutputOptions,
+        timings: Dict[str, float],
+    ) -> DetectionResult:
+        """
+        Detect faces in a decoded image, draw boxes around them and save the result.
+
+        Drawing, encoding and writing are skipped when ``output`` asks for the
+        boxes only, as encoding often costs as much as the detection itself.
+        The time spent in each stage is added to ``timings``.
+        """
+        height, width = img.shape[:2]
+        with stopwatch(timings, "detect"):
+            faces = self.detect_faces(img)
+        boxes = [[int(value) for value in face] for face in faces]
+        if not output.annotate:
+            return DetectionResult(None, boxes, width, height, timings)
+
+        with stopwatch(timings, "draw"):
+            img = draw_boxes(img, boxes, output.max_dimension)
+        output_filename = f"faces_{unique_id}{output.extension}"
+        output_path = Path(sharded_name("processed", output_filename))
+        full_output_path = self.processed_dir.parent / output_path
+        with stopwatch(timings, "write_image"):
+            full_output_path.parent.mkdir(parents=True, exist_ok=True)
+            imwrite(str(full_output_path), img, output.imwrite_params())
+
+        return DetectionResult(output_path, boxes, width, height, timings)
+
     def detect_faces(self, image_data: typing.MatLike) -> Sequence[typing.Rect]:
         """
         Detect faces in the given image and return coordinates of bounding boxes.
 
+        Depending on the detection profile, the image is downscaled to a working
+        resolution first and the boxes are mapped back to original coordinates,
+        which keeps the cost per image roughly constant for large photos.
+        Working images above ``FACE_DETECTION_TILING["MIN_PIXELS"]`` are split
+        into overlapping tiles searched in parallel.
+
         Args:
             image_data: image data where faces will be detected
 
@@ -74,9 +304,80 @@ class FaceDetector:
         try:
             # Read the image using OpenCV
             gray = cvtColor(image_data, COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-            )
+            height, width = gray.shape[:2]
+            scale = self.profile.working_scale(width, height)
+            if scale < 1:
+                gray = resize(gray, None, fx=scale, fy=scale, interpolation=INTER_AREA)
+
+            if uses_tiles(gray.shape[1], gray.shape[0]):
+                faces = detect_tiled(gray, self.detect_gray)
+            else:
+                faces = self.detect_gray(gray)
+            if scale < 1 and len(faces):
+                faces = np.round(np.asarray(faces) / scale).astype(np.int32)
             return faces
         except Exception as e:
             raise ValueError(f"Failed to detect faces: {e}") from e
+
+    def detect_gray(self, gray: typing.MatLike) -> Sequence[typing.Rect]:
+        """
+        Run the cascade on a grayscale image with a classifier borrowed from the pool.
+
+        Args:
+            gray: grayscale image or tile, at working resolution
+
+        Returns:
+            Sequence of rectangles in the coordinates of ``gray``
+        """
+        profile = self.profile
+        with self.pool.acquire() as face_cascade:
+            return face_cascade.detectMultiScale(
+                gray,
+                scaleFactor=profile.scale_factor,
+                minNeighbors=profile.min_neighbors,
+                minSize=(profile.min_size, profile.min_size),
+            )
+
+
+def draw_boxes(
+    img: typing.MatLike, boxes: List[List[int]], max_dimension: int | None = None
+) -> typing.MatLike:
+    """
+    Draw face boxes onto an image, downscaling it first if it is too large.
+
+    Args:
+        img: decoded BGR image, drawn on in place unless it is downscaled
+        boxes: face boxes as ``[x, y, width, height]`` in original coordinates
+        max_dimension: longest side of the returned image, ``None`` keeps the size
+
+    Returns:
+        Annotated image
+    """
+    height, width = img.shape[:2]
+    scale = 1.0
+    if max_dimension and max(width, height) > max_dimension:
+        scale = max_dimension / max(width, height)
+        img = resize(img, None, fx=scale, fy=scale, interpolation=INTER_AREA)
+    for x, y, w, h in boxes:
+        x, y, w, h = (round(value * scale) for value in (x, y, w, h))
+        rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), 2)
+    return img
+
+
+def decode_image(buffer: memoryview) -> typing.MatLike:
+    """
+    Decode an encoded image straight from a buffer without copying it.
+
+    Args:
+        buffer: buffer with the encoded image bytes
+
+    Returns:
+        Decoded BGR image
+
+    Raises:
+        ValueError: if the buffer does not contain a decodable image
+    """
+    img = imdecode(np.frombuffer(buffer, dtype=np.uint8), IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Failed to decode image from buffer")
+    return img
@@ -0,0 +1,187 @@
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Sequence
+
+from cv2 import imread, typing
+
+from .benchmark import summarize
+from .registry import get_detector
+
+
+@dataclass
+class LabelledImage:
+    """
+    Image of an evaluation set with its hand-labelled faces.
+
+    Attributes:
+        path: path of the image
+        boxes: expected faces as ``[x, y, width, height]``
+    """
+
+    path: Path
+    boxes: List[List[int]]
+
+
+def load_labels(labels: Path) -> List[LabelledImage]:
+    """
+    Read an evaluation set from a JSON lines file.
+
+    Every line holds a ``path``, relative to the directory of the labels
+    file unless absolute, and the expected ``boxes``. A reviewed
+    ``bulk_detect`` manifest has this shape too.
+
+    Args:
+        labels: path of the labels file
+
+    Returns:
+        Labelled images in file order
+
+    Raises:
+        ValueError: if a line is not a valid label
+    """
+    images = []
+    with open(labels) as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                boxes = [[int(value) for value in box] for box in record["boxes"]]
+                if any(len(box) != 4 for box in boxes):
+                    raise ValueError("boxes must have 4 values")
+                path = labels.parent / record["path"]
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid label on line {number}: {e}") from e
+            images.append(LabelledImage(path, boxes))
+    return images
+
+
+def iou(first: Sequence[int], second: Sequence[int]) -> float:
+    """Return the intersection over union of two ``[x, y, width, height]`` boxes."""
+    x1, y1, w1, h1 = first
+    x2, y2, w2, h2 = second
+    width = max(0, min(x1 + w1, x2 + w2) - max(x1, x2))
+    height = max(0, min(y1 + h1, y2 + h2) - max(y1, y2))
+    intersection = width * height
+    union = w1 * h1 + w2 * h2 - intersection
+    return intersection / union if union else 0.0
+
+
+def match_boxes(
+    predicted: Sequence[Sequence[int]],
+    expected: Sequence[Sequence[int]],
+    threshold: float = 0.5,
+) -> tuple[int, int, int]:
+    """
+    Match detections to labelled faces, best overlaps first.
+
+    Every labelled face is matched at most once, so a face detected twice
+    counts once as a true positive and once as a false positive.
+
+    Args:
+        predicted: detected boxes
+        expected: labelled boxes
+        threshold: intersection over union needed for a match
+
+    Returns:
+        True positives, false positives and false negatives
+    """
+    pairs = sorted(
+        (
+            (iou(box, label), i, j)
+            for i, box in enumerate(predicted)
+            for j, label in enumerate(expected)
+        ),
+        reverse=True,
+    )
+    used_predicted, used_expected = set(), set()
+    for overlap, i, j in pairs:
+        if overlap < threshold:
+            break
+        if i not in used_predicted and j not in used_expected:
+            used_predicted.add(i)
+            used_expected.add(j)
+    matched = len(used_predicted)
+    return matched, len(predicted) - matched, len(expected) - matched
+
+
+def evaluate_profile(
+    profile: str,
+    images: List[tuple[LabelledImage, typing.MatLike]],
+    threshold: float = 0.5,
+    iterations: int = 1,
+) -> dict:
+    """
+    Measure the accuracy and speed of one detection profile.
+
+    Args:
+        profile: name of the detection profile
+        images: labelled images with their decoded pixels
+        threshold: intersection over union needed for a match
+        iterations: number of timed detections per image
+
+    Returns:
+        Counts of true and false positives and false negatives, precision,
+        recall, F1 and the latency summary of ``benchmark.summarize``.
+        Precision and recall are 1 when there is nothing to get wrong.
+    """
+    detector = get_detector(profile)
+    true_positives = false_positives = false_negatives = 0
+    durations = []
+    for labelled, img in images:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            faces = detector.detect_faces(img)
+            durations.append(time.perf_counter() - start)
+        tp, fp, fn = match_boxes(
+            [[int(value) for value in face] for face in faces],
+            labelled.boxes,
+            threshold,
+        )
+        true_positives += tp
+        false_positives += fp
+        false_negatives += fn
+
+    detected = true_positives + false_positives
+    labelled_faces = true_positives + false_negatives
+    precision = true_positives / detected if detected else 1.0
+    recall = true_positives / labelled_faces if labelled_faces else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "profile": profile,
+        "images": len(images),
+        "true_positives": true_positives,
+        "false_positives": false_positives,
+        "false_negatives": false_negatives,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+        **summarize(durations),
+    }
+
+
+def evaluate_profiles(
+    profiles: List[str],
+    labelled: List[LabelledImage],
+    threshold: float = 0.5,
+    iterations: int = 1,
+) -> List[dict]:
+    """
+    Evaluate several profiles on the same decoded images.
+
+    Images are decoded once up front, so only detection is timed.
+
+    Raises:
+        ValueError: if an image cannot be read
+    """
+    images = []
+    for image in labelled:
+        img = imread(str(image.path))
+        if img is None:
+            raise ValueError(f"Failed to read {image.path}")
+        images.append((image, img))
+    return [
+        evaluate_profile(profile, images, threshold, iterations) for profile in profiles
+    ]
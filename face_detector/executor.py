@@ -0,0 +1,302 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from .detector import DetectionResult, OutputOptions, decode_image
+from .metrics import inc
+
+DEFAULT_EXECUTOR_CONFIG = {
+    "KIND": "process",
+    "WORKERS": None,
+    "QUEUE_SIZE": 64,
+    "OPENCV_THREADS": 1,
+    "RETRY_AFTER": 1,
+    "START_METHOD": None,
+}
+
+
+class ExecutorBusy(Exception):
+    """Raised when the detection queue is full and the request should be retried."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Detection queue is full, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+def executor_config() -> dict:
+    """Return the ``FACE_DETECTION_EXECUTOR`` setting merged over the defaults."""
+    return {
+        **DEFAULT_EXECUTOR_CONFIG,
+        **getattr(settings, "FACE_DETECTION_EXECUTOR", {}),
+    }
+
+
+def init_worker(opencv_threads: int) -> None:
+    """
+    Prepare a detection worker process.
+
+    Limits OpenCV's internal threading so that the workers together do not
+    oversubscribe the CPU, and loads the cascades before the first job arrives.
+
+    Args:
+        opencv_threads: number of threads OpenCV may use inside this process
+    """
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "face_detection.settings")
+        django.setup()
+    cv2.setNumThreads(opencv_threads)
+
+    from .registry import get_detector
+
+    get_detector()
+
+
+def detect_bytes(
+    content: bytes,
+    unique_id: str,
+    profile: str | None = None,
+    output: OutputOptions | None = None,
+) -> DetectionResult:
+    """
+    Run ``FaceDetector.analyze_buffer`` with the detector of the given profile.
+
+    Module level so it can be pickled and executed in a worker process.
+    """
+    from .registry import get_detector
+
+    return get_detector(profile).analyze_buffer(memoryview(content), unique_id, output)
+
+
+def detect_image(img: np.ndarray, profile: str | None = None) -> list[list[int]]:
+    """
+    Detect faces in a decoded image, e.g. a keyframe of a video.
+
+    Module level so it can be pickled and executed in a worker process.
+
+    Returns:
+        Face boxes as ``[x, y, width, height]``
+    """
+    from .registry import get_detector
+
+    return [
+        [int(value) for value in face]
+        for face in get_detector(profile).detect_faces(img)
+    ]
+
+
+def detect_frame(
+    content: bytes, profile: str | None = None
+) -> tuple[list[list[int]], int, int]:
+    """
+    Detect faces in an encoded frame without annotating or saving anything.
+
+    Module level so it can be pickled and executed in a worker process.
+
+    Returns:
+        Tuple of face boxes as ``[x, y, width, height]``, frame width and height
+    """
+    from .registry import get_detector
+
+    img = decode_image(memoryview(content))
+    faces = get_detector(profile).detect_faces(img)
+    height, width = img.shape[:2]
+    return [[int(value) for value in face] for face in faces], width, height
+
+
+class InlineExecutor(Executor):
+    """Executor running every task synchronously in the calling thread."""
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+class DetectionExecutor:
+    """
+    Runs CPU-bound detection on a bounded pool of workers.
+
+    At most ``queue_size`` tasks may be queued or running at once, further
+    submissions are rejected with ExecutorBusy instead of piling up. A process
+    pool stays broken once one of its workers dies, e.g. killed for running
+    out of memory; given ``rebuild``, it is replaced by a new pool. Tasks are
+    counted in the metrics under ``name``.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        queue_size: int,
+        retry_after: int,
+        rebuild: Callable[[], Executor] | None = None,
+        name: str = "detection",
+    ):
+        self.executor = executor
+        self.name = name
+        self.rebuild = rebuild
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.rebuilt = 0
+
+    def submit(self, fn: Callable, *args, block: bool = False, **kwargs) -> Future:
+        """
+        Schedule a task if the queue has room.
+
+        Args:
+            fn: picklable callable to run
+            *args: positional arguments passed to ``fn``
+            block: wait for a free slot instead of failing when the queue is full
+            **kwargs: keyword arguments passed to ``fn``
+
+        Returns:
+            Future of the task
+
+        Raises:
+            ExecutorBusy: if the queue is full and ``block`` is false
+        """
+        if not self._slots.acquire(blocking=block):
+            with self._lock:
+                self.rejected += 1
+            inc(
+                "face_detection_executor_tasks_total",
+                executor=self.name,
+                outcome="rejected",
+            )
+            raise ExecutorBusy(self.retry_after)
+        with self._lock:
+            self.submitted += 1
+        inc(
+            "face_detection_executor_tasks_total",
+            executor=self.name,
+            outcome="submitted",
+        )
+        try:
+            future = self._submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _submit(self, fn: Callable, *args, **kwargs) -> Future:
+        executor = self.executor
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            if self.rebuild is None:
+                raise
+        with self._lock:
+            # Another thread may have replaced the broken pool already
+            if self.executor is executor:
+                executor.shutdown(wait=False)
+                self.executor = self.rebuild()
+                self.rebuilt += 1
+                inc("face_detection_executor_rebuilds_total", executor=self.name)
+            executor = self.executor
+        return executor.submit(fn, *args, **kwargs)
+
+    def prestart(self, workers: int) -> None:
+        """Start the worker processes now rather than on the first request."""
+        futures = [self.submit(os.getpid, block=True) for _ in range(workers)]
+        for future in futures:
+            future.result()
+
+    def stats(self) -> dict:
+        """Return queue counters, useful for sizing ``QUEUE_SIZE``."""
+        with self._lock:
+            return {
+                "queue_size": self.queue_size,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "rebuilt": self.rebuilt,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
+
+
+def build_executor(config: dict) -> DetectionExecutor:
+    """
+    Create a DetectionExecutor from a ``FACE_DETECTION_EXECUTOR``-style config.
+
+    Args:
+        config: executor configuration, see ``DEFAULT_EXECUTOR_CONFIG``
+
+    Returns:
+        DetectionExecutor wrapping a process, thread or inline executor
+    """
+    workers = config["WORKERS"] or os.cpu_count() or 1
+    kind = config["KIND"]
+    if kind == "process":
+
+        def process_pool() -> ProcessPoolExecutor:
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(config["START_METHOD"]),
+                initializer=init_worker,
+                initargs=(config["OPENCV_THREADS"],),
+            )
+
+        return DetectionExecutor(
+            process_pool(),
+            config["QUEUE_SIZE"],
+            config["RETRY_AFTER"],
+            rebuild=process_pool,
+        )
+    if kind == "thread":
+        cv2.setNumThreads(config["OPENCV_THREADS"])
+        executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="face-detection"
+        )
+    elif kind == "inline":
+        executor = InlineExecutor()
+    else:
+        raise ValueError(f"Unknown detection executor: {kind}")
+    return DetectionExecutor(executor, config["QUEUE_SIZE"], config["RETRY_AFTER"])
+
+
+_executor: DetectionExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> DetectionExecutor:
+    """Return the process-wide detection executor."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = build_executor(executor_config())
+    return _executor
+
+
+def warm_up_executor() -> None:
+    """Create the executor and start its workers, used at server startup."""
+    config = executor_config()
+    if getattr(settings, "FACE_DETECTOR_WARM_UP", True) and config["KIND"] == "process":
+        get_executor().prestart(config["WORKERS"] or os.cpu_count() or 1)
+
+
+def reset_executor() -> None:
+    """Shut down and drop the process-wide executor, mainly for tests."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
@@ -0,0 +1,371 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, List
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from redis.asyncio import Redis
+
+from .benchmark import environment, summarize
+from .notifications import prepare_event
+
+# Notification broadcast to every benchmark client, as sent after an upload
+SAMPLE_NOTIFICATION = {
+    "type": "face_detection_notification",
+    "image_url": "/media/processed/00000000-0000-0000-0000-000000000000.jpg",
+    "faces_detected": 2,
+    "job_id": None,
+    "source": "fanout-benchmark",
+}
+
+
+async def read_command(reader: asyncio.StreamReader) -> List[bytes] | None:
+    """
+    Read one command sent by a Redis client.
+
+    Returns:
+        Command name and arguments, ``None`` once the client disconnected
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed in telnet
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def encode(value: int | bytes | list | None, push: bool = False) -> bytes:
+    """
+    Encode an integer, bulk string, array or nil reply.
+
+    Args:
+        value: reply
+        push: send an array as a RESP3 push message, as pub/sub messages are
+            once a client switched to RESP3 with ``HELLO 3``
+    """
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    prefix = b">" if push else b"*"
+    return prefix + b"%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+
+
+class PubSubStandIn:
+    """
+    Local Redis stand-in serving the publish/subscribe commands.
+
+    It speaks enough of the Redis protocol for the "pubsub" channel layer,
+    so fan-out can be benchmarked without a Redis server, and counts the
+    commands it serves like ``INFO commandstats``. The "redis" layer runs
+    Lua scripts and needs a real Redis. The server runs on its own thread
+    and event loop, next to the loop of the benchmarked layer.
+    """
+
+    def __init__(self):
+        self.commands: Counter = Counter()
+        # Channel -> writer of each subscribed connection -> whether it uses RESP3
+        self.subscribers: dict[bytes, dict[asyncio.StreamWriter, bool]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._server: asyncio.Server | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self) -> str:
+        """
+        Start serving on a free local port.
+
+        Returns:
+            Redis URL of the stand-in
+        """
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._serve, "127.0.0.1", 0)
+            )
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="redis-stand-in", daemon=True)
+        self._thread.start()
+        ready.wait()
+        port = self._server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}"
+
+    def stop(self) -> None:
+        """Disconnect the clients and stop the server thread."""
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+
+    async def _close(self) -> None:
+        self._server.close()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        session = {"channels": set(), "resp3": False}
+        try:
+            while (command := await read_command(reader)) is not None:
+                if command:
+                    writer.write(self._execute(command, writer, session))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in session["channels"]:
+                self._unsubscribe(channel, writer)
+            self._tasks.discard(task)
+            writer.close()
+
+    def _execute(
+        self, args: List[bytes], writer: asyncio.StreamWriter, session: dict
+    ) -> bytes:
+        name = args[0].decode().lower()
+        channels, resp3 = session["channels"], session["resp3"]
+        self.commands[name] += 1
+        if name == "publish":
+            channel, data = args[1], args[2]
+            receivers = self.subscribers.get(channel, {})
+            for receiver, push in receivers.items():
+                receiver.write(encode([b"message", channel, data], push))
+            return encode(len(receivers))
+        if name == "subscribe":
+            reply = b""
+            for channel in args[1:]:
+                channels.add(channel)
+                self.subscribers.setdefault(channel, {})[writer] = resp3
+                reply += encode([b"subscribe", channel, len(channels)], resp3)
+            return reply
+        if name == "unsubscribe":
+            targets = args[1:] or list(channels)
+            if not targets:
+                return encode([b"unsubscribe", None, 0], resp3)
+            reply = b""
+            for channel in targets:
+                channels.discard(channel)
+                self._unsubscribe(channel, writer)
+                reply += encode([b"unsubscribe", channel, len(channels)], resp3)
+            return reply
+        if name == "hello":
+            session["resp3"] = len(args) > 1 and args[1] == b"3"
+            proto = 3 if session["resp3"] else 2
+            return b"%%1\r\n%s%s" % (encode(b"proto"), encode(proto))
+        if name == "ping":
+            return b"+PONG\r\n"
+        if name in ("client", "select"):
+            return b"+OK\r\n"
+        if name == "info":
+            lines = ["# Commandstats"] + [
+                f"cmdstat_{command}:calls={calls},usec=0,usec_per_call=0.00"
+                for command, calls in sorted(self.commands.items())
+            ]
+            return encode("\r\n".join(lines).encode() + b"\r\n")
+        return f"-ERR unknown command '{name}'\r\n".encode()
+
+    def _unsubscribe(self, channel: bytes, writer: asyncio.StreamWriter) -> None:
+        subscribers = self.subscribers.get(channel, {})
+        subscribers.pop(writer, None)
+        if not subscribers:
+            self.subscribers.pop(channel, None)
+
+
+def layer_config(name: str, redis_url: str | None) -> dict:
+    """
+    Return the configuration of a channel layer from ``CHANNEL_LAYER_BACKENDS``.
+
+    Args:
+        name: key of ``CHANNEL_LAYER_BACKENDS``, e.g. ``pubsub``
+        redis_url: Redis the layer connects to instead of its configured hosts
+
+    Raises:
+        ValueError: if the layer is unknown
+    """
+    backends = getattr(settings, "CHANNEL_LAYER_BACKENDS", {})
+    if name not in backends:
+        raise ValueError(f"Unknown channel layer {name!r}")
+    config = dict(backends[name])
+    if "hosts" in config.get("CONFIG", {}):
+        config["CONFIG"] = {**config["CONFIG"], "hosts": [redis_url]}
+    return config
+
+
+async def command_stats(client: Redis | None) -> Counter:
+    """Return the number of calls of every command served by Redis so far."""
+    if client is None:
+        return Counter()
+    info = await client.info("commandstats")
+    return Counter(
+        {
+            key.removeprefix("cmdstat_"): stats["calls"]
+            for key, stats in info.items()
+            if key != "cmdstat_info"
+        }
+    )
+
+
+async def receive(layer, channel: str, count: int, latencies: List[float]) -> None:
+    for _ in range(count):
+        message = await layer.receive(channel)
+        latencies.append(time.perf_counter() - message["sent_at"])
+
+
+async def run_case(
+    config: dict, clients: int, messages: int, interval: float, timeout: float
+) -> dict:
+    """
+    Broadcast notifications to idle clients of one channel layer.
+
+    Every client gets a channel in one group, like dashboard sockets in the
+    faces group, and waits for messages. Each broadcast is one
+    ``group_send``. Commands served by Redis are counted separately while
+    clients join and while messages are delivered.
+
+    Args:
+        config: channel layer configuration, see ``layer_config``
+        clients: number of connected clients
+        messages: number of broadcasts
+        interval: seconds between broadcasts
+        timeout: seconds to wait for the last deliveries
+
+    Returns:
+        Deliveries, delivery latency percentiles in milliseconds and Redis
+        commands while connecting and per broadcast
+    """
+    layer = import_string(config["BACKEND"])(**config.get("CONFIG", {}))
+    hosts = config.get("CONFIG", {}).get("hosts")
+    stats = Redis.from_url(hosts[0]) if hosts else None
+    group = f"fanout-benchmark-{uuid.uuid4().hex[:8]}"
+    event = prepare_event(SAMPLE_NOTIFICATION)
+    latencies: List[float] = []
+    try:
+        before = await command_stats(stats)
+        start = time.perf_counter()
+        channels = []
+        for _ in range(clients):
+            channel = await layer.new_channel()
+            await layer.group_add(group, channel)
+            channels.append(channel)
+        connect_seconds = time.perf_counter() - start
+        # Open the connection messages are sent on before counting broadcasts
+        await layer.group_send(f"{group}.warmup", event)
+        connected = await command_stats(stats)
+
+        receivers = [
+            asyncio.create_task(receive(layer, channel, messages, latencies))
+            for channel in channels
+        ]
+        for _ in range(messages):
+            await layer.group_send(group, {**event, "sent_at": time.perf_counter()})
+            await asyncio.sleep(interval)
+        _, pending = await asyncio.wait(receivers, timeout=timeout)
+        delivered = len(latencies)
+        finished = await command_stats(stats)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for channel in channels:
+            await layer.group_discard(group, channel)
+    finally:
+        if hasattr(layer, "close_pools"):
+            await layer.close_pools()
+        elif "flush" in layer.extensions:
+            await layer.flush()
+        if stats is not None:
+            await stats.aclose()
+
+    summary = {
+        "clients": clients,
+        "messages": messages,
+        "delivered": delivered,
+        "expected": clients * messages,
+        "connect_seconds": round(connect_seconds, 3),
+        "connect_ops": (connected - before).total(),
+        "ops_per_message": round((finished - connected).total() / messages, 3),
+        "commands": dict(finished - before),
+    }
+    if latencies:
+        latency = summarize(latencies)
+        summary.update((key, latency[key]) for key in ("p50_ms", "p95_ms", "p99_ms"))
+    return summary
+
+
+def run_fanout_benchmarks(
+    layers: List[str],
+    client_counts: List[int],
+    messages: int,
+    interval: float = 0.01,
+    timeout: float = 60,
+    redis_url: str | None = None,
+    progress: Callable[[str, dict], None] | None = None,
+) -> dict:
+    """
+    Benchmark notification fan-out for every layer and number of clients.
+
+    Without ``redis_url`` the Redis layers connect to a ``PubSubStandIn``,
+    which only the "pubsub" layer can use.
+
+    Args:
+        layers: keys of ``CHANNEL_LAYER_BACKENDS``
+        client_counts: numbers of connected clients
+        messages: broadcasts per case
+        interval: seconds between broadcasts
+        timeout: seconds to wait for the last deliveries of a case
+        redis_url: Redis to benchmark against, ideally a local throwaway one
+        progress: callback receiving the name and summary of every finished case
+
+    Returns:
+        Report with the environment and one summary per ``layer/clients`` case
+
+    Raises:
+        ValueError: if a layer is unknown or needs a real Redis
+    """
+    configs = {name: layer_config(name, redis_url) for name in layers}
+    stand_in = None
+    if redis_url is None and any("CONFIG" in config for config in configs.values()):
+        if "redis" in layers:
+            raise ValueError("The redis layer needs a real Redis, pass its URL")
+        stand_in = PubSubStandIn()
+        url = stand_in.start()
+        configs = {name: layer_config(name, url) for name in layers}
+
+    results = {}
+    try:
+        for name, config in configs.items():
+            for clients in client_counts:
+                case = f"{name}/{clients}"
+                summary = asyncio.run(
+                    run_case(config, clients, messages, interval, timeout)
+                )
+                results[case] = summary
+                if progress:
+                    progress(case, summary)
+    finally:
+        if stand_in is not None:
+            stand_in.stop()
+
+    report = {"environment": environment(), "results": results}
+    report["environment"]["redis"] = redis_url or "stand-in"
+    return report
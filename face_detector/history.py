@@ -0,0 +1,262 @@
+import base64
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import List
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .metrics import inc
+from .models import DetectionRecord
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_CONFIG = {
+    "ENABLED": True,
+    "BATCH_SIZE": 500,
+    "FLUSH_INTERVAL": 1.0,
+    "MAX_PENDING": 50_000,
+    "PAGE_SIZE": 50,
+    "MAX_PAGE_SIZE": 500,
+}
+
+
+def history_config() -> dict:
+    """Return the ``FACE_DETECTION_HISTORY`` setting merged over the defaults."""
+    return {**DEFAULT_HISTORY_CONFIG, **getattr(settings, "FACE_DETECTION_HISTORY", {})}
+
+
+class HistoryWriter:
+    """
+    Buffers detection records and inserts them in batches.
+
+    A background thread inserts the buffer every ``flush_interval`` seconds,
+    or as soon as ``batch_size`` records are waiting, with one multi-row
+    insert per batch. Records beyond ``max_pending`` are dropped and
+    counted, so a slow or unavailable database never holds up uploads.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: List[DetectionRecord] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, record: DetectionRecord) -> None:
+        with self._lock:
+            dropped = len(self.pending) >= self.max_pending
+            if not dropped:
+                self.pending.append(record)
+            full = len(self.pending) >= self.batch_size
+        if dropped:
+            inc("face_detection_history_dropped_total")
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Insert every buffered record now.
+
+        Returns:
+            Number of records inserted
+        """
+        with self._flush_lock:
+            with self._lock:
+                records, self.pending = self.pending, []
+            written = 0
+            for start in range(0, len(records), self.batch_size):
+                batch = records[start : start + self.batch_size]
+                try:
+                    DetectionRecord.objects.bulk_create(batch)
+                except DatabaseError:
+                    logger.exception("Failed to write %d detection records", len(batch))
+                    inc("face_detection_history_dropped_total", len(batch))
+                else:
+                    written += len(batch)
+            return written
+
+    def start(self) -> None:
+        """Start the thread flushing the buffer in the background."""
+        self._thread = threading.Thread(
+            target=self._run, name="face-detection-history", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread after a last flush."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            # The thread keeps its own connection, drop it if it went stale
+            close_old_connections()
+        self.flush()
+
+
+_writer: HistoryWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> HistoryWriter | None:
+    """Return the process-wide history writer, or ``None`` if history is disabled."""
+    global _writer
+    config = history_config()
+    if not config["ENABLED"]:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = HistoryWriter(
+                    config["BATCH_SIZE"],
+                    config["FLUSH_INTERVAL"],
+                    config["MAX_PENDING"],
+                )
+                writer.start()
+                _writer = writer
+    return _writer
+
+
+def reset_writer() -> None:
+    """Flush and drop the process-wide writer, mainly for tests."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+
+
+def _forget_writer() -> None:
+    # The flushing thread does not survive fork, a forked worker starts its own
+    global _writer, _writer_lock
+    _writer = None
+    _writer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_writer)
+
+
+def record(
+    result: dict,
+    content_hash: str,
+    profile: str,
+    source: str | None = None,
+    timings: dict | None = None,
+) -> None:
+    """
+    Queue a detection result for the history.
+
+    Args:
+        result: detection result as returned by ``DetectionResult.as_dict``
+        content_hash: ``cache.content_hash`` of the upload
+        profile: name of the detection profile
+        source: source tag of the upload
+        timings: seconds spent in each stage of the request
+    """
+    writer = get_writer()
+    if writer is None:
+        return
+    writer.add(
+        DetectionRecord(
+            created_at=timezone.now(),
+            content_hash=content_hash,
+            width=result["width"],
+            height=result["height"],
+            faces_detected=len(result["boxes"]),
+            boxes=result["boxes"],
+            profile=profile,
+            source=source,
+            processed_path=result["processed_path"],
+            timings={
+                stage: round(seconds, 6) for stage, seconds in (timings or {}).items()
+            },
+        )
+    )
+
+
+def encode_cursor(record: DetectionRecord) -> str:
+    """Build the opaque cursor of the page following ``record``."""
+    position = json.dumps([record.created_at.isoformat(), record.pk])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Read a cursor built by ``encode_cursor``.
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def page(
+    queryset: QuerySet, limit: int, cursor: str | None = None
+) -> tuple[List[DetectionRecord], str | None]:
+    """
+    Read one page of records, newest first, by keyset pagination.
+
+    Pages continue below the ``(created_at, id)`` of the last record of the
+    previous page, which an index seeks to directly, so deep pages cost the
+    same as the first one. Records inserted meanwhile never shift pages.
+
+    Args:
+        queryset: filtered records
+        limit: maximum number of records on the page
+        cursor: ``next_cursor`` of the previous page, ``None`` for the first page
+
+    Returns:
+        Records of the page and the cursor of the next page, ``None`` on the last
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # The first filter bounds the index range, the second skips the
+        # records of the previous page sharing its last timestamp
+        queryset = queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(pk__lt=pk)
+        )
+    records = list(queryset.order_by("-created_at", "-pk")[: limit + 1])
+    if len(records) > limit:
+        return records[:limit], encode_cursor(records[limit - 1])
+    return records, None
+
+
+def as_dict(record: DetectionRecord) -> dict:
+    """Return a record as a JSON-serializable dictionary."""
+    return {
+        "id": record.pk,
+        "created_at": record.created_at.isoformat(),
+        "content_hash": record.content_hash,
+        "width": record.width,
+        "height": record.height,
+        "faces_detected": record.faces_detected,
+        "boxes": record.boxes,
+        "profile": record.profile,
+        "source": record.source,
+        "processed_path": record.processed_path,
+        "timings": record.timings,
+    }
@@ -0,0 +1,374 @@
+import abc
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from . import history
+from .cache import content_hash
+from .detector import OutputOptions, default_output
+from .executor import (
+    DetectionExecutor,
+    ExecutorBusy,
+    detect_bytes,
+    detect_image,
+    get_executor,
+)
+from .metrics import inc, record_timings
+from .notifications import send_notification
+from .profiles import get_profile
+from .rendering import defer_render, renders_lazily
+from .retention import shard_directory
+from .video import process_video, video_config
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+IMAGE = "image"
+VIDEO = "video"
+
+DEFAULT_JOBS_CONFIG = {
+    "BACKEND": "local",
+    "WORKERS": 2,
+    "REDIS_URL": "redis://localhost:6379/0",
+    "QUEUE_KEY": "face_detection:jobs",
+    "RESULT_TTL": 3600,
+    "MAX_LOCAL_JOBS": 10000,
+    "QUEUE_SIZE": 100,
+    "RETRY_AFTER": 5,
+}
+
+
+def jobs_config() -> dict:
+    """Return the ``FACE_DETECTION_JOBS`` setting merged over the defaults."""
+    return {**DEFAULT_JOBS_CONFIG, **getattr(settings, "FACE_DETECTION_JOBS", {})}
+
+
+def new_job(
+    upload_name: str,
+    media_url: str,
+    kind: str = IMAGE,
+    options: dict | None = None,
+    source: str | None = None,
+) -> dict:
+    """
+    Build the record of a queued detection job.
+
+    Args:
+        upload_name: name of the stored upload relative to the storage root
+        media_url: absolute URL prefix of the media directory
+        kind: ``image`` or ``video``
+        options: kind specific options, e.g. ``detect_every`` for videos
+        source: source tag of the upload, used to route notifications
+
+    Returns:
+        Job record, a JSON-serializable dictionary
+    """
+    now = time.time()
+    return {
+        "job_id": str(uuid.uuid4()),
+        "kind": kind,
+        "status": QUEUED,
+        "upload": upload_name,
+        "media_url": media_url,
+        "options": options or {},
+        "source": source,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _notify(job: dict, message: dict) -> None:
+    """Send a notification about a job to the clients subscribed to it."""
+    message = {**message, "job_id": job["job_id"]}
+    if job.get("source"):
+        message["source"] = job["source"]
+    send_notification(message)
+
+
+def _run_image_job(backend: "JobBackend", job: dict) -> tuple[dict, dict]:
+    output = job["options"].get("output")
+    output = OutputOptions(**output) if output else default_output()
+    lazy = renders_lazily(output)
+    with default_storage.open(job["upload"]) as upload:
+        content = upload.read()
+    # Detection shares the bounded executor with uploads, waiting for a slot
+    result = (
+        get_executor()
+        .submit(
+            detect_bytes,
+            content,
+            job["job_id"],
+            profile=job["options"].get("profile"),
+            output=OutputOptions(annotate=False) if lazy else output,
+            block=True,
+        )
+        .result()
+    )
+    if lazy:
+        result = defer_render(job["upload"], job["job_id"], result, output)
+    record_timings(result.timings)
+    inc("face_detection_faces_total", result.faces_detected)
+    history.record(
+        result.as_dict(),
+        content_hash(content),
+        get_profile(job["options"].get("profile")).name,
+        source=job.get("source"),
+        timings=result.timings,
+    )
+    outcome = {"faces_detected": result.faces_detected, "boxes": result.boxes}
+    if result.processed_path is not None:
+        outcome["image_url"] = f"{job['media_url']}{result.processed_path}"
+    message = {
+        "type": "face_detection_notification",
+        "faces_detected": result.faces_detected,
+    }
+    if "image_url" in outcome:
+        message["image_url"] = outcome["image_url"]
+    return outcome, message
+
+
+def _run_video_job(backend: "JobBackend", job: dict) -> tuple[dict, dict]:
+    config = video_config()
+    options = job["options"]
+
+    def progress(frames_processed: int, total_frames: int) -> None:
+        backend.save(
+            {
+                **job,
+                "status": RUNNING,
+                "frames_processed": frames_processed,
+                "total_frames": total_frames,
+            }
+        )
+        _notify(
+            job,
+            {
+                "type": "face_detection_progress_notification",
+                "frames_processed": frames_processed,
+                "total_frames": total_frames,
+            },
+        )
+
+    output_dir = shard_directory("processed", job["job_id"])
+
+    def detect_faces(frame):
+        return (
+            get_executor()
+            .submit(detect_image, frame, profile=options.get("profile"), block=True)
+            .result()
+        )
+
+    summary = process_video(
+        detect_faces,
+        Path(default_storage.path(job["upload"])),
+        Path(settings.MEDIA_ROOT) / output_dir,
+        job["job_id"],
+        detect_every=options.get("detect_every", config["DETECT_EVERY"]),
+        annotate=options.get("annotate", False),
+        progress=progress,
+        progress_every=config["PROGRESS_EVERY"],
+    )
+    outcome = {
+        "results_url": f"{job['media_url']}{output_dir / summary['results']}",
+        "video_url": (
+            f"{job['media_url']}{output_dir / summary['video']}"
+            if summary["video"]
+            else None
+        ),
+        "frames": summary["frames"],
+        "keyframes": summary["keyframes"],
+        "max_faces": summary["max_faces"],
+    }
+    return outcome, {"type": "face_detection_video_notification", **outcome}
+
+
+def run_job(backend: "JobBackend", job: dict) -> dict:
+    """
+    Run face detection for a job, store the outcome and notify WebSocket clients.
+
+    Args:
+        backend: backend where the job state is stored
+        job: job record created by ``new_job``
+
+    Returns:
+        Updated job record
+    """
+    job = backend.save({**job, "status": RUNNING})
+    run = _run_video_job if job.get("kind") == VIDEO else _run_image_job
+    try:
+        outcome, message = run(backend, job)
+    except Exception as e:
+        logger.exception("Detection job %s failed", job["job_id"])
+        job = backend.save({**job, "status": FAILED, "error": str(e)})
+        _notify(job, {"type": "face_detection_job_failed", "error": job["error"]})
+        return job
+
+    job = backend.save({**job, **outcome, "status": DONE})
+    _notify(job, message)
+    return job
+
+
+class JobBackend(abc.ABC):
+    """Stores job state and hands queued jobs to workers."""
+
+    @abc.abstractmethod
+    def submit(self, job: dict) -> dict:
+        """Queue a job and return its saved record."""
+
+    @abc.abstractmethod
+    def save(self, job: dict) -> dict:
+        """Store the state of a job and return the saved record."""
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        """Return the record of a job, ``None`` if it is unknown or expired."""
+
+
+class LocalJobBackend(JobBackend):
+    """
+    Runs jobs on a thread pool inside the web server process.
+
+    Job state lives in memory, only the most recent ``MAX_LOCAL_JOBS``
+    jobs are kept, so status is only available from the same process. At
+    most ``queue_size`` jobs are queued or running, further jobs are rejected
+    with ExecutorBusy.
+    """
+
+    def __init__(
+        self, workers: int, max_jobs: int, queue_size: int = 100, retry_after: int = 5
+    ):
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = DetectionExecutor(
+            ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="face-detection-job"
+            ),
+            queue_size,
+            retry_after,
+            name="jobs",
+        )
+
+    def submit(self, job: dict) -> dict:
+        job = self.save(job)
+        try:
+            self._executor.submit(run_job, self, job)
+        except ExecutorBusy:
+            with self._lock:
+                self._jobs.pop(job["job_id"], None)
+            raise
+        return job
+
+    def save(self, job: dict) -> dict:
+        job = {**job, "updated_at": time.time()}
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._jobs.move_to_end(job["job_id"])
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.executor.shutdown(wait=wait)
+
+
+class RedisJobBackend(JobBackend):
+    """
+    Queues jobs in Redis for ``manage.py detection_worker`` processes.
+
+    Job records are stored as JSON strings that expire after ``RESULT_TTL``
+    seconds, so any web process can report the status of any job.
+    """
+
+    def __init__(self, url: str, queue_key: str, result_ttl: int):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.queue_key = queue_key
+        self.result_ttl = result_ttl
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.queue_key}:{job_id}"
+
+    def submit(self, job: dict) -> dict:
+        job = self.save(job)
+        self.redis.lpush(self.queue_key, job["job_id"])
+        return job
+
+    def save(self, job: dict) -> dict:
+        job = {**job, "updated_at": time.time()}
+        self.redis.set(
+            self._job_key(job["job_id"]), json.dumps(job), ex=self.result_ttl
+        )
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        value = self.redis.get(self._job_key(job_id))
+        return json.loads(value) if value is not None else None
+
+    def pop(self, timeout: int = 5) -> dict | None:
+        """
+        Wait for the next queued job.
+
+        Args:
+            timeout: maximum number of seconds to block
+
+        Returns:
+            Job record or ``None`` if no job was queued in time
+        """
+        item = self.redis.brpop([self.queue_key], timeout=timeout)
+        if item is None:
+            return None
+        return self.get(item[1].decode())
+
+
+_backend: JobBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> JobBackend:
+    """Return the process-wide job backend configured by ``FACE_DETECTION_JOBS``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = jobs_config()
+                if config["BACKEND"] == "redis":
+                    _backend = RedisJobBackend(
+                        config["REDIS_URL"], config["QUEUE_KEY"], config["RESULT_TTL"]
+                    )
+                elif config["BACKEND"] == "local":
+                    _backend = LocalJobBackend(
+                        config["WORKERS"],
+                        config["MAX_LOCAL_JOBS"],
+                        config["QUEUE_SIZE"],
+                        config["RETRY_AFTER"],
+                    )
+                else:
+                    raise ValueError(f"Unknown job backend: {config['BACKEND']}")
+    return _backend
+
+
+def reset_backend() -> None:
+    """Drop the cached backend, mainly for tests."""
+    global _backend
+    with _backend_lock:
+        if isinstance(_backend, LocalJobBackend):
+            _backend.shutdown()
+        _backend = None
@@ -0,0 +1,129 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from face_detector.benchmark import (
+    FACE_COUNTS,
+    RESOLUTIONS,
+    STAGES,
+    benchmark_images,
+    compare,
+    load_report,
+    run_benchmarks,
+    save_report,
+)
+
+DEFAULT_FIXTURE = Path(settings.BASE_DIR) / "tests/face_detector/testdata/face1.jpg"
+
+
+def comma_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark detect_faces, process_image and upload_image on synthetic "
+        "and fixture images, optionally comparing with a saved baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--resolutions",
+            type=comma_list,
+            default=list(RESOLUTIONS),
+            help=f"Comma separated resolutions out of {', '.join(RESOLUTIONS)}.",
+        )
+        parser.add_argument(
+            "--faces",
+            type=lambda value: [int(item) for item in comma_list(value)],
+            default=list(FACE_COUNTS),
+            help="Comma separated numbers of faces per synthetic image.",
+        )
+        parser.add_argument(
+            "--stages",
+            type=comma_list,
+            default=list(STAGES),
+            help=f"Comma separated stages out of {', '.join(STAGES)}.",
+        )
+        parser.add_argument(
+            "--fixture",
+            action="append",
+            type=Path,
+            help="Real photo to benchmark, may be repeated. The first one is "
+            "also placed in synthetic images.",
+        )
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--warmup", type=int, default=1)
+        parser.add_argument(
+            "--save", type=Path, help="Write the results as a JSON baseline."
+        )
+        parser.add_argument(
+            "--compare", type=Path, help="JSON baseline to compare the results with."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.1,
+            help="Relative p50 slowdown reported as a regression.",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error if any case regressed.",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["resolutions"]) - set(RESOLUTIONS)
+        unknown |= set(options["stages"]) - set(STAGES)
+        if unknown:
+            raise CommandError(f"Unknown resolutions or stages: {', '.join(unknown)}")
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1")
+        baseline = load_report(options["compare"]) if options["compare"] else None
+
+        images = benchmark_images(
+            options["resolutions"],
+            options["faces"],
+            options["fixture"] or [DEFAULT_FIXTURE],
+        )
+        self.stdout.write(
+            f"{'case':<40} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'faces':>6}"
+        )
+        report = run_benchmarks(
+            images,
+            options["stages"],
+            options["iterations"],
+            options["warmup"],
+            progress=self.write_summary,
+        )
+
+        if options["save"]:
+            save_report(report, options["save"])
+            self.stdout.write(f"Saved baseline to {options['save']}")
+        if baseline is None:
+            return
+
+        comparison = compare(report, baseline, options["tolerance"])
+        regressions = [entry for entry in comparison if entry["regression"]]
+        for entry in comparison:
+            line = (
+                f"{entry['case']:<40} {entry['baseline_p50_ms']:>9.2f} -> "
+                f"{entry['p50_ms']:>9.2f} ms ({entry['change']:+.1%})"
+            )
+            style = self.style.ERROR if entry["regression"] else self.style.SUCCESS
+            self.stdout.write(style(line))
+        self.stdout.write(
+            f"{len(regressions)} of {len(comparison)} cases regressed by more "
+            f"than {options['tolerance']:.0%}"
+        )
+        if regressions and options["fail_on_regression"]:
+            raise CommandError("Benchmark regressed")
+
+    def write_summary(self, name: str, summary: dict) -> None:
+        self.stdout.write(
+            f"{name:<40} {summary['ops_per_sec']:>9.2f} {summary['p50_ms']:>9.2f} "
+            f"{summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f} "
+            f"{summary['faces_detected']:>6}"
+        )
@@ -0,0 +1,158 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from face_detector.bulk import (
+    BulkProgress,
+    ManifestWriter,
+    OutputNames,
+    iter_directory,
+    iter_file_list,
+    read_manifest,
+    run_bulk,
+)
+from face_detector.detector import OUTPUT_FORMATS, OutputOptions
+from face_detector.executor import build_executor, executor_config
+from face_detector.profiles import get_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Detect faces in a directory tree or a list of files with a pool of "
+        "worker processes, writing one record per image to a JSONL or CSV "
+        "manifest. Files already in the manifest are skipped, so an "
+        "interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", nargs="?", type=Path, help="Tree to walk.")
+        parser.add_argument(
+            "--file-list",
+            type=Path,
+            help="Text file with one image path per line, instead of a directory.",
+        )
+        parser.add_argument(
+            "--manifest",
+            type=Path,
+            required=True,
+            help="Results file, CSV if it ends in .csv and JSON lines otherwise.",
+        )
+        parser.add_argument(
+            "--output-dir",
+            type=Path,
+            help="Also write annotated images here, mirroring the input names. "
+            "Absolute names are placed below it, names leading out of it fail.",
+        )
+        parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="jpeg")
+        parser.add_argument("--quality", type=int)
+        parser.add_argument("--max-dimension", type=int)
+        parser.add_argument("--profile", help="Detection profile to use.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of detection worker processes.",
+        )
+        parser.add_argument(
+            "--prefetch",
+            type=int,
+            default=32,
+            help="Number of files read ahead of detection.",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Process files again that failed in an earlier run.",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=float,
+            default=10,
+            help="Seconds between progress lines.",
+        )
+        parser.add_argument(
+            "--inline",
+            action="store_true",
+            help="Detect in this process, mostly useful for debugging.",
+        )
+
+    def handle(self, *args, **options):
+        if (options["directory"] is None) == (options["file_list"] is None):
+            raise CommandError("Pass either a directory or --file-list")
+        if options["directory"] is not None and not options["directory"].is_dir():
+            raise CommandError(f"{options['directory']} is not a directory")
+        try:
+            get_profile(options["profile"])
+            output = OutputOptions(
+                format=options["format"],
+                quality=options["quality"],
+                max_dimension=options["max_dimension"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+
+        done, taken = set(), set()
+        for record in read_manifest(options["manifest"]):
+            if record["success"] or not options["retry_failed"]:
+                done.add(record["path"])
+            if record["output"]:
+                taken.add(record["output"])
+        if done:
+            self.stdout.write(f"Resuming, {len(done)} files already in the manifest")
+
+        executor = build_executor(
+            {
+                **executor_config(),
+                "KIND": "inline" if options["inline"] else "process",
+                "WORKERS": options["workers"],
+                "QUEUE_SIZE": 2 * options["workers"],
+            }
+        )
+        reported_at = time.monotonic()
+
+        def progress(stats: BulkProgress) -> None:
+            nonlocal reported_at
+            if time.monotonic() - reported_at >= options["progress_every"]:
+                reported_at = time.monotonic()
+                self.write_progress(stats)
+
+        file_list = open(options["file_list"]) if options["file_list"] else None
+        try:
+            files = (
+                iter_file_list(file_list)
+                if file_list
+                else iter_directory(options["directory"])
+            )
+            with ManifestWriter(options["manifest"]) as writer:
+                stats = run_bulk(
+                    files,
+                    executor,
+                    writer,
+                    done=done,
+                    prefetch=options["prefetch"],
+                    progress=progress,
+                    outputs=(
+                        OutputNames(options["output_dir"], output.extension, taken)
+                        if options["output_dir"]
+                        else None
+                    ),
+                    profile=options["profile"],
+                    output=output,
+                )
+        finally:
+            if file_list:
+                file_list.close()
+            executor.shutdown()
+
+        self.write_progress(stats)
+        self.stdout.write(
+            self.style.SUCCESS(f"Done, {stats.skipped} files skipped as already done")
+        )
+
+    def write_progress(self, stats: BulkProgress) -> None:
+        self.stdout.write(
+            f"{stats.processed} processed, {stats.failed} failed, "
+            f"{stats.faces} faces, {stats.rate():.1f} images/s"
+        )
@@ -0,0 +1,68 @@
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from face_detector.jobs import RedisJobBackend, get_backend, run_job
+from face_detector.notifications import in_process_layer
+from face_detector.registry import warm_up
+
+
+class Command(BaseCommand):
+    help = "Run face detection jobs queued in Redis by uploads in async mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of jobs processed at the same time.",
+        )
+        parser.add_argument(
+            "--poll-timeout",
+            type=int,
+            default=5,
+            help="Seconds to block waiting for a job before checking for shutdown.",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not isinstance(backend, RedisJobBackend):
+            raise CommandError(
+                'Workers need FACE_DETECTION_JOBS["BACKEND"] set to "redis".'
+            )
+        if in_process_layer():
+            raise CommandError(
+                "Notifications of workers cannot reach the server through the "
+                "in-memory channel layer, use a Redis channel layer."
+            )
+
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("Finishing running jobs before shutdown...")
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        warm_up()
+        concurrency = options["concurrency"]
+        slots = threading.Semaphore(concurrency)
+        self.stdout.write(f"Detection worker started with {concurrency} slot(s)")
+
+        def run(job):
+            try:
+                run_job(backend, job)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while not stopping.is_set():
+                slots.acquire()
+                job = backend.pop(timeout=options["poll_timeout"])
+                if job is None:
+                    slots.release()
+                    continue
+                executor.submit(run, job)
@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from face_detector.evaluation import evaluate_profiles, load_labels
+from face_detector.profiles import get_profile, profile_names
+
+
+def comma_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure precision, recall and throughput of detection profiles on a "
+        "set of labelled images, to choose a profile with data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "labels",
+            type=Path,
+            help="JSON lines file with the path and expected boxes of every image.",
+        )
+        parser.add_argument(
+            "--profiles",
+            type=comma_list,
+            help="Comma separated profiles to compare, defaults to every profile.",
+        )
+        parser.add_argument(
+            "--iou",
+            type=float,
+            default=0.5,
+            help="Intersection over union needed to count a detection as correct.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=1,
+            help="Timed detections per image and profile.",
+        )
+        parser.add_argument("--save", type=Path, help="Write the results as JSON.")
+
+    def handle(self, *args, **options):
+        profiles = options["profiles"] or profile_names()
+        try:
+            for profile in profiles:
+                get_profile(profile)
+            labelled = load_labels(options["labels"])
+            if options["iterations"] < 1:
+                raise ValueError("--iterations must be at least 1")
+            results = evaluate_profiles(
+                profiles, labelled, options["iou"], options["iterations"]
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e)) from e
+
+        self.stdout.write(
+            f"{'profile':<16} {'images/s':>9} {'p50 ms':>9} {'precision':>9} "
+            f"{'recall':>9} {'f1':>9} {'tp':>6} {'fp':>6} {'fn':>6}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['profile']:<16} {result['ops_per_sec']:>9.2f} "
+                f"{result['p50_ms']:>9.2f} {result['precision']:>9.3f} "
+                f"{result['recall']:>9.3f} {result['f1']:>9.3f} "
+                f"{result['true_positives']:>6} {result['false_positives']:>6} "
+                f"{result['false_negatives']:>6}"
+            )
+        if options["save"]:
+            options["save"].write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Saved results to {options['save']}")
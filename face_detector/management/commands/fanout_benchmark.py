@@ -0,0 +1,102 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from face_detector.benchmark import save_report
+from face_detector.fanout import run_fanout_benchmarks
+
+
+def comma_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark notification fan-out through the channel layers: delivery "
+        "latency and Redis commands against the number of connected clients. "
+        "Redis layers use a local pub/sub stand-in unless --redis-url is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--layers",
+            type=comma_list,
+            help="Comma separated keys of CHANNEL_LAYER_BACKENDS, defaults to "
+            "pubsub,memory or, with --redis-url, to all of them.",
+        )
+        parser.add_argument(
+            "--clients",
+            type=lambda value: [int(item) for item in comma_list(value)],
+            default=[10, 100, 1000, 10000],
+            help="Comma separated numbers of connected clients.",
+        )
+        parser.add_argument("--messages", type=int, default=10)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.01,
+            help="Seconds between broadcasts.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to wait for the last deliveries of a case.",
+        )
+        parser.add_argument(
+            "--redis-url",
+            help="Local throwaway Redis to benchmark against instead of the "
+            "stand-in, e.g. redis://localhost:6379.",
+        )
+        parser.add_argument(
+            "--save", type=Path, help="Write the results as a JSON report."
+        )
+
+    def handle(self, *args, **options):
+        backends = getattr(settings, "CHANNEL_LAYER_BACKENDS", {})
+        layers = options["layers"] or (
+            list(backends) if options["redis_url"] else ["pubsub", "memory"]
+        )
+        unknown = set(layers) - set(backends)
+        if unknown:
+            raise CommandError(f"Unknown channel layers: {', '.join(unknown)}")
+        if "redis" in layers and not options["redis_url"]:
+            raise CommandError("The redis layer needs a real Redis, pass --redis-url")
+        if options["messages"] < 1 or min(options["clients"], default=0) < 1:
+            raise CommandError("--messages and --clients must be at least 1")
+
+        self.stdout.write(
+            f"{'case':<20} {'delivered':>10} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'connect ops':>12} {'ops/msg':>8}"
+        )
+        try:
+            report = run_fanout_benchmarks(
+                layers,
+                options["clients"],
+                options["messages"],
+                interval=options["interval"],
+                timeout=options["timeout"],
+                redis_url=options["redis_url"],
+                progress=self.write_summary,
+            )
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+
+        if options["save"]:
+            save_report(report, options["save"])
+            self.stdout.write(f"Saved report to {options['save']}")
+
+    def write_summary(self, name: str, summary: dict) -> None:
+        delivered = summary["delivered"] / summary["expected"]
+        latency = " ".join(
+            f"{summary[key]:>9.2f}" if key in summary else f"{'-':>9}"
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        )
+        style = self.style.SUCCESS if delivered == 1 else self.style.ERROR
+        self.stdout.write(
+            style(
+                f"{name:<20} {delivered:>10.1%} {latency} "
+                f"{summary['connect_ops']:>12} {summary['ops_per_message']:>8.2f}"
+            )
+        )
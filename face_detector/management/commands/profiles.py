@@ -0,0 +1,73 @@
+import io
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+
+from face_detector.profiling import load_profiles, profile_directory
+
+
+class Command(BaseCommand):
+    help = (
+        "List the slowest captured request profiles and summarize where they "
+        "spent time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top", type=int, default=10, help="Number of profiles to list."
+        )
+        parser.add_argument(
+            "--functions",
+            type=int,
+            default=0,
+            help="Also print this many functions with the highest cumulative "
+            "time for every listed profile.",
+        )
+        parser.add_argument(
+            "--show", help="Print the full function statistics of one profile id."
+        )
+
+    def handle(self, *args, **options):
+        directory = profile_directory()
+        if options["show"]:
+            path = directory / f"{options['show']}.prof"
+            if not path.exists():
+                raise CommandError(f"No profile {options['show']} in {directory}")
+            self.stdout.write(self.function_stats(path, limit=None))
+            return
+
+        profiles = load_profiles()[: options["top"]]
+        if not profiles:
+            self.stdout.write(f"No profiles captured in {directory}")
+            return
+
+        self.stdout.write(
+            f"{'id':<26} {'ms':>9} {'status':>6} {'size':>11} {'faces':>5}  "
+            "slowest stages"
+        )
+        for info in profiles:
+            size = f"{info['width']}x{info['height']}" if "width" in info else "-"
+            stages = sorted(info["timings"].items(), key=lambda item: -item[1])[:3]
+            self.stdout.write(
+                f"{info['id']:<26} {info['duration'] * 1000:>9.1f} "
+                f"{info['status']:>6} {size:>11} {info.get('faces', '-'):>5}  "
+                + ", ".join(
+                    f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in stages
+                )
+            )
+            if options["functions"]:
+                self.stdout.write(
+                    self.function_stats(
+                        directory / f"{info['id']}.prof", options["functions"]
+                    )
+                )
+
+    def function_stats(self, path, limit: int | None) -> str:
+        output = io.StringIO()
+        stats = pstats.Stats(str(path), stream=output)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE)
+        if limit is None:
+            stats.print_stats()
+        else:
+            stats.print_stats(limit)
+        return output.getvalue()
@@ -0,0 +1,88 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from face_detector.jobs import jobs_config
+from face_detector.notifications import in_process_layer
+from face_detector.serving import PreforkServer, bind_socket, preload
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the ASGI application in production with pre-forked Daphne "
+        "workers sharing one socket. The application, OpenCV and the cascades "
+        "are loaded once before forking. SIGHUP replaces the workers, SIGTERM "
+        "stops them gracefully. Use with face_detection.settings_production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bind", default="127.0.0.1:8282", help="Address as host:port."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes.",
+        )
+        parser.add_argument(
+            "--max-requests",
+            type=int,
+            default=0,
+            help="Replace a worker after this many HTTP requests, 0 never does.",
+        )
+        parser.add_argument(
+            "--max-requests-jitter",
+            type=int,
+            default=0,
+            help="Add up to this many requests to the limit of each worker.",
+        )
+        parser.add_argument(
+            "--graceful-timeout",
+            type=float,
+            default=30,
+            help="Seconds stopping workers are given to finish running requests.",
+        )
+        parser.add_argument("--backlog", type=int, default=2048)
+        parser.add_argument(
+            "--http-timeout",
+            type=int,
+            help="Seconds a request may run before it is answered with 503.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1")
+        if options["workers"] > 1 and in_process_layer():
+            raise CommandError(
+                "The in-memory channel layer only reaches the clients of one "
+                "worker, use --workers 1 or a Redis channel layer."
+            )
+        if options["workers"] > 1 and jobs_config()["BACKEND"] == "local":
+            raise CommandError(
+                "The local job backend keeps jobs in the memory of one worker, "
+                'use --workers 1 or set FACE_DETECTION_JOBS["BACKEND"] to "redis".'
+            )
+        try:
+            application = preload(settings.ASGI_APPLICATION)
+            sock = bind_socket(options["bind"], options["backlog"])
+        except (OSError, RuntimeError, ValueError) as e:
+            raise CommandError(str(e)) from e
+
+        self.stdout.write(f"Listening on {options['bind']}")
+        try:
+            PreforkServer(
+                application,
+                sock,
+                workers=options["workers"],
+                max_requests=options["max_requests"],
+                max_requests_jitter=options["max_requests_jitter"],
+                graceful_timeout=options["graceful_timeout"],
+                log=self.stdout.write,
+                http_timeout=options["http_timeout"],
+                application_close_timeout=options["graceful_timeout"],
+                verbosity=options["verbosity"],
+            ).run()
+        finally:
+            sock.close()
@@ -0,0 +1,63 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from face_detector.retention import retention_config, sweep_configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete uploaded and processed media past its TTL, then the oldest files "
+        "of directories over their size cap, as configured in FACE_DETECTION_RETENTION."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            action="append",
+            help="Directory to sweep, may be repeated. Defaults to every "
+            "configured one.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be deleted without deleting anything.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running and sweep every this many seconds, instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        configured = retention_config()["DIRECTORIES"]
+        unknown = set(options["directory"] or []) - set(configured)
+        if unknown:
+            raise CommandError(
+                f"Directories without retention settings: {', '.join(sorted(unknown))}"
+            )
+
+        if options["interval"] is None:
+            self.sweep(options)
+            return
+
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        while not stopping.is_set():
+            self.sweep(options)
+            stopping.wait(options["interval"])
+
+    def sweep(self, options) -> None:
+        for stats in sweep_configured(options["directory"], options["dry_run"]):
+            verb = "Would delete" if options["dry_run"] else "Deleted"
+            self.stdout.write(
+                f"{stats.directory}: {stats.files} files, {stats.bytes} bytes. "
+                f"{verb} {stats.expired} expired and {stats.evicted} over the size "
+                f"cap, freeing {stats.freed_bytes} bytes"
+            )
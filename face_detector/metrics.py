@@ -0,0 +1,395 @@
+import asyncio
+import atexit
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, Iterator
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_CONFIG = {
+    "ENABLED": True,
+    "DIRECTORY": None,
+    "FLUSH_INTERVAL": 5,
+}
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HELP = {
+    "face_detection_stage_seconds": "Time spent in each stage of processing an upload.",
+    "face_detection_request_seconds": "Time spent handling a request, by view.",
+    "face_detection_requests_total": "Requests handled, by view and status code.",
+    "face_detection_faces_total": "Faces detected in processed uploads.",
+    "face_detection_upload_bytes_total": "Bytes of uploaded images.",
+    "face_detection_classifier_pool_total": "Classifier borrows, by cascade and "
+    "whether an idle classifier was reused, one was loaded or the caller waited.",
+    "face_detection_result_cache_total": "Result cache lookups, by outcome.",
+    "face_detection_render_cache_total": "Rendered image cache lookups, by outcome.",
+    "face_detection_executor_tasks_total": "Tasks submitted to the detection and "
+    "job executors, or rejected as the queue was full.",
+    "face_detection_executor_rebuilds_total": "Process pools replaced after a "
+    "worker died.",
+    "face_detection_history_dropped_total": "Detection records not written to "
+    "the history.",
+}
+# Private metrics directory shared with the detection worker processes when
+# no DIRECTORY is configured
+PRIVATE_DIRECTORY_ENV = "FACE_DETECTION_METRICS_PRIVATE_DIR"
+
+_timings: ContextVar[Dict[str, float] | None] = ContextVar("timings", default=None)
+
+
+def metrics_config() -> dict:
+    """Return the ``FACE_DETECTION_METRICS`` setting merged over the defaults."""
+    return {**DEFAULT_METRICS_CONFIG, **getattr(settings, "FACE_DETECTION_METRICS", {})}
+
+
+def _series(name: str, labels: dict) -> str:
+    return json.dumps([name, sorted(labels.items())])
+
+
+class Registry:
+    """
+    In-process counters and histograms.
+
+    Series are keyed by their name and labels. Recording takes a lock and a
+    few dictionary operations, so it is cheap enough for every request.
+
+    With a ``directory``, the registry writes a snapshot of itself there at
+    most every ``flush_interval`` seconds, so the ``/metrics`` endpoint of any
+    server process can add up the metrics of all processes. Counters only
+    cover live processes: a process removes its snapshot when it exits, and
+    snapshots of processes that died without doing so are removed when
+    collected. Totals therefore go down when a worker is replaced, which
+    Prometheus handles as a counter reset.
+    """
+
+    def __init__(self, directory: str | None = None, flush_interval: float = 5):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            atexit.register(self.close)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add ``value`` to a counter."""
+        key = _series(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._maybe_flush()
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record a value in a histogram with the latency ``BUCKETS``."""
+        key = _series(name, labels)
+        with self._lock:
+            # Counts per bucket, then the +Inf count and the sum
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+            for index, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram[index] += 1
+                    break
+            else:
+                histogram[len(BUCKETS)] += 1
+            histogram[-1] += value
+        self._maybe_flush()
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable copy of every series."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {
+                    key: list(values) for key, values in self.histograms.items()
+                },
+            }
+
+    def _maybe_flush(self) -> None:
+        if (
+            self.directory is not None
+            and time.monotonic() - self._flushed_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def _path(self, pid: int) -> Path:
+        return self.directory / f"metrics-{pid}.json"
+
+    def flush(self) -> None:
+        """Write the snapshot of this process to the shared directory."""
+        if self.directory is None:
+            return
+        self._flushed_at = time.monotonic()
+        path = self._path(os.getpid())
+        temporary = path.with_suffix(".tmp")
+        try:
+            temporary.write_text(json.dumps(self.snapshot()))
+            temporary.replace(path)
+        except OSError:
+            logger.warning("Failed to write metrics to %s", path, exc_info=True)
+
+    def close(self) -> None:
+        """Remove the snapshot of this process, which is exiting."""
+        if self.directory is not None:
+            self._path(os.getpid()).unlink(missing_ok=True)
+
+    def collect(self) -> dict:
+        """
+        Add up the snapshots of every process sharing the directory.
+
+        Returns:
+            Combined snapshot, or the snapshot of this process without a directory
+        """
+        if self.directory is None:
+            return self.snapshot()
+        self.flush()
+        combined = {"counters": {}, "histograms": {}}
+        for path in self.directory.glob("metrics-*.json"):
+            pid = path.stem.removeprefix("metrics-")
+            if pid.isdigit() and not _alive(int(pid)):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for key, value in snapshot["counters"].items():
+                combined["counters"][key] = combined["counters"].get(key, 0) + value
+            for key, values in snapshot["histograms"].items():
+                total = combined["histograms"].setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+        return combined
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists but belongs to another user
+        return True
+    return True
+
+
+def _format_labels(labels: list, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def render_prometheus(snapshot: dict) -> str:
+    """
+    Format a snapshot in the Prometheus text exposition format.
+
+    Args:
+        snapshot: snapshot as returned by ``Registry.collect``
+
+    Returns:
+        Exposition text
+    """
+    # Family name -> one block of lines per series, buckets stay in order
+    families: Dict[str, list] = {}
+    for key, value in snapshot["counters"].items():
+        name, labels = json.loads(key)
+        families.setdefault(name, []).append(
+            [f"{name}{_format_labels(labels)} {value}"]
+        )
+    for key, values in snapshot["histograms"].items():
+        name, labels = json.loads(key)
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), values):
+            cumulative += count
+            lines.append(
+                f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}"
+            )
+        lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        families.setdefault(name, []).append(lines)
+
+    output = []
+    for name in sorted(families):
+        kind = "counter" if name.endswith("_total") else "histogram"
+        output.append(f"# HELP {name} {HELP.get(name, name)}")
+        output.append(f"# TYPE {name} {kind}")
+        for lines in sorted(families[name]):
+            output.extend(lines)
+    return "\n".join(output) + "\n"
+
+
+_registry: Registry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> Registry | None:
+    """Return the process-wide registry, or ``None`` if metrics are disabled."""
+    global _registry
+    config = metrics_config()
+    if not config["ENABLED"]:
+        return None
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                directory = config["DIRECTORY"] or _private_directory()
+                _registry = Registry(directory, config["FLUSH_INTERVAL"])
+    return _registry
+
+
+def _private_directory() -> str | None:
+    # Counters of detection worker processes, e.g. of the classifier pools,
+    # only reach /metrics through a directory, use one of our own if none is
+    # configured. Workers inherit it through the environment.
+    from .executor import executor_config
+
+    directory = os.environ.get(PRIVATE_DIRECTORY_ENV)
+    if directory is None and executor_config()["KIND"] == "process":
+        directory = tempfile.mkdtemp(prefix="face-detection-metrics-")
+        os.environ[PRIVATE_DIRECTORY_ENV] = directory
+    return directory
+
+
+def reset_registry() -> None:
+    """Drop the process-wide registry, mainly for tests."""
+    global _registry
+    with _registry_lock:
+        _registry = None
+
+
+def _forget_registry() -> None:
+    # A forked process starts counting from zero under its own pid, rather than
+    # reporting the counters of its parent a second time
+    global _registry, _registry_lock
+    _registry = None
+    _registry_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_registry)
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Add ``value`` to a counter of the process-wide registry."""
+    registry = get_registry()
+    if registry is not None:
+        registry.inc(name, value, **labels)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """
+    Record the duration of a processing stage.
+
+    The duration goes into the stage histogram and, inside a request
+    instrumented with ``instrument``, into its ``Server-Timing`` header.
+    """
+    registry = get_registry()
+    if registry is not None:
+        registry.observe("face_detection_stage_seconds", seconds, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0) + seconds
+
+
+def current_timings() -> Dict[str, float] | None:
+    """Return the stage timings of the request being instrumented, if any."""
+    return _timings.get()
+
+
+def record_timings(timings: Dict[str, float]) -> None:
+    """Record stage durations measured elsewhere, e.g. in a detection worker."""
+    for stage, seconds in timings.items():
+        record_stage(stage, seconds)
+
+
+@contextmanager
+def stopwatch(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    """Add the time spent in the block to ``timings[stage]`` without recording it."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - start
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the time spent in the block as a processing stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Format stage durations as a ``Server-Timing`` header value."""
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()
+    )
+
+
+def _finish(name: str, response, timings: dict, start: float) -> None:
+    elapsed = time.perf_counter() - start
+    registry = get_registry()
+    if registry is not None:
+        registry.observe("face_detection_request_seconds", elapsed, view=name)
+        registry.inc(
+            "face_detection_requests_total", view=name, status=response.status_code
+        )
+    if timings:
+        response["Server-Timing"] = server_timing({**timings, "total": elapsed})
+
+
+def instrument(view: Callable) -> Callable:
+    """
+    Time a sync or async view and count its responses by status code.
+
+    Stages recorded while the view runs are reported in the ``Server-Timing``
+    response header.
+    """
+    name = view.__name__
+
+    if asyncio.iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            timings = {}
+            token = _timings.set(timings)
+            start = time.perf_counter()
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                _timings.reset(token)
+            _finish(name, response, timings, start)
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _timings.reset(token)
+        _finish(name, response, timings, start)
+        return response
+
+    return wrapper
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="DetectionRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("content_hash", models.CharField(max_length=32)),
+                ("width", models.PositiveIntegerField()),
+                ("height", models.PositiveIntegerField()),
+                ("faces_detected", models.PositiveIntegerField()),
+                ("boxes", models.JSONField(default=list)),
+                ("profile", models.CharField(max_length=64)),
+                ("source", models.CharField(blank=True, max_length=64, null=True)),
+                (
+                    "processed_path",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                ("timings", models.JSONField(default=dict)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["created_at", "id"], name="detection_created_idx"
+                    ),
+                    models.Index(
+                        fields=["content_hash", "created_at", "id"],
+                        name="detection_hash_idx",
+                    ),
+                    models.Index(
+                        fields=["faces_detected", "created_at", "id"],
+                        name="detection_faces_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
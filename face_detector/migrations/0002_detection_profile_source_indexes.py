@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("face_detector", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="detectionrecord",
+            index=models.Index(
+                fields=["profile", "created_at", "id"], name="detection_profile_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="detectionrecord",
+            index=models.Index(
+                fields=["source", "created_at", "id"], name="detection_source_idx"
+            ),
+        ),
+    ]
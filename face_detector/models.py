@@ -0,0 +1,47 @@
+from django.db import models
+from django.utils import timezone
+
+
+class DetectionRecord(models.Model):
+    """
+    Persisted result of an image upload, listed by the ``detections`` view.
+
+    Records are written in batches by ``history.HistoryWriter``. Every index
+    ends with ``created_at`` and ``id``, the keyset the history is paged by,
+    so pages filtered on one exact ``content_hash``, ``faces_detected``,
+    ``profile`` or ``source`` are read in order from an index. Ranges of face
+    counts and combined filters still scan ``created_at`` order and discard
+    rows that do not match.
+    """
+
+    created_at = models.DateTimeField(default=timezone.now)
+    content_hash = models.CharField(max_length=32)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    faces_detected = models.PositiveIntegerField()
+    boxes = models.JSONField(default=list)
+    profile = models.CharField(max_length=64)
+    source = models.CharField(max_length=64, null=True, blank=True)
+    processed_path = models.CharField(max_length=255, null=True, blank=True)
+    timings = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="detection_created_idx"),
+            models.Index(
+                fields=["content_hash", "created_at", "id"], name="detection_hash_idx"
+            ),
+            models.Index(
+                fields=["faces_detected", "created_at", "id"],
+                name="detection_faces_idx",
+            ),
+            models.Index(
+                fields=["profile", "created_at", "id"], name="detection_profile_idx"
+            ),
+            models.Index(
+                fields=["source", "created_at", "id"], name="detection_source_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.content_hash} ({self.faces_detected} faces)"
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import re
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+FACES_GROUP = "faces"
+# Upload source tags end up in group names, which only allow a few characters
+SOURCE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+DEFAULT_MIN_FACES_GROUPS = (1, 2, 5, 10)
+MAX_SUBSCRIBED_JOBS = 100
+IN_MEMORY_LAYER = "channels.layers.InMemoryChannelLayer"
+
+# Consumer handler -> type of the message sent to clients and the fields it carries
+CLIENT_MESSAGES = {
+    "face_detection_notification": (
+        "face_detection_result",
+        ("image_url", "faces_detected", "job_id", "source"),
+    ),
+    "face_detection_job_failed": ("face_detection_failed", ("job_id", "error")),
+    "face_detection_batch_notification": (
+        "face_detection_batch_result",
+        ("results", "faces_detected", "source"),
+    ),
+    "face_detection_progress_notification": (
+        "face_detection_progress",
+        ("job_id", "frames_processed", "total_frames"),
+    ),
+    "face_detection_video_notification": (
+        "face_detection_video_result",
+        ("job_id", "results_url", "video_url", "frames", "max_faces"),
+    ),
+}
+# Fields kept next to the encoded text so consumers can filter without decoding
+ROUTING_FIELDS = ("faces_detected", "job_id", "event_id")
+
+_pending_tasks: set[asyncio.Task] = set()
+
+
+def encode_client_message(event: dict, handler: str | None = None) -> str:
+    """
+    Serialize the JSON message WebSocket clients receive for an event.
+
+    Args:
+        event: channel layer message
+        handler: consumer handler the event is meant for, defaults to its ``type``
+
+    Returns:
+        JSON text sent to clients
+    """
+    client_type, fields = CLIENT_MESSAGES[handler or event["type"]]
+    payload = {"type": client_type}
+    payload.update((field, event[field]) for field in fields if field in event)
+    return json.dumps(payload)
+
+
+def min_faces_groups() -> tuple[int, ...]:
+    """Return the ascending face count thresholds that have their own group."""
+    return tuple(
+        sorted(
+            getattr(
+                settings, "FACE_DETECTION_MIN_FACES_GROUPS", DEFAULT_MIN_FACES_GROUPS
+            )
+        )
+    )
+
+
+def in_process_layer() -> bool:
+    """Tell whether the default channel layer only reaches this process."""
+    layers = getattr(settings, "CHANNEL_LAYERS", {})
+    return layers.get("default", {}).get("BACKEND") == IN_MEMORY_LAYER
+
+
+def job_group(job_id: str) -> str:
+    """Return the group receiving the notifications of one job."""
+    return f"{FACES_GROUP}.job.{job_id}"
+
+
+def source_group(source: str) -> str:
+    """Return the group receiving the notifications of uploads with a source tag."""
+    return f"{FACES_GROUP}.source.{source}"
+
+
+def min_faces_group(threshold: int) -> str:
+    """Return the group receiving the notifications of one face count bucket."""
+    return f"{FACES_GROUP}.min_faces.{threshold}"
+
+
+def min_faces_bucket(faces: int) -> int | None:
+    """
+    Find the bucket of a face count, the largest threshold not above it.
+
+    Args:
+        faces: number of detected faces
+
+    Returns:
+        Threshold of the bucket, or ``None`` if below the smallest threshold
+    """
+    bucket = None
+    for threshold in min_faces_groups():
+        if threshold <= faces:
+            bucket = threshold
+    return bucket
+
+
+def valid_source(source: str) -> bool:
+    """Tell whether an upload source tag can be used for routing."""
+    return bool(SOURCE_PATTERN.match(source))
+
+
+def target_groups(message: dict) -> list[str]:
+    """
+    List the groups a message is sent to, besides the faces group.
+
+    Every message goes to at most one group per filter: the group of its
+    job, of its upload source and of its face count bucket. Subscribers of
+    a face count join all buckets from theirs upwards.
+
+    Args:
+        message: channel layer message
+
+    Returns:
+        Names of the targeted groups
+    """
+    groups = []
+    if message.get("job_id"):
+        groups.append(job_group(message["job_id"]))
+    if message.get("source"):
+        groups.append(source_group(message["source"]))
+    if message.get("faces_detected") is not None:
+        bucket = min_faces_bucket(message["faces_detected"])
+        if bucket is not None:
+            groups.append(min_faces_group(bucket))
+    return groups
+
+
+def subscription_groups(filters: dict) -> list[str]:
+    """
+    List the groups a WebSocket client joins for its subscription filters.
+
+    Job ids and a source tag select the matching notifications, a minimum
+    face count alone selects the face count buckets. Without filters the
+    client stays in the faces group and receives everything.
+
+    Args:
+        filters: ``job_ids``, ``source`` and ``min_faces`` sent by the client
+
+    Returns:
+        Names of the groups to join
+
+    Raises:
+        ValueError: if a filter is malformed
+    """
+    job_ids = filters.get("job_ids") or []
+    source = filters.get("source")
+    min_faces = filters.get("min_faces")
+    if not isinstance(job_ids, list) or len(job_ids) > MAX_SUBSCRIBED_JOBS:
+        raise ValueError(f"job_ids must be a list of at most {MAX_SUBSCRIBED_JOBS} ids")
+    try:
+        job_ids = [str(uuid.UUID(str(job_id))) for job_id in job_ids]
+    except ValueError:
+        raise ValueError("job_ids must contain job ids returned by uploads")
+    if source is not None and not (isinstance(source, str) and valid_source(source)):
+        raise ValueError("source must be 1-64 letters, digits, '-' or '_'")
+    if min_faces is not None and (
+        isinstance(min_faces, bool) or not isinstance(min_faces, int) or min_faces < 1
+    ):
+        raise ValueError("min_faces must be a positive integer")
+
+    if job_ids or source:
+        groups = [job_group(job_id) for job_id in job_ids]
+        return groups + [source_group(source)] if source else groups
+    if min_faces is not None:
+        bucket = min_faces_bucket(min_faces)
+        if bucket is not None:
+            return [
+                min_faces_group(threshold)
+                for threshold in min_faces_groups()
+                if threshold >= bucket
+            ]
+    return [FACES_GROUP]
+
+
+def prepare_event(message: dict) -> dict:
+    """
+    Encode the client message once, at the producer.
+
+    Consumers relay the ``text`` as-is, so a broadcast costs one serialization
+    no matter how many clients are connected.
+
+    Args:
+        message: channel layer message, its ``type`` selects the consumer handler
+
+    Returns:
+        Channel layer message with the encoded ``text`` and the routing fields
+    """
+    event = {
+        "type": message["type"],
+        "text": encode_client_message(message),
+        "event_id": uuid.uuid4().hex,
+    }
+    event.update(
+        (field, message[field]) for field in ROUTING_FIELDS if field in message
+    )
+    return event
+
+
+def send_notification(message: dict) -> None:
+    """
+    Broadcast a message to WebSocket clients.
+
+    The message goes to the faces group, joined by clients without filters,
+    and to the groups of the filters it matches, see ``target_groups``.
+
+    Args:
+        message: channel layer message, its ``type`` selects the consumer handler
+    """
+    async_to_sync(asend_notification)(message)
+
+
+async def asend_notification(message: dict) -> None:
+    """Broadcast a message to WebSocket clients from async code."""
+    channel_layer = get_channel_layer()
+    with timed("notify"):
+        event = prepare_event(message)
+        for group in [FACES_GROUP, *target_groups(message)]:
+            await channel_layer.group_send(group, event)
+
+
+def _notification_done(task: asyncio.Task) -> None:
+    _pending_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Failed to send notification", exc_info=task.exception())
+
+
+def send_notification_in_background(message: dict) -> asyncio.Task:
+    """
+    Broadcast a message without waiting for the channel layer.
+
+    Must be called from a running event loop. Failures are logged, as the
+    caller has already moved on.
+
+    Args:
+        message: channel layer message, its ``type`` selects the consumer handler
+
+    Returns:
+        Task sending the message
+    """
+    task = asyncio.get_running_loop().create_task(asend_notification(message))
+    _pending_tasks.add(task)
+    task.add_done_callback(_notification_done)
+    return task
@@ -0,0 +1,95 @@
+import os
+from dataclasses import dataclass
+
+from cv2 import data
+from django.conf import settings
+
+DEFAULT_PROFILE = "default"
+DEFAULT_CASCADE = "haarcascade_frontalface_default.xml"
+
+
+@dataclass(frozen=True)
+class DetectionProfile:
+    """
+    Named set of detection parameters trading recall against throughput.
+
+    Attributes:
+        name: name of the profile in ``FACE_DETECTION_PROFILES``
+        min_size: smallest face, in pixels of the working image, that is searched for
+        max_dimension: longest side of the working image, larger images are
+            downscaled
+        min_face_fraction: smallest face to find, as a fraction of the shorter
+            image side, used to pick the working resolution so such a face is
+            exactly ``min_size`` wide
+        cascade: file name of a cascade shipped in ``cv2.data.haarcascades``, e.g.
+            ``haarcascade_frontalface_alt2.xml``
+        scale_factor: ratio between the window sizes searched, closer to 1 is slower
+            but misses fewer faces
+        min_neighbors: overlapping detections needed to report a face, higher values
+            trade recall for precision
+    """
+
+    name: str
+    min_size: int = 30
+    max_dimension: int | None = None
+    min_face_fraction: float | None = None
+    cascade: str = DEFAULT_CASCADE
+    scale_factor: float = 1.1
+    min_neighbors: int = 5
+
+    def __post_init__(self):
+        if os.path.basename(self.cascade) != self.cascade or not os.path.exists(
+            data.haarcascades + self.cascade
+        ):
+            raise ValueError(f"Unknown cascade: {self.cascade}")
+        if self.scale_factor <= 1:
+            raise ValueError(f"scale_factor must be above 1, got {self.scale_factor}")
+        if self.min_neighbors < 0:
+            raise ValueError(
+                f"min_neighbors must not be negative, got {self.min_neighbors}"
+            )
+
+    def working_scale(self, width: int, height: int) -> float:
+        """
+        Return the factor by which an image should be resized before detection.
+
+        Args:
+            width: width of the original image
+            height: height of the original image
+
+        Returns:
+            Scale in the ``(0, 1]`` range, 1 keeps the original resolution
+        """
+        scale = 1.0
+        if self.min_face_fraction:
+            smallest_face = self.min_face_fraction * min(width, height)
+            if smallest_face > 0:
+                scale = min(scale, self.min_size / smallest_face)
+        if self.max_dimension:
+            scale = min(scale, self.max_dimension / max(width, height))
+        return scale
+
+
+def profile_names() -> list[str]:
+    """Return the names of the configured detection profiles."""
+    return list(getattr(settings, "FACE_DETECTION_PROFILES", {DEFAULT_PROFILE: {}}))
+
+
+def get_profile(name: str | None = None) -> DetectionProfile:
+    """
+    Build a profile from the ``FACE_DETECTION_PROFILES`` setting.
+
+    Args:
+        name: profile name, defaults to ``FACE_DETECTION_DEFAULT_PROFILE``
+
+    Returns:
+        DetectionProfile with the configured parameters
+
+    Raises:
+        ValueError: if the profile is not configured
+    """
+    name = name or getattr(settings, "FACE_DETECTION_DEFAULT_PROFILE", DEFAULT_PROFILE)
+    profiles = getattr(settings, "FACE_DETECTION_PROFILES", {DEFAULT_PROFILE: {}})
+    if name not in profiles:
+        raise ValueError(f"Unknown detection profile: {name}")
+    return DetectionProfile(name=name, **profiles[name])
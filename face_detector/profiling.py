@@ -0,0 +1,197 @@
+import cProfile
+import functools
+import ipaddress
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, List
+
+from django.conf import settings
+from django.http import HttpRequest
+
+from .metrics import current_timings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILING_CONFIG = {
+    "ENABLED": False,
+    "HEADER": "X-Face-Detection-Profile",
+    "TOKEN": None,
+    "SAMPLE_RATE": 0.0,
+    "DIRECTORY": None,
+    "MAX_PROFILES": 100,
+}
+
+_capture: ContextVar[dict | None] = ContextVar("profile_capture", default=None)
+_rotate_lock = threading.Lock()
+# Only one profiler can be active at a time, so requests are profiled one by one
+_profiler_lock = threading.Lock()
+
+
+def profiling_config() -> dict:
+    """Return the ``FACE_DETECTION_PROFILING`` setting merged over the defaults."""
+    return {
+        **DEFAULT_PROFILING_CONFIG,
+        **getattr(settings, "FACE_DETECTION_PROFILING", {}),
+    }
+
+
+def profile_directory() -> Path:
+    """Return the directory captured profiles are written to."""
+    directory = profiling_config()["DIRECTORY"]
+    return Path(directory) if directory else Path(settings.BASE_DIR) / "profiles"
+
+
+def is_local(request: HttpRequest) -> bool:
+    """Tell whether a request comes from a loopback address."""
+    try:
+        return ipaddress.ip_address(request.META.get("REMOTE_ADDR", "")).is_loopback
+    except ValueError:
+        return False
+
+
+def should_profile(request: HttpRequest) -> bool:
+    """
+    Decide whether a request is profiled.
+
+    A request is profiled when profiling is enabled and it either carries
+    the profiling header or is picked at ``SAMPLE_RATE``. The header value
+    must match ``TOKEN``; without a token, only the header of local requests
+    is honoured. The decision is stored on the request, so asking again
+    gives the same answer.
+    """
+    if hasattr(request, "_face_detection_profile"):
+        return request._face_detection_profile
+
+    config = profiling_config()
+    decision = False
+    if config["ENABLED"]:
+        header = request.headers.get(config["HEADER"])
+        if header is not None:
+            if config["TOKEN"] is None:
+                decision = is_local(request)
+            else:
+                decision = header == config["TOKEN"]
+        if not decision and config["SAMPLE_RATE"] > 0:
+            decision = random.random() < config["SAMPLE_RATE"]
+    request._face_detection_profile = decision
+    return decision
+
+
+def profiling_active() -> bool:
+    """Tell whether the current request is being profiled."""
+    return _capture.get() is not None
+
+
+def annotate(**info) -> None:
+    """Attach details, e.g. the image dimensions, to the profile being captured."""
+    capture = _capture.get()
+    if capture is not None:
+        capture.update(info)
+
+
+def _rotate(directory: Path, max_profiles: int) -> None:
+    with _rotate_lock:
+        captured = sorted(
+            directory.glob("*.json"), key=lambda path: path.stat().st_mtime
+        )
+        for metadata in captured[: max(len(captured) - max_profiles, 0)]:
+            metadata.with_suffix(".prof").unlink(missing_ok=True)
+            metadata.unlink(missing_ok=True)
+
+
+def save_profile(profiler: cProfile.Profile, info: dict) -> Path:
+    """
+    Write a captured profile and its details, keeping at most ``MAX_PROFILES``.
+
+    Args:
+        profiler: stopped profiler
+        info: details of the request, stored next to the profile as JSON
+
+    Returns:
+        Path of the written ``.prof`` file, readable with ``pstats``
+    """
+    directory = profile_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    path = directory / f"{name}.prof"
+    profiler.dump_stats(path)
+    (directory / f"{name}.json").write_text(json.dumps({"id": name, **info}))
+    _rotate(directory, profiling_config()["MAX_PROFILES"])
+    return path
+
+
+def profile_request(view: Callable) -> Callable:
+    """
+    Capture a cProfile profile of a sync view when ``should_profile`` says so.
+
+    cProfile only sees the request thread, so detection runs in it while
+    profiling, see ``profiling_active``, and the profile shows where the
+    detector spends time. Profiles are captured one at a time, which also
+    bounds the detection running outside of the executor to one request;
+    while another request is being profiled, the view runs without a
+    profile. The profile is saved with the request duration, the stage
+    timings and the details passed to ``annotate``.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not should_profile(request):
+            return view(request, *args, **kwargs)
+        if not _profiler_lock.acquire(blocking=False):
+            logger.debug("Skipping profile, another request is being profiled")
+            return view(request, *args, **kwargs)
+        try:
+            return _profiled(view, request, *args, **kwargs)
+        finally:
+            _profiler_lock.release()
+
+    return wrapper
+
+
+def _profiled(view: Callable, request: HttpRequest, *args, **kwargs):
+    capture = {}
+    token = _capture.set(capture)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            profiler.disable()
+    finally:
+        _capture.reset(token)
+
+    try:
+        save_profile(
+            profiler,
+            {
+                "view": view.__name__,
+                "path": request.path,
+                "status": response.status_code,
+                "duration": time.perf_counter() - start,
+                "created": time.time(),
+                "timings": dict(current_timings() or {}),
+                **capture,
+            },
+        )
+    except OSError:
+        logger.warning("Failed to save request profile", exc_info=True)
+    return response
+
+
+def load_profiles() -> List[dict]:
+    """Return the details of every captured profile, slowest first."""
+    profiles = []
+    for path in profile_directory().glob("*.json"):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda info: info["duration"], reverse=True)
@@ -0,0 +1,222 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator
+
+from cv2 import CascadeClassifier, data
+from django.conf import settings
+
+from .metrics import inc
+from .profiles import DEFAULT_CASCADE, get_profile, profile_names
+
+if TYPE_CHECKING:
+    from .detector import FaceDetector
+
+
+class ClassifierPool:
+    """
+    Bounded pool of CascadeClassifier instances for a single cascade file.
+
+    A CascadeClassifier is not safe to share between threads, so every caller
+    borrows its own instance for the duration of a detection. Instances are
+    created lazily up to ``size`` and reused afterwards, which means the cascade
+    XML is parsed at most ``size`` times per process.
+    """
+
+    def __init__(self, cascade_path: str, size: int):
+        if size < 1:
+            raise ValueError(f"Pool size must be at least 1, got {size}")
+        self.cascade_path = cascade_path
+        self.size = size
+        self._idle: queue.LifoQueue[CascadeClassifier] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    def _create(self) -> CascadeClassifier:
+        classifier = CascadeClassifier(self.cascade_path)
+        if classifier.empty():
+            raise ValueError(f"Failed to load cascade from {self.cascade_path}")
+        return classifier
+
+    def _reserve(self) -> bool:
+        """Reserve a slot for a new classifier if the pool is not full yet."""
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self._created -= 1
+
+    def prime(self, count: int = 1) -> None:
+        """
+        Make sure at least ``count`` classifiers are loaded and idle.
+
+        Args:
+            count: number of classifiers to preload, capped at the pool size
+        """
+        for _ in range(min(count, self.size) - self.created):
+            if not self._reserve():
+                break
+            try:
+                self._idle.put(self._create())
+            except Exception:
+                self._release_slot()
+                raise
+
+    @contextmanager
+    def acquire(self, timeout: float | None = None) -> Iterator[CascadeClassifier]:
+        """
+        Borrow a classifier from the pool, waiting if all of them are in use.
+
+        Args:
+            timeout: maximum number of seconds to wait, ``None`` waits forever
+
+        Yields:
+            CascadeClassifier owned exclusively by the caller until the block exits
+        """
+        try:
+            classifier = self._idle.get_nowait()
+            self._count("hit")
+        except queue.Empty:
+            if self._reserve():
+                self._count("miss")
+                try:
+                    classifier = self._create()
+                except Exception:
+                    self._release_slot()
+                    raise
+            else:
+                self._count("wait")
+                try:
+                    classifier = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"No classifier available for {self.cascade_path} "
+                        f"after {timeout} seconds"
+                    ) from None
+        try:
+            yield classifier
+        finally:
+            self._idle.put(classifier)
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "miss":
+                self.misses += 1
+            else:
+                self.waits += 1
+        inc(
+            "face_detection_classifier_pool_total",
+            cascade=os.path.basename(self.cascade_path),
+            outcome=outcome,
+        )
+
+    @property
+    def created(self) -> int:
+        return self._created
+
+    def stats(self) -> dict:
+        """Return pool counters, useful for sizing ``FACE_DETECTOR_POOL_SIZE``."""
+        with self._lock:
+            return {
+                "cascade": os.path.basename(self.cascade_path),
+                "size": self.size,
+                "created": self._created,
+                "idle": self._idle.qsize(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+            }
+
+
+_pools: Dict[str, ClassifierPool] = {}
+_pools_lock = threading.Lock()
+_detectors: Dict[str | None, "FaceDetector"] = {}
+_detector_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    """Return the configured number of classifiers per cascade."""
+    return getattr(settings, "FACE_DETECTOR_POOL_SIZE", None) or os.cpu_count() or 1
+
+
+def get_pool(cascade_name: str = DEFAULT_CASCADE) -> ClassifierPool:
+    """
+    Return the process-wide pool for the given cascade file, creating it on first use.
+
+    Args:
+        cascade_name: file name of a cascade shipped in ``cv2.data.haarcascades``
+
+    Returns:
+        ClassifierPool shared by every detector using this cascade
+    """
+    pool = _pools.get(cascade_name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(cascade_name)
+            if pool is None:
+                pool = ClassifierPool(data.haarcascades + cascade_name, pool_size())
+                _pools[cascade_name] = pool
+    return pool
+
+
+def get_detector(profile: str | None = None) -> "FaceDetector":
+    """
+    Return the process-wide FaceDetector for a detection profile.
+
+    The detector itself is stateless apart from its classifier pool,
+    so a single instance can serve every request thread.
+
+    Args:
+        profile: name of the detection profile, defaults to the configured default
+
+    Returns:
+        FaceDetector shared by every caller using this profile
+    """
+    detector = _detectors.get(profile)
+    if detector is None:
+        from .detector import FaceDetector
+
+        detection_profile = get_profile(profile)
+        with _detector_lock:
+            detector = _detectors.get(detection_profile.name)
+            if detector is None:
+                detector = FaceDetector(profile=detection_profile)
+                _detectors[detection_profile.name] = detector
+            _detectors[profile] = detector
+    return detector
+
+
+def warm_up() -> None:
+    """
+    Load the cascades of every profile so the first request is not slow.
+
+    The pool of the default profile is filled, the others get one classifier.
+    """
+    if not getattr(settings, "FACE_DETECTOR_WARM_UP", True):
+        return
+    for name in profile_names():
+        get_detector(name)
+    detector = get_detector()
+    detector.pool.prime(detector.pool.size)
+
+
+def pool_stats() -> list[dict]:
+    """Return counters of every pool created in this process."""
+    return [pool.stats() for pool in list(_pools.values())]
+
+
+def reset() -> None:
+    """Drop every cached pool and detector, mainly for tests."""
+    with _pools_lock, _detector_lock:
+        _pools.clear()
+        _detectors.clear()
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import asdict
+from pathlib import Path
+
+from cv2 import imencode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from . import background
+from .detector import DetectionResult, OutputOptions, decode_image, draw_boxes
+from .metrics import inc
+from .retention import sharded_name
+from .storage import save_upload
+
+DEFAULT_RENDER_CONFIG = {
+    "LAZY": True,
+    "CACHE_BYTES": 64 * 1024 * 1024,
+    "PERSIST": False,
+}
+
+
+def render_config() -> dict:
+    """Return the ``FACE_DETECTION_RENDER`` setting merged over the defaults."""
+    return {**DEFAULT_RENDER_CONFIG, **getattr(settings, "FACE_DETECTION_RENDER", {})}
+
+
+def lazy_rendering() -> bool:
+    """Tell whether annotated images are rendered on first download."""
+    return bool(render_config()["LAZY"])
+
+
+def renders_lazily(output: OutputOptions) -> bool:
+    """Tell whether the annotated image for these output options is deferred."""
+    return output.annotate and lazy_rendering()
+
+
+def record_name(processed_path: str | Path) -> str:
+    """Return the name of the render record belonging to a processed image."""
+    return str(Path(processed_path).with_suffix(".json"))
+
+
+# Render records still being written by background tasks of this process
+_pending: dict[str, Future] = {}
+_pending_lock = threading.Lock()
+
+
+def defer_render(
+    upload_name: str,
+    unique_id: str,
+    result: DetectionResult,
+    output: OutputOptions,
+    content: bytes | None = None,
+) -> DetectionResult:
+    """
+    Store what is needed to render the annotated image later, instead of the image.
+
+    The record holds the name of the stored original, the boxes and the
+    output options. It is written next to where the image will be served
+    from, so the image URL is the same as with eager rendering. Given the
+    ``content`` of an original that is not stored yet, the original is saved
+    and the record written after it in the background, off the response
+    path; ``wait_for_record`` waits for them.
+
+    Args:
+        upload_name: name of the stored original relative to the storage root,
+            or with ``content`` the file name it is saved under by ``save_upload``
+        unique_id: unique identifier of the processed image
+        result: boxes only detection result
+        output: output options the image is rendered with
+        content: original to store before the record
+
+    Returns:
+        DetectionResult pointing at the not yet rendered image
+    """
+    processed_path = Path(
+        sharded_name("processed", f"faces_{unique_id}{output.extension}")
+    )
+    name = record_name(processed_path)
+    record = {"upload": upload_name, "boxes": result.boxes, "output": asdict(output)}
+    if content is None:
+        write_record(name, record)
+    else:
+        future = background.submit(store_deferred, name, record, content)
+        with _pending_lock:
+            _pending[name] = future
+        future.add_done_callback(lambda _: _forget_pending(name))
+    return DetectionResult(
+        processed_path, result.boxes, result.width, result.height, result.timings
+    )
+
+
+def write_record(name: str, record: dict) -> None:
+    """Write a render record to the default storage."""
+    default_storage.save(name, ContentFile(json.dumps(record)))
+
+
+def store_deferred(name: str, record: dict, content: bytes) -> None:
+    """Save the original of a deferred render, then its record pointing at it."""
+    upload_name = save_upload(record["upload"], content)
+    write_record(name, {**record, "upload": upload_name})
+
+
+def _forget_pending(name: str) -> None:
+    with _pending_lock:
+        _pending.pop(name, None)
+
+
+def wait_for_record(processed_path: str | Path, timeout: float = 10) -> None:
+    """Wait for the render record of an image this process is still storing."""
+    with _pending_lock:
+        future = _pending.get(record_name(processed_path))
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            # Logged by the background pool, the record is then reported missing
+            pass
+
+
+def render(record: dict) -> bytes:
+    """
+    Render an annotated image from its record.
+
+    Args:
+        record: render record written by ``defer_render``
+
+    Returns:
+        Encoded annotated image
+
+    Raises:
+        ValueError: if the original cannot be decoded or the image cannot be encoded
+    """
+    with default_storage.open(record["upload"]) as upload:
+        content = upload.read()
+    output = OutputOptions(**record["output"])
+    img = draw_boxes(
+        decode_image(memoryview(content)), record["boxes"], output.max_dimension
+    )
+    ok, encoded = imencode(output.extension, img, output.imwrite_params())
+    if not ok:
+        raise ValueError(f"Failed to encode image as {output.format}")
+    return encoded.tobytes()
+
+
+def persist(path: str, content: bytes) -> None:
+    """Write a rendered image to the media directory unless it is already there."""
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(content))
+
+
+class RenderCache:
+    """
+    Least recently used cache of rendered images, bounded by their total size.
+
+    Images larger than the whole cache are never stored.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        inc(
+            "face_detection_render_cache_total",
+            outcome="miss" if content is None else "hit",
+        )
+        return content
+
+    def set(self, key: str, content: bytes) -> None:
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = content
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self) -> dict:
+        """Return the cache size and hit counters of this process."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache: RenderCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Return the process-wide cache of rendered images."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RenderCache(render_config()["CACHE_BYTES"])
+    return _cache
+
+
+def reset_render_cache() -> None:
+    """Drop the process-wide render cache, mainly for tests."""
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def _forget_pending_records() -> None:
+    # Background tasks do not survive fork, their records are not awaited
+    global _pending_lock
+    _pending.clear()
+    _pending_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_pending_records)
@@ -0,0 +1,277 @@
+import hashlib
+import heapq
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_CONFIG = {
+    "SHARD_DEPTH": 0,
+    "BATCH_SIZE": 500,
+    "BATCH_PAUSE": 0.05,
+    "PRUNE_GRACE": 300,
+    "DIRECTORIES": {},
+}
+
+
+def retention_config() -> dict:
+    """Return the ``FACE_DETECTION_RETENTION`` setting merged over the defaults."""
+    return {
+        **DEFAULT_RETENTION_CONFIG,
+        **getattr(settings, "FACE_DETECTION_RETENTION", {}),
+    }
+
+
+def shard(name: str) -> str:
+    """
+    Return the hashed subdirectory a file is stored in.
+
+    Every level of ``SHARD_DEPTH`` adds two hex digits of a hash of the name,
+    spreading files over 256 subdirectories per level.
+
+    Args:
+        name: file name, without directories
+
+    Returns:
+        Relative subdirectory such as ``3f/a0``, or ``""`` with a depth of 0
+    """
+    depth = retention_config()["SHARD_DEPTH"]
+    digest = hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+    return "/".join(digest[2 * level : 2 * level + 2] for level in range(depth))
+
+
+def shard_directory(directory: str, name: str) -> Path:
+    """Return the directory, relative to the storage root, a file is stored in."""
+    return Path(directory) / shard(name)
+
+
+def sharded_name(directory: str, name: str) -> str:
+    """
+    Return the name a file is stored under, relative to the storage root.
+
+    Args:
+        directory: top-level media directory, e.g. ``uploaded`` or ``processed``
+        name: file name, without directories
+
+    Returns:
+        Name such as ``processed/3f/a0/faces_<uuid>.jpg``
+    """
+    return str(shard_directory(directory, name) / name)
+
+
+@dataclass
+class SweepStats:
+    """
+    Outcome of sweeping one media directory.
+
+    Attributes:
+        directory: swept directory relative to the media root
+        files: number of files found
+        bytes: total size of the files found
+        expired: files deleted for being older than the TTL
+        evicted: files deleted to bring the directory under its size cap
+        freed_bytes: total size of the deleted files
+    """
+
+    directory: str
+    files: int = 0
+    bytes: int = 0
+    expired: int = 0
+    evicted: int = 0
+    freed_bytes: int = 0
+
+
+def scan(root: Path) -> Iterator[Tuple[float, int, str]]:
+    """
+    Walk a directory tree without building a listing of it in memory.
+
+    Yields:
+        Modification time, size and path of every regular file
+    """
+    pending = [str(root)]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        yield stat.st_mtime, stat.st_size, entry.path
+                except FileNotFoundError:
+                    continue
+
+
+def _delete(
+    paths: Iterable[Tuple[float, int, str]], batch_size: int, pause: float
+) -> int:
+    freed = 0
+    for count, (_, size, path) in enumerate(paths):
+        if pause and count and count % batch_size == 0:
+            time.sleep(pause)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            logger.warning("Failed to delete %s", path, exc_info=True)
+            continue
+        freed += size
+    return freed
+
+
+def oldest(
+    files: Iterable[Tuple[float, int, str]], excess: int
+) -> List[Tuple[float, int, str]]:
+    """
+    Pick the oldest files adding up to at least ``excess`` bytes.
+
+    Only the files picked so far are kept, in a heap with the newest on top
+    that is trimmed whenever the older files cover ``excess`` on their own.
+
+    Returns:
+        Modification time, size and path of the picked files, oldest first
+    """
+    heap: List[Tuple[float, int, str]] = []
+    total = 0
+    for mtime, size, path in files:
+        if heap and total >= excess and mtime >= -heap[0][0]:
+            continue
+        heapq.heappush(heap, (-mtime, size, path))
+        total += size
+        while total - heap[0][1] >= excess:
+            total -= heapq.heappop(heap)[1]
+    return sorted((-mtime, size, path) for mtime, size, path in heap)
+
+
+def _prune_empty(root: Path, grace: float, now: float) -> None:
+    # A writer may just have created a shard directory for a file it is about
+    # to save, so directories modified within the grace period are kept. Times
+    # are read before removing anything, as removing a child touches its parent.
+    stale = []
+    for current, _, _ in os.walk(root):
+        try:
+            if current != str(root) and os.stat(current).st_mtime <= now - grace:
+                stale.append(current)
+        except OSError:
+            continue
+    for current in reversed(stale):
+        try:
+            os.rmdir(current)
+        except OSError:
+            pass
+
+
+def sweep(
+    directory: str,
+    ttl: float | None = None,
+    max_bytes: int | None = None,
+    batch_size: int = 500,
+    pause: float = 0.0,
+    now: float | None = None,
+    dry_run: bool = False,
+    prune_grace: float = 300,
+) -> SweepStats:
+    """
+    Delete expired files of a media directory, then the oldest until it fits its cap.
+
+    The directory is streamed rather than listed: expired files are deleted
+    during a first walk, which also totals the size of the others, and a
+    second walk picks the oldest files to evict with a bounded heap. Files
+    are deleted ``batch_size`` at a time with a ``pause`` between batches,
+    so a large sweep does not starve request handling of disk bandwidth.
+    Empty shard directories not modified for ``prune_grace`` seconds are
+    removed, those emptied by a sweep on the next one.
+
+    Args:
+        directory: directory relative to ``MEDIA_ROOT``
+        ttl: age in seconds after which a file is deleted, ``None`` keeps files forever
+        max_bytes: total size the directory is brought under, ``None`` for no cap
+        batch_size: files deleted before pausing
+        pause: seconds to sleep between batches
+        now: current time, defaults to ``time.time()``
+        dry_run: only count what would be deleted
+        prune_grace: age in seconds of the empty directories that are removed
+
+    Returns:
+        SweepStats of the directory
+    """
+    root = Path(settings.MEDIA_ROOT) / directory
+    now = time.time() if now is None else now
+    cutoff = None if ttl is None else now - ttl
+    stats = SweepStats(directory)
+    expired_bytes = 0
+
+    def expired() -> Iterator[Tuple[float, int, str]]:
+        nonlocal expired_bytes
+        for mtime, size, path in scan(root):
+            stats.files += 1
+            stats.bytes += size
+            if cutoff is not None and mtime < cutoff:
+                stats.expired += 1
+                expired_bytes += size
+                yield mtime, size, path
+
+    if dry_run:
+        for _ in expired():
+            pass
+        stats.freed_bytes = expired_bytes
+    else:
+        stats.freed_bytes = _delete(expired(), max(batch_size, 1), pause)
+
+    remaining = stats.bytes - expired_bytes
+    if max_bytes is not None and remaining > max_bytes:
+        kept = (
+            (mtime, size, path)
+            for mtime, size, path in scan(root)
+            if cutoff is None or mtime >= cutoff
+        )
+        doomed = oldest(kept, remaining - max_bytes)
+        stats.evicted = len(doomed)
+        if dry_run:
+            stats.freed_bytes += sum(size for _, size, _ in doomed)
+        else:
+            stats.freed_bytes += _delete(doomed, max(batch_size, 1), pause)
+
+    if not dry_run:
+        _prune_empty(root, prune_grace, now)
+    return stats
+
+
+def sweep_configured(
+    directories: List[str] | None = None, dry_run: bool = False
+) -> List[SweepStats]:
+    """
+    Sweep media directories with the limits of ``FACE_DETECTION_RETENTION``.
+
+    Args:
+        directories: names out of ``DIRECTORIES``, defaults to all of them
+        dry_run: only count what would be deleted
+
+    Returns:
+        SweepStats per directory
+    """
+    config = retention_config()
+    limits = config["DIRECTORIES"]
+    return [
+        sweep(
+            directory,
+            ttl=limits[directory].get("TTL"),
+            max_bytes=limits[directory].get("MAX_BYTES"),
+            batch_size=config["BATCH_SIZE"],
+            pause=config["BATCH_PAUSE"],
+            dry_run=dry_run,
+            prune_grace=config["PRUNE_GRACE"],
+        )
+        for directory in (directories or list(limits))
+    ]
@@ -0,0 +1,314 @@
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from typing import Callable
+
+from django.db import connections
+from django.utils.module_loading import import_string
+
+# Set while the application is imported by the serve master, see face_detection.asgi
+PREFORK_ENV = "FACE_DETECTION_PREFORK"
+# Workers exiting sooner than this after their start are respawned with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+def bind_socket(address: str, backlog: int = 2048) -> socket.socket:
+    """
+    Open the listening socket shared by all workers.
+
+    Args:
+        address: IPv4 ``host:port``, e.g. ``0.0.0.0:8282``
+        backlog: length of the queue of connections not yet accepted
+
+    Returns:
+        Bound and listening socket
+
+    Raises:
+        ValueError: if the address is not ``host:port``
+    """
+    host, separator, port = address.rpartition(":")
+    if not separator or not port.isdigit():
+        raise ValueError(f"Address must be host:port, got {address!r}")
+    # Daphne adopts inherited sockets as IPv4 only
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host or "0.0.0.0", int(port)))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def preload(application_path: str):
+    """
+    Import the ASGI application in the master, before any worker is forked.
+
+    Django, OpenCV, libmagic and the cascades of every profile are loaded
+    here once, and the forked workers share these memory pages.
+
+    Raises:
+        RuntimeError: if the Twisted reactor is already imported, forked
+            workers would share its event loop
+    """
+    if "twisted.internet.reactor" in sys.modules:
+        raise RuntimeError(
+            "The Twisted reactor is imported before forking, remove 'daphne' from "
+            "INSTALLED_APPS, e.g. with face_detection.settings_production"
+        )
+    from .validation import get_magic
+
+    os.environ[PREFORK_ENV] = "1"
+    application = import_string(application_path)
+    get_magic()
+    # Connections must not be shared with the workers
+    connections.close_all()
+    return application
+
+
+class RequestLimit:
+    """
+    ASGI middleware calling ``on_limit`` once ``limit`` HTTP requests started.
+
+    Used to recycle workers, bounding the growth of their memory.
+    """
+
+    def __init__(self, application, limit: int, on_limit: Callable[[], None]):
+        self.application = application
+        self.limit = limit
+        self.on_limit = on_limit
+        self.requests = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            self.requests += 1
+            if self.requests == self.limit:
+                self.on_limit()
+        return await self.application(scope, receive, send)
+
+
+def run_worker(
+    application,
+    sock: socket.socket,
+    max_requests: int = 0,
+    graceful_timeout: float = 30,
+    **server_options,
+) -> None:
+    """
+    Serve the application with Daphne on the shared socket until stopped.
+
+    SIGTERM, or reaching ``max_requests``, stops the worker gracefully: it
+    stops accepting connections and exits once running requests are done,
+    or after ``graceful_timeout`` seconds. Open WebSockets are closed then.
+
+    Args:
+        application: ASGI application
+        sock: listening socket from ``bind_socket``
+        max_requests: HTTP requests served before the worker exits, 0 for no limit
+        graceful_timeout: seconds running requests are given to finish
+        **server_options: passed to ``daphne.server.Server``
+    """
+    from . import metrics
+    from .executor import warm_up_executor
+
+    # Counters inherited from the master would be reported by every worker
+    metrics.reset_registry()
+    warm_up_executor()
+
+    # Installs the asyncio reactor, in the worker only
+    from daphne.server import Server
+    from twisted.internet import reactor
+
+    class WorkerServer(Server):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.ports = []
+
+        def listen_success(self, port):
+            self.ports.append(port)
+            super().listen_success(port)
+
+    stopping = False
+
+    def stop() -> None:
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        for port in server.ports:
+            port.stopListening()
+        deadline = time.monotonic() + graceful_timeout
+
+        def wait() -> None:
+            running = [
+                instance
+                for details in server.connections.values()
+                if (instance := details.get("application_instance")) is not None
+                and not instance.done()
+            ]
+            if running and time.monotonic() < deadline:
+                reactor.callLater(0.1, wait)
+            else:
+                server.stop()
+
+        wait()
+
+    if max_requests:
+        application = RequestLimit(
+            application, max_requests, lambda: reactor.callLater(0, stop)
+        )
+    server = WorkerServer(
+        application=application,
+        endpoints=[f"fd:fileno={sock.fileno()}"],
+        signal_handlers=False,
+        **server_options,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: reactor.callFromThread(stop))
+    server.run()
+    if not server.ports:
+        raise RuntimeError("Worker failed to listen")
+
+
+class PreforkServer:
+    """
+    Master process keeping ``workers`` forked workers serving one socket.
+
+    Signals:
+        SIGTERM, SIGINT: stop the workers gracefully and exit
+        SIGHUP: start new workers, then stop the old ones gracefully
+
+    Workers that exit, e.g. after ``max_requests``, are replaced.
+    """
+
+    def __init__(
+        self,
+        application,
+        sock: socket.socket,
+        workers: int,
+        max_requests: int = 0,
+        max_requests_jitter: int = 0,
+        graceful_timeout: float = 30,
+        log: Callable[[str], None] = print,
+        **server_options,
+    ):
+        self.application = application
+        self.sock = sock
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.log = log
+        self.server_options = server_options
+        # Worker pid -> monotonic start time
+        self.children: dict[int, float] = {}
+        self.retiring: set[int] = set()
+        self.signals: list[int] = []
+        self.wakeup = threading.Event()
+        self.stopping_at: float | None = None
+        self.spawn_after = 0.0
+
+    def run(self) -> None:
+        """Start the workers and supervise them until stopped."""
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self.handle_signal)
+        self.log(f"Master {os.getpid()} starting {self.workers} workers")
+        while True:
+            self.reap()
+            while self.signals:
+                self.dispatch(self.signals.pop(0))
+            if self.stopping_at is not None:
+                if not self.children:
+                    self.log("Stopped")
+                    return
+                if time.monotonic() - self.stopping_at > self.graceful_timeout + 5:
+                    self.kill(signal.SIGKILL, list(self.children))
+            else:
+                self.spawn_missing()
+            self.wakeup.wait(1)
+            self.wakeup.clear()
+
+    def handle_signal(self, signum, frame) -> None:
+        if signum != signal.SIGCHLD:
+            self.signals.append(signum)
+        self.wakeup.set()
+
+    def dispatch(self, signum: int) -> None:
+        if signum == signal.SIGHUP and self.stopping_at is None:
+            self.log("Replacing workers")
+            old = [pid for pid in self.children if pid not in self.retiring]
+            for _ in old:
+                self.spawn()
+            self.retire(old)
+        elif signum in (signal.SIGTERM, signal.SIGINT) and self.stopping_at is None:
+            self.log("Stopping workers")
+            self.stopping_at = time.monotonic()
+            self.kill(signal.SIGTERM, list(self.children))
+
+    def spawn_missing(self) -> None:
+        if time.monotonic() < self.spawn_after:
+            return
+        while len(self.children) - len(self.retiring) < self.workers:
+            self.spawn()
+
+    def spawn(self) -> None:
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            # Spread the restarts of workers started together
+            max_requests += random.randint(0, self.max_requests_jitter)
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        status = 0
+        try:
+            for signum in (signal.SIGINT, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_IGN)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            run_worker(
+                self.application,
+                self.sock,
+                max_requests,
+                self.graceful_timeout,
+                **self.server_options,
+            )
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # Never return into the master's code
+            os._exit(status)
+
+    def retire(self, pids: list[int]) -> None:
+        self.retiring.update(pids)
+        self.kill(signal.SIGTERM, pids)
+
+    def kill(self, signum: int, pids: list[int]) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def reap(self) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if not pid:
+                return
+            started = self.children.pop(pid, None)
+            self.retiring.discard(pid)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            self.log(f"Worker {pid} exited with {code}")
+            if code and time.monotonic() - started < MIN_WORKER_LIFETIME:
+                # Do not fork in a tight loop while workers fail to start
+                self.spawn_after = time.monotonic() + MIN_WORKER_LIFETIME
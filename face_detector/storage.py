@@ -0,0 +1,22 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .metrics import timed
+from .retention import sharded_name
+
+
+def save_upload(filename: str, file_content: bytes) -> str:
+    """
+    Persist the original upload in a shard of ``uploaded/`` in the default storage.
+
+    Args:
+        filename: name of the file to store
+        file_content: raw bytes of the uploaded file
+
+    Returns:
+        Name of the stored file relative to the storage root
+    """
+    with timed("save_upload"):
+        return default_storage.save(
+            sharded_name("uploaded", filename), ContentFile(file_content)
+        )
@@ -0,0 +1,189 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+from cv2 import INTER_AREA, resize, typing
+from django.conf import settings
+
+DEFAULT_TILING_CONFIG = {
+    "ENABLED": False,
+    "MIN_PIXELS": 16_000_000,
+    "TILE_SIZE": 2048,
+    "OVERLAP": 256,
+    "WORKERS": 4,
+    "NMS_THRESHOLD": 0.5,
+}
+
+Tile = Tuple[int, int, int, int]
+
+
+def tiling_config() -> dict:
+    """Return the ``FACE_DETECTION_TILING`` setting merged over the defaults."""
+    return {**DEFAULT_TILING_CONFIG, **getattr(settings, "FACE_DETECTION_TILING", {})}
+
+
+def uses_tiles(width: int, height: int) -> bool:
+    """Tell whether an image of this size is detected tile by tile."""
+    config = tiling_config()
+    return (
+        config["ENABLED"]
+        and width * height >= config["MIN_PIXELS"]
+        and max(width, height) > config["TILE_SIZE"]
+    )
+
+
+def _starts(length: int, tile_size: int, step: int) -> List[int]:
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, step))
+    # The last tile is aligned with the edge rather than running past it
+    return starts + [length - tile_size]
+
+
+def split_tiles(width: int, height: int, tile_size: int, overlap: int) -> List[Tile]:
+    """
+    Cover an image with square tiles overlapping their neighbours.
+
+    A face narrower than ``overlap`` always lies entirely within some tile.
+
+    Args:
+        width: width of the image
+        height: height of the image
+        tile_size: side of a tile, tiles at the edges are cut to the image
+        overlap: pixels shared by neighbouring tiles
+
+    Returns:
+        Tiles as ``(x, y, width, height)``
+
+    Raises:
+        ValueError: if the overlap is not smaller than the tile
+    """
+    if not 0 <= overlap < tile_size:
+        raise ValueError(f"Tile overlap must be in [0, {tile_size}), got {overlap}")
+    step = tile_size - overlap
+    return [
+        (x, y, min(tile_size, width - x), min(tile_size, height - y))
+        for y in _starts(height, tile_size, step)
+        for x in _starts(width, tile_size, step)
+    ]
+
+
+def non_max_suppression(boxes: Sequence, threshold: float) -> np.ndarray:
+    """
+    Merge boxes found more than once, e.g. by two tiles on both sides of a seam.
+
+    Boxes are visited from the largest down and a box is dropped when its
+    intersection with a kept box covers more than ``threshold`` of the smaller
+    of the two. Unlike intersection over union, this also drops the partial
+    face a tile finds next to its edge, which lies inside the full face
+    found by the neighbouring tile.
+
+    Args:
+        boxes: boxes as ``[x, y, width, height]``
+        threshold: overlap above which the smaller box is dropped
+
+    Returns:
+        Kept boxes, largest first, as an ``int32`` array of shape ``(n, 4)``
+    """
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    if len(boxes) < 2:
+        return boxes
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2].astype(np.int64) * boxes[:, 3]
+    order = np.argsort(-areas, kind="stable")
+    keep = []
+    while len(order):
+        current, rest = order[0], order[1:]
+        keep.append(current)
+        width = np.clip(
+            np.minimum(x2[current], x2[rest]) - np.maximum(x1[current], x1[rest]),
+            0,
+            None,
+        )
+        height = np.clip(
+            np.minimum(y2[current], y2[rest]) - np.maximum(y1[current], y1[rest]),
+            0,
+            None,
+        )
+        overlap = width * height / np.minimum(areas[current], areas[rest])
+        order = rest[overlap <= threshold]
+    return boxes[keep]
+
+
+def detect_tiled(
+    gray: typing.MatLike, detect: Callable[[typing.MatLike], Sequence]
+) -> np.ndarray:
+    """
+    Detect faces tile by tile on the shared tile pool and merge the results.
+
+    OpenCV releases the GIL while detecting, so the tiles of one image are
+    searched on several cores at once. Faces wider than the overlap may be
+    cut by every tile, so the whole image is also searched once, downscaled
+    to the size of a tile, which finds those large faces.
+
+    Args:
+        gray: grayscale image
+        detect: detection on one tile, returning boxes in tile coordinates
+
+    Returns:
+        Boxes in image coordinates as an ``int32`` array of shape ``(n, 4)``
+    """
+    config = tiling_config()
+    height, width = gray.shape[:2]
+    tiles = split_tiles(width, height, config["TILE_SIZE"], config["OVERLAP"])
+
+    def detect_tile(tile: Tile) -> np.ndarray:
+        x, y, w, h = tile
+        faces = np.asarray(detect(gray[y : y + h, x : x + w]), dtype=np.int32)
+        faces = faces.reshape(-1, 4)
+        return faces + np.array([x, y, 0, 0], dtype=np.int32)
+
+    def detect_full_frame() -> np.ndarray:
+        scale = config["TILE_SIZE"] / max(width, height)
+        small = resize(gray, None, fx=scale, fy=scale, interpolation=INTER_AREA)
+        faces = np.asarray(detect(small), dtype=np.float64).reshape(-1, 4)
+        return np.round(faces / scale).astype(np.int32)
+
+    executor = get_tile_executor()
+    full_frame = executor.submit(detect_full_frame)
+    faces = list(executor.map(detect_tile, tiles)) + [full_frame.result()]
+    return non_max_suppression(np.concatenate(faces), config["NMS_THRESHOLD"])
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_tile_executor() -> ThreadPoolExecutor:
+    """Return the process-wide pool of threads detecting tiles."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=tiling_config()["WORKERS"],
+                    thread_name_prefix="face-detection-tile",
+                )
+    return _executor
+
+
+def reset_tile_executor() -> None:
+    """Shut down and drop the tile pool, mainly for tests."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def _forget_tile_executor() -> None:
+    # Threads do not survive fork, a forked worker starts a pool of its own
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_tile_executor)
@@ -1,9 +1,34 @@
 from django.conf import settings
 from django.conf.urls.static import static
-from django.urls import path
+from django.urls import path, re_path
 
 from . import views
 
 urlpatterns = [
-    path("image", views.upload_image, name="upload_image"),
+    path(
+        "image",
+        (
+            views.upload_image_async
+            if getattr(settings, "FACE_DETECTION_ASYNC_VIEWS", False)
+            else views.upload_image
+        ),
+        name="upload_image",
+    ),
+    path("images", views.upload_batch, name="upload_batch"),
+    path("video", views.upload_video, name="upload_video"),
+    path("jobs/<uuid:job_id>", views.job_status, name="job_status"),
+    path("detections", views.detections, name="detections"),
+    path("metrics", views.metrics, name="metrics"),
+    re_path(
+        r"^media/processed/"
+        r"(?P<name>(?:[0-9a-f]{2}/)*faces_[0-9a-f-]{36}\.(?:jpg|webp|png))$",
+        views.processed_image,
+        name="processed_image",
+    ),
+    re_path(
+        r"^media/processed/"
+        r"(?P<name>(?:[0-9a-f]{2}/)*video_[0-9a-f-]{36}\.(?:jsonl|mp4))$",
+        views.video_output,
+        name="video_output",
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
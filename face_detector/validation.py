@@ -0,0 +1,190 @@
+import io
+import threading
+from dataclasses import dataclass
+from typing import IO
+
+import magic
+from django.conf import settings
+from PIL import Image
+
+DEFAULT_UPLOAD_LIMITS = {
+    "MAX_BYTES": 25 * 1024 * 1024,
+    "MAX_PIXELS": 40_000_000,
+    "SNIFF_BYTES": 2048,
+}
+
+_magic: magic.Magic | None = None
+_magic_lock = threading.Lock()
+
+
+def upload_limits() -> dict:
+    """Return the ``FACE_DETECTION_UPLOAD_LIMITS`` setting merged over the defaults."""
+    return {
+        **DEFAULT_UPLOAD_LIMITS,
+        **getattr(settings, "FACE_DETECTION_UPLOAD_LIMITS", {}),
+    }
+
+
+def get_magic() -> magic.Magic:
+    """
+    Return the process-wide MIME type detector.
+
+    Loading the libmagic database is far more expensive than a lookup, and
+    ``magic.Magic`` serializes lookups with its own lock, so one instance is
+    shared by all threads.
+    """
+    global _magic
+    if _magic is None:
+        with _magic_lock:
+            if _magic is None:
+                _magic = magic.Magic(mime=True)
+    return _magic
+
+
+def detect_content_type(content: bytes) -> str:
+    """
+    Detect the MIME type of a file from its content.
+
+    Only the first ``SNIFF_BYTES`` are looked at, which is enough for the
+    signatures of image and video formats.
+
+    Args:
+        content: raw bytes of the file, or its first chunk
+
+    Returns:
+        MIME type reported by libmagic, e.g. ``image/jpeg``
+    """
+    return get_magic().from_buffer(bytes(content[: upload_limits()["SNIFF_BYTES"]]))
+
+
+class UploadRejected(ValueError):
+    """
+    Raised when an upload is refused before being decoded.
+
+    Attributes:
+        status: HTTP status code to answer with
+    """
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    """
+    What is known about an upload before decoding it.
+
+    Attributes:
+        content_type: MIME type of the content
+        width: width in pixels, ``None`` if the header could not be read
+        height: height in pixels, ``None`` if the header could not be read
+    """
+
+    content_type: str
+    width: int | None = None
+    height: int | None = None
+
+
+def image_dimensions(stream: IO[bytes]) -> tuple[int, int] | None:
+    """
+    Read the dimensions of an image from its header, without decoding pixels.
+
+    Args:
+        stream: seekable file positioned at the start of the image, it is
+            rewound afterwards
+
+    Returns:
+        Width and height, or ``None`` if the format is not recognized or the
+        header is truncated, in which case decoding fails without allocating
+        the image either
+
+    Raises:
+        UploadRejected: if the header declares more pixels than Pillow accepts
+    """
+    try:
+        with Image.open(stream) as img:
+            return img.size
+    except Image.DecompressionBombError as e:
+        raise UploadRejected(str(e), status=413) from e
+    except (OSError, SyntaxError, ValueError):
+        return None
+    finally:
+        stream.seek(0)
+
+
+def check_pixels(stream: IO[bytes]) -> tuple[int, int] | None:
+    """
+    Refuse images whose header declares more than ``MAX_PIXELS`` pixels.
+
+    Args:
+        stream: seekable file positioned at the start of the image
+
+    Returns:
+        Width and height, or ``None`` if the header could not be read
+
+    Raises:
+        UploadRejected: if the image has too many pixels
+    """
+    dimensions = image_dimensions(stream)
+    max_pixels = upload_limits()["MAX_PIXELS"]
+    if dimensions is not None and dimensions[0] * dimensions[1] > max_pixels:
+        raise UploadRejected(
+            f"Image of {dimensions[0]}x{dimensions[1]} pixels exceeds "
+            f"{max_pixels} pixels",
+            status=413,
+        )
+    return dimensions
+
+
+def check_frame(content: bytes) -> None:
+    """
+    Refuse a live frame over ``MAX_BYTES`` or declaring more than ``MAX_PIXELS``.
+
+    Frames skip the upload validation, this keeps a small file declaring huge
+    dimensions from making a detection worker allocate gigabytes.
+
+    Raises:
+        UploadRejected: if the frame is too large or has too many pixels
+    """
+    max_bytes = upload_limits()["MAX_BYTES"]
+    if len(content) > max_bytes:
+        raise UploadRejected(f"Frame exceeds {max_bytes} bytes", status=413)
+    check_pixels(io.BytesIO(content))
+
+
+def inspect_image(stream: IO[bytes], size: int) -> ImageHeader:
+    """
+    Check an upload against ``FACE_DETECTION_UPLOAD_LIMITS`` before reading it whole.
+
+    Only the first chunk and the header of the image are read, so oversized
+    files and decompression bombs are refused at a cost independent of their
+    size.
+
+    Args:
+        stream: seekable file positioned at the start of the upload, it is
+            rewound afterwards
+        size: size of the upload in bytes
+
+    Returns:
+        ImageHeader of the upload
+
+    Raises:
+        UploadRejected: if the upload is too large, is not an image or has
+            too many pixels
+    """
+    limits = upload_limits()
+    if size > limits["MAX_BYTES"]:
+        raise UploadRejected(f"Image exceeds {limits['MAX_BYTES']} bytes", status=413)
+
+    content_type = detect_content_type(stream.read(limits["SNIFF_BYTES"]))
+    stream.seek(0)
+    if not content_type.startswith("image/"):
+        raise UploadRejected(
+            f"Uploaded file is not an image. Detected type: {content_type}"
+        )
+
+    dimensions = check_pixels(stream)
+    if dimensions is None:
+        return ImageHeader(content_type)
+    return ImageHeader(content_type, *dimensions)
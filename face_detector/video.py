@@ -0,0 +1,194 @@
+import json
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+import numpy as np
+from cv2 import (
+    CAP_PROP_FPS,
+    CAP_PROP_FRAME_COUNT,
+    COLOR_BGR2GRAY,
+    VideoCapture,
+    VideoWriter,
+    VideoWriter_fourcc,
+    calcOpticalFlowPyrLK,
+    cvtColor,
+    goodFeaturesToTrack,
+    rectangle,
+    typing,
+)
+from django.conf import settings
+
+DEFAULT_VIDEO_CONFIG = {
+    "DETECT_EVERY": 10,
+    "PROGRESS_EVERY": 50,
+    "MAX_UPLOAD_BYTES": 500 * 1024 * 1024,
+}
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def video_config() -> dict:
+    """Return the ``FACE_DETECTION_VIDEO`` setting merged over the defaults."""
+    return {**DEFAULT_VIDEO_CONFIG, **getattr(settings, "FACE_DETECTION_VIDEO", {})}
+
+
+class BoxTracker:
+    """
+    Moves face boxes between keyframes with sparse Lucas-Kanade optical flow.
+
+    Corner features are picked inside every box on a keyframe and followed
+    from frame to frame; each box is shifted by the median motion of its
+    features. This is far cheaper than running the cascade on every frame.
+    """
+
+    def __init__(self, gray: typing.MatLike, boxes: List[List[int]]):
+        self.boxes = [list(box) for box in boxes]
+        self.previous = gray
+        self.points = []
+        for x, y, w, h in self.boxes:
+            mask = np.zeros_like(gray)
+            mask[max(y, 0) : y + h, max(x, 0) : x + w] = 255
+            corners = goodFeaturesToTrack(
+                gray, maxCorners=30, qualityLevel=0.01, minDistance=3, mask=mask
+            )
+            self.points.append(corners)
+
+    def update(self, gray: typing.MatLike) -> List[List[int]]:
+        """
+        Track the boxes into the next frame.
+
+        Args:
+            gray: grayscale version of the next frame
+
+        Returns:
+            Boxes as ``[x, y, width, height]``, boxes that lost all features stay put
+        """
+        for index, points in enumerate(self.points):
+            if points is None or len(points) == 0:
+                continue
+            moved, status, _ = calcOpticalFlowPyrLK(self.previous, gray, points, None)
+            found = status.reshape(-1) == 1
+            if not found.any():
+                self.points[index] = None
+                continue
+            dx, dy = np.median((moved - points)[found].reshape(-1, 2), axis=0)
+            box = self.boxes[index]
+            box[0] = int(round(box[0] + dx))
+            box[1] = int(round(box[1] + dy))
+            self.points[index] = moved[found].reshape(-1, 1, 2)
+        self.previous = gray
+        return [list(box) for box in self.boxes]
+
+
+def process_video(
+    detect_faces: Callable[[np.ndarray], Sequence],
+    video_path: Path,
+    output_dir: Path,
+    unique_id: str,
+    detect_every: int,
+    annotate: bool = False,
+    progress: ProgressCallback | None = None,
+    progress_every: int = 50,
+) -> dict:
+    """
+    Detect and track faces in a video file, frame by frame.
+
+    Frames are decoded one at a time, so memory use does not depend on the
+    clip length. Full detection runs on every ``detect_every``-th frame and
+    boxes are tracked in between. Per-frame results are written as JSON lines.
+
+    Args:
+        detect_faces: callable returning the face boxes of a keyframe, e.g.
+            ``FaceDetector.detect_faces``
+        video_path: path to the video file
+        output_dir: directory where the results are written
+        unique_id: unique identifier used in output file names
+        detect_every: run full detection every N frames
+        annotate: also write a copy of the video with boxes drawn around faces
+        progress: callback receiving processed and total frame counts
+        progress_every: number of frames between progress callbacks
+
+    Returns:
+        Summary with the output file names, the number of frames and keyframes
+        and the largest number of faces seen in a frame
+
+    Raises:
+        ValueError: if the video cannot be opened
+    """
+    if detect_every < 1:
+        raise ValueError(f"detect_every must be at least 1, got {detect_every}")
+    capture = VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise ValueError(f"Failed to open video {video_path}")
+
+    total_frames = int(capture.get(CAP_PROP_FRAME_COUNT))
+    fps = capture.get(CAP_PROP_FPS) or 25.0
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results_name = f"video_{unique_id}.jsonl"
+    video_name = f"video_{unique_id}.mp4" if annotate else None
+    writer = None
+    tracker = None
+    frame_index = 0
+    keyframes = 0
+    max_faces = 0
+
+    try:
+        with open(output_dir / results_name, "w") as results:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+
+                gray = cvtColor(frame, COLOR_BGR2GRAY)
+                keyframe = frame_index % detect_every == 0
+                if keyframe:
+                    faces = detect_faces(frame)
+                    boxes = [[int(value) for value in face] for face in faces]
+                    tracker = BoxTracker(gray, boxes)
+                    keyframes += 1
+                else:
+                    boxes = tracker.update(gray)
+                max_faces = max(max_faces, len(boxes))
+
+                results.write(
+                    json.dumps(
+                        {
+                            "frame": frame_index,
+                            "time": round(frame_index / fps, 3),
+                            "keyframe": keyframe,
+                            "boxes": boxes,
+                        }
+                    )
+                    + "\n"
+                )
+
+                if annotate:
+                    if writer is None:
+                        height, width = frame.shape[:2]
+                        writer = VideoWriter(
+                            str(output_dir / video_name),
+                            VideoWriter_fourcc(*"mp4v"),
+                            fps,
+                            (width, height),
+                        )
+                    for x, y, w, h in boxes:
+                        rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                    writer.write(frame)
+
+                frame_index += 1
+                if progress and frame_index % progress_every == 0:
+                    progress(frame_index, total_frames)
+    finally:
+        capture.release()
+        if writer is not None:
+            writer.release()
+
+    if progress:
+        progress(frame_index, frame_index)
+    return {
+        "results": results_name,
+        "video": video_name,
+        "frames": frame_index,
+        "keyframes": keyframes,
+        "max_faces": max_faces,
+    }
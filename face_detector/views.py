@@ -1,20 +1,96 @@
+import asyncio
+import json
+import mimetypes
 import os
 import uuid
+from concurrent.futures import Future
+from dataclasses import asdict
+from itertools import chain
 from pathlib import Path
 
-import magic
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-from django.http import HttpRequest, JsonResponse
+from django.db.models import QuerySet
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 
-from .detector import FaceDetector
+from . import background, history
+from .batch import (
+    BatchError,
+    count_members,
+    iter_archive,
+    max_items,
+    process_batch,
+    start_item,
+)
+from .cache import content_hash, content_key, get_result_cache
+from .detector import DetectionResult, OutputOptions, default_output
+from .executor import ExecutorBusy, InlineExecutor, detect_bytes, get_executor
+from .jobs import VIDEO, get_backend, new_job
+from .metrics import (
+    current_timings,
+    get_registry,
+    inc,
+    instrument,
+    record_timings,
+    render_prometheus,
+    timed,
+)
+from .models import DetectionRecord
+from .notifications import (
+    send_notification,
+    send_notification_in_background,
+    valid_source,
+)
+from .profiles import get_profile
+from .profiling import annotate, profile_request, profiling_active, should_profile
+from .registry import get_detector, pool_size
+from .rendering import (
+    defer_render,
+    get_render_cache,
+    persist,
+    record_name,
+    render,
+    render_config,
+    renders_lazily,
+    wait_for_record,
+)
+from .retention import sharded_name
+from .storage import save_upload
+from .validation import (
+    UploadRejected,
+    detect_content_type,
+    inspect_image,
+    upload_limits,
+)
+from .video import video_config
+
+JOB_STATUS_FIELDS = (
+    "job_id",
+    "kind",
+    "status",
+    "image_url",
+    "faces_detected",
+    "boxes",
+    "results_url",
+    "video_url",
+    "frames",
+    "keyframes",
+    "max_faces",
+    "frames_processed",
+    "total_frames",
+    "error",
+)
+# Allowance for the multipart framing and form fields sent along with an image
+FORM_OVERHEAD_BYTES = 64 * 1024
 
 
 @csrf_exempt
+@instrument
 def upload_image(request: HttpRequest) -> JsonResponse:
     """
     Handle the image upload request.
@@ -25,50 +101,730 @@ def upload_image(request: HttpRequest) -> JsonResponse:
     Returns:
         JsonResponse: JSON response object
     """
-    is_valid, error_response, validated_data = validate_request(request)
+    return handle_upload(request)
+
+
+@profile_request
+def handle_upload(request: HttpRequest) -> JsonResponse:
+    """
+    Process an image upload synchronously, shared by both upload views.
+
+    Args:
+        request: Django HTTP request object
+
+    Returns:
+        JsonResponse: JSON response object
+    """
+    response, validated_data, cached = prepare_upload(request)
+    if response is not None:
+        return response
+
+    if cached is None:
+        try:
+            future = start_detection(validated_data)
+        except ExecutorBusy as e:
+            return busy_response(e)
+        except Exception as e:
+            return detection_error_response(e)
+
+    try:
+        if cached is None:
+            with timed("executor"):
+                result = future.result()
+            cached = store_result(validated_data, result)
+
+        record_history(validated_data, cached)
+        data = result_data(request, cached)
+        send_notification(detection_message(data, validated_data["source"]))
+
+        return JsonResponse({"success": True, **data}, status=200)
+    except Exception as e:
+        return detection_error_response(e)
+
+
+@csrf_exempt
+@instrument
+async def upload_image_async(request: HttpRequest) -> JsonResponse:
+    """
+    Handle the image upload request natively on the ASGI event loop.
+
+    Validation and storage run in worker threads, detection on the detection executor
+    and the WebSocket notification is sent in the background, so the event
+    loop is never blocked and the response does not wait for the channel layer.
+
+    Profiled requests are handled by ``handle_upload`` in a worker thread
+    instead, so the profile only contains this request.
+
+    Args:
+        request: Django HTTP request object
+
+    Returns:
+        JsonResponse: JSON response object
+    """
+    if should_profile(request):
+        return await sync_to_async(handle_upload, thread_sensitive=False)(request)
+
+    response, validated_data, cached = await sync_to_async(
+        prepare_upload, thread_sensitive=False
+    )(request)
+    if response is not None:
+        return response
+
+    if cached is None:
+        try:
+            future = start_detection(validated_data)
+        except ExecutorBusy as e:
+            return busy_response(e)
+        except Exception as e:
+            return detection_error_response(e)
+        try:
+            with timed("executor"):
+                result = await asyncio.wrap_future(future)
+            cached = await sync_to_async(store_result, thread_sensitive=False)(
+                validated_data, result
+            )
+        except Exception as e:
+            return detection_error_response(e)
+
+    record_history(validated_data, cached)
+    data = result_data(request, cached)
+    send_notification_in_background(detection_message(data, validated_data["source"]))
+
+    return JsonResponse({"success": True, **data}, status=200)
+
+
+def prepare_upload(
+    request: HttpRequest,
+) -> tuple[JsonResponse | None, dict | None, dict | None]:
+    """
+    Validate an upload and look it up in the result cache.
+
+    Args:
+        request: Django HTTP request object
+
+    Returns:
+        tuple: (response, validated_data, cached)
+            - response: JsonResponse to return right away, e.g. on validation errors
+              or for async jobs, None otherwise
+            - validated_data: data returned by ``validate_request`` plus the cache key
+            - cached: cached detection result, None on a miss
+    """
+    with timed("validate"):
+        is_valid, error_response, validated_data = validate_request(request)
     if not is_valid:
-        return error_response
+        return error_response, None, None
 
-    filename = validated_data["filename"]
-    upload_path = Path("uploaded") / filename
+    if is_async_request(request):
+        return enqueue_upload(request, validated_data), None, None
 
-    file_path = default_storage.save(
-        str(upload_path), ContentFile(validated_data["file_content"])
+    validated_data["content_hash"] = content_hash(validated_data["file_content"])
+    validated_data["cache_key"] = content_key(
+        validated_data["file_content"],
+        validated_data["profile"],
+        validated_data["output"].key,
+        digest=validated_data["content_hash"],
     )
-    file_full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+    result_cache = get_result_cache()
+    with timed("cache_lookup"):
+        cached = result_cache.get(validated_data["cache_key"]) if result_cache else None
+    return None, validated_data, cached
+
+
+def start_detection(validated_data: dict) -> Future:
+    """
+    Save the original in the background and submit the upload for detection.
+
+    Args:
+        validated_data: data returned by ``prepare_upload``
+
+    Returns:
+        Future resolving to a DetectionResult
+
+    Raises:
+        ExecutorBusy: if the detection queue is full
+    """
+    output = validated_data["output"]
+    if renders_lazily(output):
+        output = OutputOptions(annotate=False)
+    elif getattr(settings, "FACE_DETECTION_SAVE_UPLOADS", True):
+        background.submit(
+            save_upload, validated_data["filename"], validated_data["file_content"]
+        )
+    # Profiled requests detect in their own thread, for the profile to show it
+    executor = InlineExecutor() if profiling_active() else get_executor()
+    return executor.submit(
+        detect_bytes,
+        validated_data["file_content"],
+        validated_data["unique_id"],
+        profile=validated_data["profile"],
+        output=output,
+    )
+
+
+def store_result(validated_data: dict, result: DetectionResult) -> dict:
+    """
+    Put a fresh detection result into the result cache and return it as a dict.
+
+    With lazy rendering, the original and the render record are stored in
+    the background in place of the annotated image.
+    """
+    record_timings(result.timings)
+    inc("face_detection_faces_total", result.faces_detected)
+    annotate(width=result.width, height=result.height, faces=result.faces_detected)
+    if renders_lazily(validated_data["output"]):
+        result = defer_render(
+            validated_data["filename"],
+            validated_data["unique_id"],
+            result,
+            validated_data["output"],
+            content=validated_data["file_content"],
+        )
+    cached = result.as_dict()
+    result_cache = get_result_cache()
+    if result_cache:
+        result_cache.set(validated_data["cache_key"], cached)
+    return cached
+
+
+def record_history(validated_data: dict, result: dict) -> None:
+    """Queue a served result, fresh or cached, for the detection history."""
+    history.record(
+        result,
+        validated_data["content_hash"],
+        validated_data["profile"],
+        source=validated_data["source"],
+        timings=current_timings(),
+    )
+
+
+def media_url(request: HttpRequest) -> str:
+    """Return the absolute URL prefix of the media directory."""
+    return f"{request.scheme}://{request.get_host()}/media/"
+
 
+def result_data(request: HttpRequest, result: dict) -> dict:
+    """
+    Build the response fields describing a detection result.
+
+    Args:
+        request: Django HTTP request object
+        result: detection result as returned by ``DetectionResult.as_dict``
+
+    Returns:
+        ``faces_detected`` and ``boxes``, plus ``image_url`` if an image was saved
+    """
+    data = {"faces_detected": len(result["boxes"]), "boxes": result["boxes"]}
+    if result["processed_path"] is not None:
+        data["image_url"] = media_url(request) + result["processed_path"]
+    return data
+
+
+def detection_message(data: dict, source: str | None = None) -> dict:
+    """Build the channel layer message announcing a processed upload."""
+    message = {
+        "type": "face_detection_notification",
+        "faces_detected": data["faces_detected"],
+    }
+    if "image_url" in data:
+        message["image_url"] = data["image_url"]
+    if source:
+        message["source"] = source
+    return message
+
+
+def output_options(request: HttpRequest) -> OutputOptions:
+    """
+    Read how the result of an upload should be produced.
+
+    ``output=boxes`` skips drawing, encoding and saving the annotated image.
+    Otherwise ``format``, ``quality`` and ``max_dimension`` override the
+    ``FACE_DETECTION_OUTPUT`` setting.
+
+    Raises:
+        ValueError: if an option is invalid
+    """
+
+    def param(name: str) -> str | None:
+        return request.POST.get(name, request.GET.get(name)) or None
+
+    mode = param("output") or "image"
+    if mode not in ("image", "boxes"):
+        raise ValueError(f"output must be image or boxes, got {mode}")
+    if mode == "boxes":
+        return OutputOptions(annotate=False)
+
+    defaults = default_output()
     try:
-        detector = FaceDetector()
-        processed_path, faces_count = detector.process_image(
-            Path(file_full_path), validated_data["unique_id"]
+        quality = int(param("quality")) if param("quality") else defaults.quality
+        max_dimension = (
+            int(param("max_dimension"))
+            if param("max_dimension")
+            else defaults.max_dimension
         )
+    except ValueError:
+        raise ValueError("quality and max_dimension must be integers")
+    return OutputOptions(
+        format=(param("format") or defaults.format).lower(),
+        quality=quality,
+        max_dimension=max_dimension,
+    )
+
+
+def detection_profile(request: HttpRequest) -> str:
+    """
+    Read the detection profile an upload asks for, e.g. ``fast`` or ``accurate``.
+
+    Returns:
+        Name of the profile, the configured default if none was asked for
+
+    Raises:
+        ValueError: if the profile is not configured
+    """
+    return get_profile(request.POST.get("profile", request.GET.get("profile"))).name
 
-        image_url = f"{request.scheme}://{request.get_host()}/media/{processed_path}"
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            "faces",
-            {
-                "type": "face_detection_notification",
-                "image_url": image_url,
-                "faces_detected": faces_count,
+def upload_source(request: HttpRequest) -> str | None:
+    """
+    Read the optional source tag clients can subscribe to.
+
+    Raises:
+        ValueError: if the tag cannot be used for routing
+    """
+    source = request.POST.get("source", request.GET.get("source")) or None
+    if source is not None and not valid_source(source):
+        raise ValueError("source must be 1-64 letters, digits, '-' or '_'")
+    return source
+
+
+def busy_response(error: ExecutorBusy) -> JsonResponse:
+    """Build the 503 response sent when the detection queue is full."""
+    response = JsonResponse({"error": str(error)}, status=503)
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def detection_error_response(error: Exception) -> JsonResponse:
+    """Map an exception raised while processing an upload to an error response."""
+    if isinstance(error, FileNotFoundError):
+        return JsonResponse({"error": "File not found: " + str(error)}, status=404)
+    if isinstance(error, ValueError):
+        return JsonResponse({"error": "Value error: " + str(error)}, status=400)
+    return JsonResponse(
+        {"error": "An unexpected error occurred: " + str(error)}, status=500
+    )
+
+
+def is_async_request(request: HttpRequest) -> bool:
+    """Tell whether the client asked for the upload to be processed as a job."""
+    value = request.POST.get("async", request.GET.get("async", ""))
+    return value.lower() in ("1", "true", "yes")
+
+
+def enqueue_upload(request: HttpRequest, validated_data: dict) -> JsonResponse:
+    """
+    Store the upload and queue it for detection instead of processing it inline.
+
+    Args:
+        request: Django HTTP request object
+        validated_data: data returned by ``validate_request``
+
+    Returns:
+        JsonResponse: 202 response with the job id and the status URL
+    """
+    upload_name = save_upload(
+        validated_data["filename"], validated_data["file_content"]
+    )
+    return submit_job(
+        request,
+        new_job(
+            upload_name,
+            media_url(request),
+            options={
+                "output": asdict(validated_data["output"]),
+                "profile": validated_data["profile"],
             },
+            source=validated_data["source"],
+        ),
+    )
+
+
+def submit_job(request: HttpRequest, job: dict) -> JsonResponse:
+    """
+    Queue a job on the configured backend.
+
+    Args:
+        request: Django HTTP request object
+        job: job record created by ``new_job``
+
+    Returns:
+        JsonResponse: 202 response with the job id and the status URL
+    """
+    try:
+        job = get_backend().submit(job)
+    except ExecutorBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return JsonResponse({"error": "Failed to queue job: " + str(e)}, status=503)
+
+    return JsonResponse(
+        {
+            "success": True,
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": request.build_absolute_uri(
+                reverse("job_status", args=[job["job_id"]])
+            ),
+        },
+        status=202,
+    )
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Expose timings and counters in the Prometheus text format.
+
+    With ``FACE_DETECTION_METRICS["DIRECTORY"]`` set, the metrics of every
+    server process writing to that directory are added up.
+
+    Args:
+        request: Django HTTP request object
+
+    Returns:
+        HttpResponse: exposition text
+    """
+    registry = get_registry()
+    if registry is None:
+        raise Http404("Metrics are disabled")
+    return HttpResponse(
+        render_prometheus(registry.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def detections(request: HttpRequest) -> JsonResponse:
+    """
+    List past detection results, newest first, one page at a time.
+
+    Optional query parameters: ``since`` and ``until`` (ISO 8601 times),
+    ``content_hash``, ``faces``, ``min_faces``, ``max_faces``, ``profile``,
+    ``source``, ``limit`` and ``cursor``, the ``next_cursor`` of the
+    previous page. Totals are not counted, as counting is slow on large tables.
+
+    Args:
+        request: Django HTTP request object
+
+    Returns:
+        JsonResponse: page of results and the cursor of the next page
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET requests are allowed"}, status=405)
+
+    config = history.history_config()
+    try:
+        queryset = history_filters(request)
+        limit = int(request.GET.get("limit", config["PAGE_SIZE"]))
+        if not 1 <= limit <= config["MAX_PAGE_SIZE"]:
+            raise ValueError(f"limit must be between 1 and {config['MAX_PAGE_SIZE']}")
+        records, next_cursor = history.page(queryset, limit, request.GET.get("cursor"))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    prefix = media_url(request)
+    results = []
+    for record in records:
+        result = history.as_dict(record)
+        if record.processed_path is not None:
+            result["image_url"] = prefix + record.processed_path
+        results.append(result)
+    return JsonResponse({"results": results, "next_cursor": next_cursor}, status=200)
+
+
+def history_filters(request: HttpRequest) -> QuerySet:
+    """
+    Build the query of the ``detections`` view from its query parameters.
+
+    Raises:
+        ValueError: if a parameter is malformed
+    """
+    queryset = DetectionRecord.objects.all()
+    for name, lookup in (("since", "created_at__gte"), ("until", "created_at__lt")):
+        if request.GET.get(name):
+            moment = parse_datetime(request.GET[name])
+            if moment is None:
+                raise ValueError(f"{name} must be an ISO 8601 time")
+            if timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+            queryset = queryset.filter(**{lookup: moment})
+    for name, lookup in (
+        ("faces", "faces_detected"),
+        ("min_faces", "faces_detected__gte"),
+        ("max_faces", "faces_detected__lte"),
+    ):
+        if request.GET.get(name):
+            try:
+                queryset = queryset.filter(**{lookup: int(request.GET[name])})
+            except ValueError:
+                raise ValueError(f"{name} must be an integer") from None
+    for name in ("content_hash", "profile", "source"):
+        if request.GET.get(name):
+            queryset = queryset.filter(**{name: request.GET[name]})
+    return queryset
+
+
+def job_status(request: HttpRequest, job_id: str) -> JsonResponse:
+    """
+    Report the state of a detection job queued by an async upload.
+
+    Args:
+        request: Django HTTP request object
+        job_id: id returned by the upload
+
+    Returns:
+        JsonResponse: JSON response object with the job state
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET requests are allowed"}, status=405)
+
+    job = get_backend().get(str(job_id))
+    if job is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    return JsonResponse(
+        {key: job[key] for key in JOB_STATUS_FIELDS if key in job}, status=200
+    )
+
+
+@instrument
+def processed_image(request: HttpRequest, name: str) -> HttpResponse:
+    """
+    Serve an annotated image, rendering it on first download if it was deferred.
+
+    Rendered images are kept in a size-capped LRU cache and, with
+    ``FACE_DETECTION_RENDER["PERSIST"]``, also written to the media directory.
+
+    Args:
+        request: Django HTTP request object
+        name: name of the image under ``processed/``, including its shard
+
+    Returns:
+        HttpResponse: the encoded image
+    """
+    if request.method not in ("GET", "HEAD"):
+        return JsonResponse({"error": "Only GET requests are allowed"}, status=405)
+
+    path = f"processed/{name}"
+    content_type = mimetypes.guess_type(name)[0]
+    render_cache = get_render_cache()
+    content = render_cache.get(path)
+    if content is None:
+        if default_storage.exists(path):
+            return FileResponse(default_storage.open(path), content_type=content_type)
+        wait_for_record(path)
+        if not default_storage.exists(record_name(path)):
+            raise Http404("Image not found")
+        with default_storage.open(record_name(path)) as record_file:
+            record = json.load(record_file)
+        if OutputOptions(**record["output"]).extension != Path(name).suffix:
+            raise Http404("Image not found")
+
+        try:
+            with timed("render"):
+                content = render(record)
+        except FileNotFoundError:
+            # The original was removed by the media sweeper
+            raise Http404("Image expired")
+        except (OSError, ValueError) as e:
+            return JsonResponse(
+                {"error": "Failed to render image: " + str(e)}, status=500
+            )
+        render_cache.set(path, content)
+        if render_config()["PERSIST"]:
+            background.submit(persist, path, content)
+
+    return HttpResponse(content, content_type=content_type)
+
+
+def video_output(request: HttpRequest, name: str) -> HttpResponse:
+    """
+    Serve the results or the annotated video written by a video job.
+
+    Args:
+        request: Django HTTP request object
+        name: name of the file under ``processed/``, including its shard
+
+    Returns:
+        FileResponse: the JSON lines results or the MP4 video
+    """
+    if request.method not in ("GET", "HEAD"):
+        return JsonResponse({"error": "Only GET requests are allowed"}, status=405)
+
+    path = f"processed/{name}"
+    if not default_storage.exists(path):
+        raise Http404("Video output not found")
+    content_type = "application/x-ndjson" if name.endswith(".jsonl") else "video/mp4"
+    return FileResponse(default_storage.open(path), content_type=content_type)
+
+
+@csrf_exempt
+@instrument
+def upload_video(request: HttpRequest) -> JsonResponse:
+    """
+    Handle a video upload by queueing it as a detection job.
+
+    The video is streamed to disk in chunks and processed frame by frame by a
+    job worker, with progress and the results sent to WebSocket clients.
+    Optional form fields: ``detect_every`` (run full detection every N frames)
+    and ``annotate`` (also produce a video with boxes drawn around faces).
+
+    Args:
+        request: Django HTTP request object
+
+    Returns:
+        JsonResponse: 202 response with the job id and the status URL
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST requests are allowed"}, status=405)
+
+    if "video" not in request.FILES:
+        return JsonResponse({"error": "No video file provided"}, status=400)
+
+    config = video_config()
+    video_file = request.FILES["video"]
+    if video_file.size > config["MAX_UPLOAD_BYTES"]:
+        return JsonResponse(
+            {"error": f"Video exceeds {config['MAX_UPLOAD_BYTES']} bytes"}, status=413
         )
 
+    content_type = detect_content_type(video_file.read(2048))
+    video_file.seek(0)
+    if not content_type.startswith("video/"):
         return JsonResponse(
-            {"success": True, "image_url": image_url, "faces_detected": faces_count},
-            status=200,
+            {"error": f"Uploaded file is not a video. Detected type: {content_type}"},
+            status=400,
         )
 
-    except FileNotFoundError as e:
-        return JsonResponse({"error": "File not found: " + str(e)}, status=404)
+    try:
+        detect_every = int(request.POST.get("detect_every", config["DETECT_EVERY"]))
+    except ValueError:
+        detect_every = 0
+    if detect_every < 1:
+        return JsonResponse(
+            {"error": "detect_every must be a positive integer"}, status=400
+        )
+
+    try:
+        source = upload_source(request)
+        profile = detection_profile(request)
     except ValueError as e:
-        return JsonResponse({"error": "Value error: " + str(e)}, status=400)
-    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    file_extension = os.path.splitext(video_file.name)[1]
+    upload_name = default_storage.save(
+        sharded_name("uploaded", f"video_{uuid.uuid4()}{file_extension}"), video_file
+    )
+    options = {
+        "detect_every": detect_every,
+        "annotate": request.POST.get("annotate", "").lower() in ("1", "true", "yes"),
+        "profile": profile,
+    }
+    return submit_job(
+        request,
+        new_job(
+            upload_name, media_url(request), kind=VIDEO, options=options, source=source
+        ),
+    )
+
+
+@csrf_exempt
+@instrument
+def upload_batch(request: HttpRequest) -> JsonResponse:
+    """
+    Handle an upload of many images at once.
+
+    Images are sent as repeated ``image`` parts and/or a zip or tar file
+    in the ``archive`` part. They are detected on the detection executor,
+    a few at a time, and a single notification with all results is sent to
+    WebSocket clients. A batch over ``FACE_DETECTION_BATCH_MAX_ITEMS`` is
+    rejected before any work when its size is known up front, a streamed
+    tar archive with the results of the items processed until then.
+
+    Args:
+        request: Django HTTP request object
+
+    Returns:
+        JsonResponse: JSON response object with one result per image
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST requests are allowed"}, status=405)
+
+    images = request.FILES.getlist("image")
+    archive = request.FILES.get("archive")
+    if not images and archive is None:
+        return JsonResponse({"error": "No image files provided"}, status=400)
+
+    try:
+        source = upload_source(request)
+        output = output_options(request)
+        profile = detection_profile(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Tar archives are streamed, their members are only counted as they come
+    known = len(images) + ((count_members(archive) or 0) if archive else 0)
+    if known > max_items():
         return JsonResponse(
-            {"error": "An unexpected error occurred: " + str(e)}, status=500
+            {"error": f"Batch exceeds the limit of {max_items()} images"}, status=400
         )
 
+    items = ((image.name, image.read()) for image in images)
+    if archive is not None:
+        items = chain(items, iter_archive(archive))
+
+    detector = get_detector(profile)
+    prefix = media_url(request)
+    try:
+        results = process_batch(
+            items,
+            lambda name, content: start_item(
+                detector, name, content, prefix, output, source
+            ),
+            window=pool_size(),
+        )
+    except ExecutorBusy as e:
+        return busy_response(e)
+    except BatchError as e:
+        return JsonResponse({"error": str(e), "results": e.results}, status=400)
+
+    processed = [result for result in results if result["success"]]
+    faces_count = sum(result["faces_detected"] for result in processed)
+    if processed:
+        message = {
+            "type": "face_detection_batch_notification",
+            "results": [
+                {
+                    key: result[key]
+                    for key in ("image_url", "faces_detected")
+                    if key in result
+                }
+                for result in processed
+            ],
+            "faces_detected": faces_count,
+        }
+        if source:
+            message["source"] = source
+        send_notification(message)
+
+    return JsonResponse(
+        {
+            "success": len(processed) == len(results),
+            "processed": len(processed),
+            "failed": len(results) - len(processed),
+            "faces_detected": faces_count,
+            "results": results,
+        },
+        status=200,
+    )
+
 
 def validate_request(
     request: HttpRequest,
@@ -83,7 +839,8 @@ def validate_request(
         tuple: (is_valid, error_response, validated_data)
             - is_valid: Boolean indicating if the request is valid
             - error_response: JsonResponse object if validation fails, None otherwise
-            - validated_data: Dictionary containing validated data if successful, None otherwise
+            - validated_data: Dictionary containing validated data if successful,
+              None otherwise
     """
     if request.method != "POST":
         return (
@@ -92,30 +849,46 @@ def validate_request(
             None,
         )
 
-    if "image" not in request.FILES:
+    # Refuse oversized bodies before the multipart parser reads them
+    max_bytes = upload_limits()["MAX_BYTES"]
+    try:
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
         return (
             False,
-            JsonResponse({"error": "No image file provided"}, status=400),
+            JsonResponse({"error": "Invalid Content-Length header"}, status=400),
+            None,
+        )
+    if content_length > max_bytes + FORM_OVERHEAD_BYTES:
+        return (
+            False,
+            JsonResponse({"error": f"Image exceeds {max_bytes} bytes"}, status=413),
             None,
         )
 
-    image_file = request.FILES["image"]
-    file_content = image_file.read()
-    mime = magic.Magic(mime=True)
-    content_type = mime.from_buffer(file_content)
-
-    if not content_type.startswith("image/"):
+    if "image" not in request.FILES:
         return (
             False,
-            JsonResponse(
-                {
-                    "error": f"Uploaded file is not an image. Detected type: {content_type}"
-                },
-                status=400,
-            ),
+            JsonResponse({"error": "No image file provided"}, status=400),
             None,
         )
 
+    try:
+        source = upload_source(request)
+        output = output_options(request)
+        profile = detection_profile(request)
+    except ValueError as e:
+        return False, JsonResponse({"error": str(e)}, status=400), None
+
+    image_file = request.FILES["image"]
+    inc("face_detection_upload_bytes_total", image_file.size)
+    try:
+        inspect_image(image_file, image_file.size)
+    except UploadRejected as e:
+        return False, JsonResponse({"error": str(e)}, status=e.status), None
+    # Only read whole once the size and pixel limits are known to hold
+    file_content = image_file.read()
+
     unique_id = str(uuid.uuid4())
     file_extension = os.path.splitext(image_file.name)[1]
     filename = f"upload_{unique_id}{file_extension}"
@@ -127,5 +900,8 @@ def validate_request(
             "file_content": file_content,
             "filename": filename,
             "unique_id": unique_id,
+            "source": source,
+            "output": output,
+            "profile": profile,
         },
     )
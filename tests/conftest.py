@@ -7,18 +7,23 @@ from channels.testing import WebsocketCommunicator
 from channels.routing import URLRouter
 from django.core.files.uploadedfile import SimpleUploadedFile
 from collections.abc import AsyncGenerator
+from django.core.management import call_command
 from face_detection.asgi import application
 
 from face_detection.routing import websocket_urlpatterns
 
 
 @pytest.fixture(scope="session")
-def django_db_setup():
+def django_db_setup(django_db_blocker):
     """Setup database configuration for tests"""
-    settings.DATABASES["default"] = {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": ":memory:",
-    }
+    settings.DATABASES["default"].update(
+        {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+        }
+    )
+    with django_db_blocker.unblock():
+        call_command("migrate", verbosity=0)
 
 
 @pytest.fixture
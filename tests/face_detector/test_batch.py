@@ -0,0 +1,217 @@
+import io
+import json
+import tarfile
+import zipfile
+from pathlib import Path
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from face_detector.batch import BatchError, iter_archive, process_batch
+from face_detector.executor import ExecutorBusy
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+def make_zip(members: dict) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for name, content in members.items():
+            zip_file.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def make_tar(members: dict) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar_file:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar_file.addfile(info, io.BytesIO(content))
+    buffer.seek(0)
+    return buffer
+
+
+class IterArchiveTests(TestCase):
+    """Test cases for reading batch members from archives."""
+
+    def test_zip_members(self):
+        """Test that zip members are yielded with their content."""
+        archive = make_zip({"a.jpg": b"first", "dir/b.jpg": b"second"})
+
+        self.assertEqual(
+            list(iter_archive(archive)), [("a.jpg", b"first"), ("dir/b.jpg", b"second")]
+        )
+
+    def test_compressed_tar_members(self):
+        """Test that compressed tar members are streamed."""
+        archive = make_tar({"a.jpg": b"first", "b.jpg": b"second"})
+
+        self.assertEqual(
+            list(iter_archive(archive)), [("a.jpg", b"first"), ("b.jpg", b"second")]
+        )
+
+    @override_settings(FACE_DETECTION_BATCH_MAX_MEMBER_BYTES=4)
+    def test_oversized_members_are_not_read(self):
+        """Test that members above the size limit are yielded without content."""
+        archive = make_zip({"big.jpg": b"0123456789", "small.jpg": b"0123"})
+
+        self.assertEqual(
+            list(iter_archive(archive)), [("big.jpg", b""), ("small.jpg", b"0123")]
+        )
+
+    def test_unknown_archive_format(self):
+        """Test that anything other than zip or tar is rejected."""
+        with self.assertRaises(BatchError):
+            list(iter_archive(io.BytesIO(b"definitely not an archive")))
+
+
+def started(name, content):
+    return lambda: {"name": name}
+
+
+class ProcessBatchTests(TestCase):
+    """Test cases for the bounded batch runner."""
+
+    def test_results_keep_input_order(self):
+        """Test that results are returned in the order of the items."""
+        items = ((str(i), bytes([i])) for i in range(20))
+
+        results = process_batch(items, started, window=3)
+
+        self.assertEqual([r["name"] for r in results], [str(i) for i in range(20)])
+
+    @override_settings(FACE_DETECTION_BATCH_MAX_ITEMS=2)
+    def test_item_limit(self):
+        """Test that batches above the limit are stopped with the results so far."""
+        items = [("a", b""), ("b", b""), ("c", b"")]
+
+        with self.assertRaises(BatchError) as raised:
+            process_batch(items, started, window=2)
+
+        self.assertEqual([r["name"] for r in raised.exception.results], ["a", "b"])
+
+    def test_full_queue_waits_for_own_items(self):
+        """Test that a full queue first drains the items of the batch."""
+        in_flight = []
+
+        def start(name, content):
+            if len(in_flight) == 2:
+                raise ExecutorBusy(1)
+            in_flight.append(name)
+            return lambda: in_flight.remove(name) or {"name": name}
+
+        results = process_batch(((str(i), b"") for i in range(5)), start, window=4)
+
+        self.assertEqual([r["name"] for r in results], [str(i) for i in range(5)])
+
+    def test_full_queue_without_own_items(self):
+        """Test that a batch cannot start while the queue is full of other work."""
+
+        def start(name, content):
+            raise ExecutorBusy(1)
+
+        with self.assertRaises(ExecutorBusy):
+            process_batch([("a", b"")], start, window=2)
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, FACE_DETECTION_SAVE_UPLOADS=False
+)
+class UploadBatchViewTests(TestCase):
+    """Test cases for the batch upload endpoint."""
+
+    def test_multiple_image_parts_and_archive(self):
+        """Test that parts and archive members are processed with per-item results."""
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_add)("faces", "test-channel")
+        archive = make_zip({"inside.jpg": FACE_IMAGE, "notes.txt": b"plain text"})
+
+        response = self.client.post(
+            "/images",
+            {
+                "image": [
+                    SimpleUploadedFile("one.jpg", FACE_IMAGE),
+                    SimpleUploadedFile("two.jpg", FACE_IMAGE),
+                ],
+                "archive": SimpleUploadedFile("photos.zip", archive.read()),
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [r["name"] for r in data["results"]],
+            ["one.jpg", "two.jpg", "inside.jpg", "notes.txt"],
+        )
+        self.assertEqual(data["processed"], 3)
+        self.assertEqual(data["failed"], 1)
+        self.assertFalse(data["results"][3]["success"])
+
+        message = async_to_sync(channel_layer.receive)("test-channel")
+        self.assertEqual(message["type"], "face_detection_batch_notification")
+        payload = json.loads(message["text"])
+        self.assertEqual(len(payload["results"]), 3)
+        self.assertEqual(payload["faces_detected"], data["faces_detected"])
+
+    @override_settings(FACE_DETECTION_BATCH_MAX_ITEMS=2)
+    @patch("face_detector.batch.get_executor")
+    def test_item_limit_is_checked_up_front(self, get_executor):
+        """Test that a batch known to be too large is rejected before any work."""
+        archive = make_zip({"a.jpg": FACE_IMAGE, "b.jpg": FACE_IMAGE})
+
+        response = self.client.post(
+            "/images",
+            {
+                "image": SimpleUploadedFile("one.jpg", FACE_IMAGE),
+                "archive": SimpleUploadedFile("photos.zip", archive.read()),
+            },
+        )
+
+        self.assertEqual(response.status_code, 400)
+        get_executor.assert_not_called()
+
+    @override_settings(FACE_DETECTION_BATCH_MAX_ITEMS=1)
+    def test_streamed_archive_over_the_limit(self):
+        """Test that a tar over the limit returns the results processed so far."""
+        archive = make_tar({"a.jpg": FACE_IMAGE, "b.jpg": FACE_IMAGE})
+
+        response = self.client.post(
+            "/images", {"archive": SimpleUploadedFile("photos.tgz", archive.read())}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r["name"] for r in response.json()["results"]], ["a.jpg"])
+
+    @patch("face_detector.batch.get_executor")
+    def test_full_detection_queue(self, get_executor):
+        """Test that batch items go through the bounded detection executor."""
+        get_executor.return_value.submit.side_effect = ExecutorBusy(3)
+
+        response = self.client.post(
+            "/images", {"image": SimpleUploadedFile("one.jpg", FACE_IMAGE)}
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+
+    def test_empty_request(self):
+        """Test that a batch without images is rejected."""
+        response = self.client.post("/images", {})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_archive(self):
+        """Test that an unreadable archive is rejected."""
+        response = self.client.post(
+            "/images", {"archive": SimpleUploadedFile("photos.zip", b"garbage")}
+        )
+
+        self.assertEqual(response.status_code, 400)
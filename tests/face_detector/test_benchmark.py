@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from face_detector import history
+from face_detector.benchmark import (
+    benchmark_images,
+    compare,
+    isolated_environment,
+    run_benchmarks,
+    summarize,
+    synthetic_image,
+)
+
+FIXTURE = Path("tests/face_detector/testdata/face1.jpg")
+
+
+class BenchmarkTests(SimpleTestCase):
+    """Test cases for the benchmark suite helpers."""
+
+    def test_synthetic_images_are_reproducible(self):
+        """Test that the same arguments always give the same pixels."""
+        face_photo = np.full((30, 20, 3), 255, dtype=np.uint8)
+
+        first = synthetic_image(64, 48, 4, face_photo)
+        second = synthetic_image(64, 48, 4, face_photo)
+
+        self.assertEqual(first.shape, (48, 64, 3))
+        self.assertTrue(np.array_equal(first, second))
+
+    def test_summary_percentiles(self):
+        """Test that throughput and percentiles are computed from durations."""
+        summary = summarize([0.01] * 98 + [0.1, 0.2])
+
+        self.assertEqual(summary["runs"], 100)
+        self.assertEqual(summary["p50_ms"], 10)
+        self.assertGreater(summary["p99_ms"], summary["p95_ms"])
+        self.assertAlmostEqual(summary["ops_per_sec"], 100 / 1.28, places=2)
+
+    def test_compare_flags_regressions(self):
+        """Test that cases slower than the tolerance are flagged."""
+        baseline = {"results": {"a": {"p50_ms": 10}, "b": {"p50_ms": 10}}}
+        report = {
+            "results": {"a": {"p50_ms": 10.5}, "b": {"p50_ms": 12}, "c": {"p50_ms": 1}}
+        }
+
+        comparison = compare(report, baseline, tolerance=0.1)
+
+        self.assertEqual(
+            [(entry["case"], entry["regression"]) for entry in comparison],
+            [("a", False), ("b", True)],
+        )
+
+    def test_run_covers_every_stage(self):
+        """Test a minimal run through the detector and the upload endpoint."""
+        images = benchmark_images(["vga"], [1], [FIXTURE])
+
+        report = run_benchmarks(
+            images[:1],
+            ["detect_faces", "process_image", "upload_image"],
+            iterations=1,
+            warmup=0,
+        )
+
+        self.assertEqual(
+            sorted(report["results"]),
+            [
+                "detect_faces/vga-1faces",
+                "process_image/vga-1faces",
+                "upload_image/vga-1faces",
+            ],
+        )
+        self.assertEqual(report["results"]["upload_image/vga-1faces"]["runs"], 1)
+        self.assertIn("opencv", report["environment"])
+
+    def test_isolated_environment_skips_history(self):
+        """Test that benchmark uploads are not written to the history."""
+        with isolated_environment():
+            self.assertIsNone(history.get_writer())
@@ -0,0 +1,161 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from face_detector.bulk import ManifestWriter, iter_directory, read_manifest
+
+FACE_IMAGE_PATH = Path("tests/face_detector/testdata/face1.jpg")
+
+
+class BulkDetectTests(TestCase):
+    """Test cases for the bulk_detect command."""
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.images = self.tmp_dir / "images"
+        (self.images / "b").mkdir(parents=True)
+        shutil.copy(FACE_IMAGE_PATH, self.images / "a.jpg")
+        shutil.copy(FACE_IMAGE_PATH, self.images / "b" / "c.JPG")
+        (self.images / "b" / "broken.png").write_bytes(b"not an image")
+        (self.images / "notes.txt").write_text("skipped")
+
+    def bulk_detect(self, *args) -> str:
+        output = StringIO()
+        call_command("bulk_detect", *args, "--inline", stdout=output)
+        return output.getvalue()
+
+    def test_iter_directory(self):
+        """Test that image files are found recursively in a stable order."""
+        self.assertEqual(
+            [name for name, _ in iter_directory(self.images)],
+            ["a.jpg", "b/broken.png", "b/c.JPG"],
+        )
+
+    def test_jsonl_manifest_and_annotated_output(self):
+        """Test that every image gets a record and, if asked, an annotated copy."""
+        manifest = self.tmp_dir / "manifest.jsonl"
+        output = self.bulk_detect(
+            str(self.images),
+            "--manifest",
+            str(manifest),
+            "--output-dir",
+            str(self.tmp_dir / "out"),
+            "--format",
+            "png",
+        )
+
+        records = {record["path"]: record for record in read_manifest(manifest)}
+        self.assertEqual(set(records), {"a.jpg", "b/broken.png", "b/c.JPG"})
+        self.assertEqual(records["a.jpg"]["faces_detected"], 1)
+        self.assertEqual(
+            (records["a.jpg"]["width"], records["a.jpg"]["height"]), (540, 360)
+        )
+        self.assertFalse(records["b/broken.png"]["success"])
+        self.assertTrue((self.tmp_dir / "out" / "b" / "c.png").exists())
+        self.assertIn("3 processed, 1 failed, 2 faces", output)
+
+    def test_resumes_from_manifest(self):
+        """Test that files already in the manifest are skipped."""
+        manifest = self.tmp_dir / "manifest.csv"
+        with ManifestWriter(manifest) as writer:
+            writer.write(
+                {
+                    "path": "a.jpg",
+                    "success": True,
+                    "faces_detected": 1,
+                    "width": 540,
+                    "height": 360,
+                    "boxes": [[1, 2, 3, 4]],
+                    "output": None,
+                    "error": None,
+                }
+            )
+        # Simulate a crash in the middle of writing the next record
+        with open(manifest, "a") as f:
+            f.write("b/c.JPG,Tr")
+
+        output = self.bulk_detect(str(self.images), "--manifest", str(manifest))
+
+        records = list(read_manifest(manifest))
+        self.assertEqual(
+            [record["path"] for record in records], ["a.jpg", "b/broken.png", "b/c.JPG"]
+        )
+        self.assertEqual(records[0]["boxes"], [[1, 2, 3, 4]])
+        self.assertIn("Resuming, 1 files", output)
+        self.assertIn("1 files skipped", output)
+
+        output = self.bulk_detect(
+            str(self.images), "--manifest", str(manifest), "--retry-failed"
+        )
+        self.assertIn("1 processed, 1 failed", output)
+
+    def test_file_list(self):
+        """Test that a list of paths can be processed instead of a directory."""
+        file_list = self.tmp_dir / "files.txt"
+        file_list.write_text(f"# backfill\n{self.images / 'a.jpg'}\n\n")
+        manifest = self.tmp_dir / "manifest.jsonl"
+
+        self.bulk_detect("--file-list", str(file_list), "--manifest", str(manifest))
+
+        (record,) = read_manifest(manifest)
+        self.assertEqual(record["path"], str(self.images / "a.jpg"))
+        self.assertIsNone(record["output"])
+
+    def test_output_names_stay_in_output_dir(self):
+        """Test that listed paths never overwrite inputs or each other."""
+        shutil.copy(FACE_IMAGE_PATH, self.images / "a.png")
+        file_list = self.tmp_dir / "files.txt"
+        file_list.write_text(
+            f"{self.images / 'a.jpg'}\n{self.images / 'a.png'}\n../escape.jpg\n"
+        )
+        manifest = self.tmp_dir / "manifest.jsonl"
+        out = self.tmp_dir / "out"
+
+        self.bulk_detect(
+            "--file-list",
+            str(file_list),
+            "--manifest",
+            str(manifest),
+            "--output-dir",
+            str(out),
+        )
+
+        records = list(read_manifest(manifest))
+        self.assertEqual(
+            (self.images / "a.jpg").read_bytes(), FACE_IMAGE_PATH.read_bytes()
+        )
+        outputs = [Path(record["output"]) for record in records[:2]]
+        self.assertNotEqual(outputs[0], outputs[1])
+        for output in outputs:
+            self.assertTrue(output.exists())
+            self.assertTrue(output.resolve().is_relative_to(out.resolve()))
+        self.assertFalse(records[2]["success"])
+        self.assertIn("outside of the output directory", records[2]["error"])
+
+    def test_process_pool(self):
+        """Test that detection runs in worker processes."""
+        manifest = self.tmp_dir / "manifest.jsonl"
+        output = StringIO()
+        call_command(
+            "bulk_detect",
+            str(self.images),
+            "--manifest",
+            str(manifest),
+            "--workers",
+            "2",
+            stdout=output,
+        )
+
+        faces = [json.loads(line)["faces_detected"] for line in open(manifest)]
+        self.assertEqual(faces, [1, 0, 1])
+
+    def test_requires_one_source(self):
+        """Test that a directory or a file list must be given, not both."""
+        with self.assertRaises(CommandError):
+            self.bulk_detect("--manifest", str(self.tmp_dir / "m.jsonl"))
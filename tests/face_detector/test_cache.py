@@ -0,0 +1,115 @@
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from face_detector import cache
+from face_detector.cache import ResultCache, content_key
+from face_detector.executor import detect_bytes
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+class ResultCacheTests(TestCase):
+    """Test cases for the content-addressed result cache."""
+
+    def setUp(self):
+        self.processed_path = default_storage.save(
+            "processed/cache_test.jpg", ContentFile(b"processed")
+        )
+        self.addCleanup(default_storage.delete, self.processed_path)
+        self.value = {"processed_path": self.processed_path, "boxes": [[1, 2, 3, 4]]}
+
+    def test_content_key_depends_on_bytes_and_profile(self):
+        """Test that keys identify both the content and the detection profile."""
+        self.assertEqual(content_key(b"a", "default"), content_key(b"a", "default"))
+        self.assertNotEqual(content_key(b"a", "default"), content_key(b"b", "default"))
+        self.assertNotEqual(content_key(b"a", "default"), content_key(b"a", "fast"))
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted as hits and misses."""
+        result_cache = ResultCache(max_entries=10, ttl=60)
+
+        self.assertIsNone(result_cache.get("key"))
+        result_cache.set("key", self.value)
+        self.assertEqual(result_cache.get("key"), self.value)
+
+        stats = result_cache.stats()
+        self.assertEqual(stats["local_hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the local tier is bounded by the number of entries."""
+        result_cache = ResultCache(max_entries=2, ttl=60)
+        result_cache.set("a", self.value)
+        result_cache.set("b", self.value)
+        result_cache.get("a")
+        result_cache.set("c", self.value)
+
+        self.assertIsNotNone(result_cache.get("a"))
+        self.assertIsNone(result_cache.get("b"))
+        self.assertIsNotNone(result_cache.get("c"))
+
+    def test_expired_entries_are_misses(self):
+        """Test that entries older than the TTL are not returned."""
+        result_cache = ResultCache(max_entries=10, ttl=0)
+        result_cache.set("key", self.value)
+
+        self.assertIsNone(result_cache.get("key"))
+
+    def test_missing_processed_file_is_a_miss(self):
+        """Test that entries pointing at deleted images are dropped."""
+        result_cache = ResultCache(max_entries=10, ttl=60)
+        result_cache.set("key", {"processed_path": "processed/gone.jpg", "boxes": []})
+
+        self.assertIsNone(result_cache.get("key"))
+        self.assertEqual(result_cache.stats()["entries"], 0)
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, FACE_DETECTION_SAVE_UPLOADS=False
+)
+class UploadCacheTests(TestCase):
+    """Test cases for cached uploads."""
+
+    def setUp(self):
+        cache.reset_result_cache()
+
+    def tearDown(self):
+        cache.reset_result_cache()
+
+    def test_repeated_upload_skips_detection(self):
+        """Test that re-uploading the same bytes reuses the processed image."""
+        first = self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        ).json()
+
+        with patch("face_detector.views.detect_bytes", wraps=detect_bytes) as detect:
+            second = self.client.post(
+                "/image", {"image": SimpleUploadedFile("again.jpg", FACE_IMAGE)}
+            ).json()
+
+        detect.assert_not_called()
+        self.assertEqual(second["image_url"], first["image_url"])
+        self.assertEqual(second["faces_detected"], first["faces_detected"])
+        self.assertEqual(cache.get_result_cache().stats()["local_hits"], 1)
+
+    @override_settings(FACE_DETECTION_RESULT_CACHE={"ENABLED": False})
+    def test_cache_can_be_disabled(self):
+        """Test that every upload is detected when caching is disabled."""
+        self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        )
+
+        with patch("face_detector.views.detect_bytes", wraps=detect_bytes) as detect:
+            self.client.post(
+                "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+            )
+
+        detect.assert_called_once()
@@ -1,10 +1,22 @@
+import io
 import json
+import struct
+import time
+import zlib
+from pathlib import Path
 from unittest.mock import AsyncMock, patch
 
 from channels.testing import WebsocketCommunicator
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from PIL import Image
 
 from face_detector.consumers import FaceDetectionConsumer
+from face_detector.notifications import asend_notification
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
 
 
 class FaceDetectionConsumerTests(TestCase):
@@ -77,3 +89,212 @@ class FaceDetectionConsumerTests(TestCase):
         self.assertFalse(has_response)
 
         await communicator.disconnect()
+
+
+def slow_detect_frame(content, profile=None):
+    """Stand-in for detect_frame taking long enough for frames to pile up."""
+    time.sleep(0.2)
+    return [[1, 2, 3, 4]], 10, 10
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class FaceDetectionConsumerFrameTests(TestCase):
+    """Test cases for live frame detection over the WebSocket."""
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(FaceDetectionConsumer.as_asgi(), "/faces")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.receive_json_from()
+        return communicator
+
+    async def test_binary_frame_returns_boxes(self):
+        """Test that a binary frame is answered with the detected face boxes."""
+        communicator = await self.connect()
+
+        await communicator.send_to(bytes_data=FACE_IMAGE)
+        response = await communicator.receive_json_from(timeout=10)
+
+        self.assertEqual(response["type"], "face_boxes")
+        self.assertEqual(response["frame"], 1)
+        self.assertEqual(len(response["boxes"]), 1)
+        self.assertEqual((response["width"], response["height"]), (540, 360))
+        self.assertEqual(response["dropped"], 0)
+        await communicator.disconnect()
+
+    @patch("face_detector.consumers.detect_frame", slow_detect_frame)
+    async def test_latest_frame_wins(self):
+        """Test that frames arriving during a detection replace each other."""
+        communicator = await self.connect()
+
+        for _ in range(4):
+            await communicator.send_to(bytes_data=b"frame")
+        first = await communicator.receive_json_from(timeout=5)
+        second = await communicator.receive_json_from(timeout=5)
+
+        self.assertEqual(first["frame"], 1)
+        self.assertEqual(second["frame"], 4)
+        self.assertEqual(second["dropped"], 2)
+        self.assertTrue(await communicator.receive_nothing(timeout=0.3))
+        await communicator.disconnect()
+
+    async def test_undecodable_frame_reports_error(self):
+        """Test that broken frames are reported without closing the socket."""
+        communicator = await self.connect()
+
+        await communicator.send_to(bytes_data=b"not an image")
+        response = await communicator.receive_json_from(timeout=5)
+
+        self.assertEqual(response["type"], "frame_error")
+        await communicator.disconnect()
+
+    @patch("face_detector.consumers.detect_frame")
+    async def test_oversized_frames_are_refused(self, detect_frame):
+        """Test that frames over the byte or pixel limits never reach a worker."""
+        communicator = await self.connect()
+        header = io.BytesIO()
+        Image.new("L", (1, 1)).save(header, "PNG")
+        # A tiny PNG declaring 100000x100000 pixels
+        huge = bytearray(header.getvalue())
+        huge[16:24] = struct.pack(">II", 100_000, 100_000)
+        huge[29:33] = struct.pack(">I", zlib.crc32(huge[12:29]))
+
+        with self.settings(FACE_DETECTION_UPLOAD_LIMITS={"MAX_BYTES": 1024}):
+            for frame in (bytes(huge), b"x" * 2048):
+                await communicator.send_to(bytes_data=frame)
+                response = await communicator.receive_json_from(timeout=5)
+                self.assertEqual(response["type"], "frame_error")
+
+        detect_frame.assert_not_called()
+        await communicator.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class FaceDetectionBroadcastTests(TestCase):
+    """Test cases for relaying pre-encoded and coalesced broadcasts."""
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(FaceDetectionConsumer.as_asgi(), "/faces")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.receive_json_from()
+        return communicator
+
+    async def test_broadcast_is_encoded_once(self):
+        """Test that clients receive the text encoded by the producer."""
+        communicator = await self.connect()
+
+        with patch("face_detector.consumers.encode_client_message") as encode:
+            await asend_notification(
+                {
+                    "type": "face_detection_notification",
+                    "image_url": "http://example.com/image.jpg",
+                    "faces_detected": 2,
+                }
+            )
+            response = await communicator.receive_json_from(timeout=5)
+
+        encode.assert_not_called()
+        self.assertEqual(
+            response,
+            {
+                "type": "face_detection_result",
+                "image_url": "http://example.com/image.jpg",
+                "faces_detected": 2,
+            },
+        )
+        await communicator.disconnect()
+
+    @override_settings(FACE_DETECTION_NOTIFY_COALESCE_MS=100)
+    async def test_broadcasts_are_coalesced(self):
+        """Test that broadcasts within the window are sent as one message."""
+        communicator = await self.connect()
+
+        for job_id in ("a", "b", "c"):
+            await asend_notification(
+                {"type": "face_detection_job_failed", "job_id": job_id, "error": "x"}
+            )
+        response = await communicator.receive_json_from(timeout=5)
+
+        self.assertEqual(response["type"], "notifications_batch")
+        self.assertEqual([m["job_id"] for m in response["messages"]], ["a", "b", "c"])
+        self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+
+        await asend_notification(
+            {"type": "face_detection_job_failed", "job_id": "d", "error": "x"}
+        )
+        response = await communicator.receive_json_from(timeout=5)
+        self.assertEqual(response["type"], "face_detection_failed")
+        await communicator.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class FaceDetectionSubscriptionTests(TestCase):
+    """Test cases for per-client subscription filters."""
+
+    async def connect(self, **filters):
+        communicator = WebsocketCommunicator(FaceDetectionConsumer.as_asgi(), "/faces")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.receive_json_from()
+        await communicator.send_json_to({"type": "subscribe", **filters})
+        response = await communicator.receive_json_from(timeout=5)
+        self.assertEqual(response["type"], "subscribed")
+        return communicator
+
+    async def notify(self, **fields):
+        await asend_notification({"type": "face_detection_notification", **fields})
+
+    async def test_job_subscription(self):
+        """Test that a client subscribed to a job only receives that job."""
+        job_id = "6f1c2b7e-4a5d-4c1e-9b2a-0d3e4f5a6b7c"
+        communicator = await self.connect(job_ids=[job_id])
+
+        await self.notify(image_url="other", faces_detected=1)
+        await self.notify(image_url="mine", faces_detected=1, job_id=job_id)
+        response = await communicator.receive_json_from(timeout=5)
+
+        self.assertEqual(response["image_url"], "mine")
+        self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+        await communicator.disconnect()
+
+    async def test_min_faces_subscription(self):
+        """Test that uploads below the minimum face count are not delivered."""
+        communicator = await self.connect(min_faces=3)
+
+        for faces in (0, 1, 2, 3, 7):
+            await self.notify(image_url=str(faces), faces_detected=faces)
+        received = [
+            (await communicator.receive_json_from(timeout=5))["faces_detected"]
+            for _ in range(2)
+        ]
+
+        self.assertEqual(received, [3, 7])
+        self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+        await communicator.disconnect()
+
+    async def test_overlapping_groups_deliver_once(self):
+        """Test that an event matching several subscribed groups arrives once."""
+        job_id = "6f1c2b7e-4a5d-4c1e-9b2a-0d3e4f5a6b7c"
+        communicator = await self.connect(job_ids=[job_id], source="camera-1")
+
+        await self.notify(
+            image_url="x", faces_detected=1, job_id=job_id, source="camera-1"
+        )
+        response = await communicator.receive_json_from(timeout=5)
+
+        self.assertEqual(response["source"], "camera-1")
+        self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+        await communicator.disconnect()
+
+    async def test_invalid_subscription(self):
+        """Test that malformed filters are reported to the client."""
+        communicator = WebsocketCommunicator(FaceDetectionConsumer.as_asgi(), "/faces")
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({"type": "subscribe", "min_faces": -1})
+        response = await communicator.receive_json_from(timeout=5)
+
+        self.assertEqual(response["type"], "subscription_error")
+        await communicator.disconnect()
@@ -9,7 +9,10 @@ import pytest
 from django.conf import settings
 from django.test import TestCase, override_settings
 
-from face_detector.detector import FaceDetector
+from face_detector import registry
+from face_detector.detector import FaceDetector, OutputOptions
+from face_detector.profiles import DetectionProfile
+from face_detector.retention import sharded_name
 
 
 class FaceDetectorTests(TestCase):
@@ -24,6 +27,7 @@ class FaceDetectorTests(TestCase):
 
         self.test_images_dir = Path(settings.BASE_DIR) / "test_images"
         self.test_images_dir.mkdir(exist_ok=True)
+        registry.reset()
 
     def tearDown(self):
         """Clean up after tests."""
@@ -33,9 +37,11 @@ class FaceDetectorTests(TestCase):
         if self.test_images_dir.exists():
             shutil.rmtree(self.test_images_dir)
 
-    @patch("face_detector.detector.CascadeClassifier")
+    @patch("face_detector.registry.CascadeClassifier")
     def test_init_loads_cascade_classifier(self, mock_cascade):
         """Test that the constructor loads the Haar Cascade classifier."""
+        mock_cascade.return_value.empty.return_value = False
+        FaceDetector()
         FaceDetector()
 
         mock_cascade.assert_called_once()
@@ -82,7 +88,9 @@ class FaceDetectorTests(TestCase):
         output_path, face_count = detector.process_image(test_image_path, test_uuid)
 
         self.assertEqual(face_count, 0)
-        self.assertEqual(output_path, Path("processed") / f"faces_{test_uuid}.jpg")
+        self.assertEqual(
+            output_path, Path(sharded_name("processed", f"faces_{test_uuid}.jpg"))
+        )
         mock_imwrite.assert_called_once()
 
     @patch("face_detector.detector.imread")
@@ -102,6 +110,137 @@ class FaceDetectorTests(TestCase):
         output_path, face_count = detector.process_image(test_image_path, test_uuid)
 
         self.assertEqual(face_count, 2)
-        self.assertEqual(output_path, Path("processed") / f"faces_{test_uuid}.jpg")
+        self.assertEqual(
+            output_path, Path(sharded_name("processed", f"faces_{test_uuid}.jpg"))
+        )
         self.assertEqual(mock_rectangle.call_count, 2)
         mock_imwrite.assert_called_once()
+
+    @patch("face_detector.detector.imread")
+    @patch("face_detector.detector.imwrite")
+    def test_process_bytes_decodes_from_memory(self, mock_imwrite, mock_imread):
+        """Test that in-memory processing never reads the image back from disk."""
+        content = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+
+        detector = FaceDetector()
+        detector.detect_faces = MagicMock(return_value=[(10, 20, 30, 40)])
+        output_path, face_count = detector.process_bytes(content, "test-uuid")
+
+        self.assertEqual(face_count, 1)
+        self.assertEqual(
+            output_path, Path(sharded_name("processed", "faces_test-uuid.jpg"))
+        )
+        mock_imread.assert_not_called()
+        mock_imwrite.assert_called_once()
+        decoded = detector.detect_faces.call_args[0][0]
+        self.assertEqual(decoded.ndim, 3)
+
+    @patch("face_detector.detector.imwrite")
+    def test_process_buffer_invalid_data(self, mock_imwrite):
+        """Test that undecodable buffers are reported as processing failures."""
+        detector = FaceDetector()
+
+        with self.assertRaises(RuntimeError):
+            detector.process_buffer(memoryview(b"not an image"), "test-uuid")
+
+        mock_imwrite.assert_not_called()
+
+    @patch("face_detector.detector.imwrite")
+    @patch("face_detector.detector.rectangle")
+    def test_boxes_only_skips_annotation(self, mock_rectangle, mock_imwrite):
+        """Test that boxes only results are neither drawn nor encoded."""
+        content = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+        detector = FaceDetector()
+        detector.detect_faces = MagicMock(return_value=[(10, 20, 30, 40)])
+
+        result = detector.analyze_buffer(
+            memoryview(content), "test-uuid", OutputOptions(annotate=False)
+        )
+
+        self.assertIsNone(result.processed_path)
+        self.assertEqual(result.boxes, [[10, 20, 30, 40]])
+        self.assertIsNone(result.as_dict()["processed_path"])
+        mock_rectangle.assert_not_called()
+        mock_imwrite.assert_not_called()
+
+    @patch("face_detector.detector.imwrite")
+    def test_output_format_quality_and_size(self, mock_imwrite):
+        """Test that the annotated image is encoded as requested."""
+        content = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+        detector = FaceDetector()
+        detector.detect_faces = MagicMock(return_value=[(100, 100, 50, 50)])
+
+        result = detector.analyze_buffer(
+            memoryview(content),
+            "test-uuid",
+            OutputOptions(format="webp", quality=60, max_dimension=270),
+        )
+
+        self.assertEqual(
+            result.processed_path,
+            Path(sharded_name("processed", "faces_test-uuid.webp")),
+        )
+        self.assertEqual(result.boxes, [[100, 100, 50, 50]])
+        path, img, params = mock_imwrite.call_args[0]
+        self.assertTrue(path.endswith("faces_test-uuid.webp"))
+        self.assertEqual(img.shape[:2], (180, 270))
+        self.assertEqual(
+            params, OutputOptions(format="webp", quality=60).imwrite_params()
+        )
+
+    def test_invalid_output_options(self):
+        """Test that unsupported output options are rejected."""
+        for options in ({"format": "gif"}, {"quality": 0}, {"max_dimension": 0}):
+            with self.subTest(options=options), self.assertRaises(ValueError):
+                OutputOptions(**options)
+
+    def _detector_with_cascade(self, profile, faces):
+        """Build a detector whose classifier pool hands out a mocked cascade."""
+        cascade = MagicMock()
+        cascade.detectMultiScale.return_value = faces
+        pool = MagicMock()
+        pool.acquire.return_value.__enter__.return_value = cascade
+        return FaceDetector(pool=pool, profile=profile), cascade
+
+    def test_detect_faces_full_resolution_by_default(self):
+        """Test that the default profile detects on the original resolution."""
+        detector, cascade = self._detector_with_cascade(
+            DetectionProfile(name="default"), ((10, 20, 30, 40),)
+        )
+        image = np.zeros((2000, 3000, 3), dtype=np.uint8)
+
+        faces = detector.detect_faces(image)
+
+        gray = cascade.detectMultiScale.call_args[0][0]
+        self.assertEqual(gray.shape, (2000, 3000))
+        self.assertEqual(cascade.detectMultiScale.call_args[1]["minSize"], (30, 30))
+        self.assertEqual(list(faces[0]), [10, 20, 30, 40])
+
+    def test_detect_faces_downscales_to_max_dimension(self):
+        """Test that large images are detected at the working resolution."""
+        detector, cascade = self._detector_with_cascade(
+            DetectionProfile(name="fast", max_dimension=1000),
+            np.array([[10, 20, 30, 40]], dtype=np.int32),
+        )
+        image = np.zeros((2000, 4000, 3), dtype=np.uint8)
+
+        faces = detector.detect_faces(image)
+
+        gray = cascade.detectMultiScale.call_args[0][0]
+        self.assertEqual(gray.shape, (500, 1000))
+        self.assertEqual(faces.tolist(), [[40, 80, 120, 160]])
+
+    def test_detect_faces_scale_from_min_face_fraction(self):
+        """Test that the working resolution follows the minimum face fraction."""
+        detector, cascade = self._detector_with_cascade(
+            DetectionProfile(name="fraction", min_size=30, min_face_fraction=0.1),
+            (),
+        )
+        image = np.zeros((3000, 4000, 3), dtype=np.uint8)
+
+        faces = detector.detect_faces(image)
+
+        gray = cascade.detectMultiScale.call_args[0][0]
+        self.assertEqual(gray.shape, (300, 400))
+        self.assertEqual(cascade.detectMultiScale.call_args[1]["minSize"], (30, 30))
+        self.assertEqual(len(faces), 0)
@@ -0,0 +1,101 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from face_detector.evaluation import iou, load_labels, match_boxes
+from face_detector.profiles import DetectionProfile, profile_names
+
+FACE_IMAGE_PATH = Path("tests/face_detector/testdata/face1.jpg")
+FACE_BOX = [237, 51, 107, 107]
+
+
+class ProfileTests(TestCase):
+    """Test cases for the validation of detection profiles."""
+
+    def test_invalid_profiles(self):
+        """Test that unusable cascades and detection parameters are rejected."""
+        for options in (
+            {"cascade": "missing.xml"},
+            {"cascade": "../haarcascade_frontalface_default.xml"},
+            {"scale_factor": 1.0},
+            {"min_neighbors": -1},
+        ):
+            with self.subTest(options=options):
+                with self.assertRaises(ValueError):
+                    DetectionProfile("broken", **options)
+
+    def test_configured_profiles(self):
+        """Test that the speed and accuracy profiles are configured."""
+        self.assertTrue({"fast", "balanced", "accurate"} <= set(profile_names()))
+
+
+class EvaluationTests(TestCase):
+    """Test cases for matching detections and the evaluate_profiles command."""
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        shutil.copy(FACE_IMAGE_PATH, self.tmp_dir / "face.jpg")
+        self.labels = self.tmp_dir / "labels.jsonl"
+        self.labels.write_text(
+            json.dumps({"path": "face.jpg", "boxes": [FACE_BOX, [0, 0, 40, 40]]}) + "\n"
+        )
+
+    def test_iou(self):
+        """Test the overlap of identical, disjoint and half overlapping boxes."""
+        self.assertEqual(iou([0, 0, 10, 10], [0, 0, 10, 10]), 1.0)
+        self.assertEqual(iou([0, 0, 10, 10], [20, 20, 10, 10]), 0.0)
+        self.assertAlmostEqual(iou([0, 0, 10, 10], [5, 0, 10, 10]), 50 / 150)
+
+    def test_match_boxes(self):
+        """Test that a labelled face is matched by one detection only."""
+        predicted = [[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 10, 10]]
+        expected = [[0, 0, 10, 10], [100, 100, 10, 10]]
+
+        self.assertEqual(match_boxes(predicted, expected), (1, 2, 1))
+
+    def test_load_labels(self):
+        """Test that image paths are relative to the labels file."""
+        (image,) = load_labels(self.labels)
+
+        self.assertEqual(image.path, self.tmp_dir / "face.jpg")
+        self.assertEqual(image.boxes, [FACE_BOX, [0, 0, 40, 40]])
+
+    def test_evaluate_profiles(self):
+        """Test that every profile is scored against the labels."""
+        output = StringIO()
+        results = self.tmp_dir / "results.json"
+        call_command(
+            "evaluate_profiles",
+            str(self.labels),
+            "--profiles",
+            "default,fast",
+            "--iterations",
+            "2",
+            "--save",
+            str(results),
+            stdout=output,
+        )
+
+        saved = json.loads(results.read_text())
+        self.assertEqual([result["profile"] for result in saved], ["default", "fast"])
+        for result in saved:
+            self.assertEqual(result["runs"], 2)
+            self.assertEqual(result["true_positives"], 1)
+            self.assertEqual(result["false_negatives"], 1)
+            self.assertEqual(result["precision"], 1.0)
+            self.assertEqual(result["recall"], 0.5)
+        self.assertIn("fast", output.getvalue())
+
+    def test_invalid_input(self):
+        """Test that unknown profiles and broken labels fail the command."""
+        with self.assertRaises(CommandError):
+            call_command("evaluate_profiles", str(self.labels), "--profiles", "nope")
+        self.labels.write_text('{"path": "face.jpg"}\n')
+        with self.assertRaises(CommandError):
+            call_command("evaluate_profiles", str(self.labels), stdout=StringIO())
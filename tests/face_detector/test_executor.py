@@ -0,0 +1,134 @@
+import os
+import signal
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from face_detector import executor
+from face_detector.executor import (
+    DEFAULT_EXECUTOR_CONFIG,
+    ExecutorBusy,
+    build_executor,
+    detect_bytes,
+)
+from face_detector.retention import sharded_name
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+class DetectionExecutorTests(TestCase):
+    """Test cases for the bounded detection executor."""
+
+    def build(self, **config):
+        detection_executor = build_executor({**DEFAULT_EXECUTOR_CONFIG, **config})
+        self.addCleanup(detection_executor.shutdown)
+        return detection_executor
+
+    def test_rejects_when_queue_is_full(self):
+        """Test that submissions beyond the queue size are rejected."""
+        detection_executor = self.build(
+            KIND="thread", WORKERS=1, QUEUE_SIZE=1, RETRY_AFTER=3
+        )
+        release = threading.Event()
+
+        first = detection_executor.submit(release.wait, 5)
+        with self.assertRaises(ExecutorBusy) as raised:
+            detection_executor.submit(release.wait, 5)
+        release.set()
+        first.result()
+
+        self.assertEqual(raised.exception.retry_after, 3)
+        self.assertEqual(detection_executor.stats()["rejected"], 1)
+        detection_executor.submit(int).result()
+
+    def test_slot_is_released_after_failure(self):
+        """Test that failing tasks free their queue slot."""
+        detection_executor = self.build(KIND="inline", QUEUE_SIZE=1)
+
+        with self.assertRaises(ZeroDivisionError):
+            detection_executor.submit(divmod, 1, 0).result()
+
+        self.assertEqual(detection_executor.submit(divmod, 7, 2).result(), (3, 1))
+
+    def test_replaces_pool_after_worker_dies(self):
+        """Test that a pool broken by a killed worker is rebuilt on the next submit."""
+        detection_executor = self.build(KIND="process", WORKERS=1, START_METHOD="fork")
+        worker = detection_executor.submit(os.getpid).result()
+
+        with self.assertRaises(BrokenProcessPool):
+            detection_executor.submit(os.kill, worker, signal.SIGKILL).result()
+
+        self.assertNotEqual(detection_executor.submit(os.getpid).result(), worker)
+        self.assertEqual(detection_executor.stats()["rebuilt"], 1)
+
+    def test_process_pool_detects_faces(self):
+        """Test that worker processes load the cascade and run detection."""
+        detection_executor = self.build(KIND="process", WORKERS=1, START_METHOD="fork")
+
+        result = detection_executor.submit(
+            detect_bytes, FACE_IMAGE, "executor-test"
+        ).result(timeout=60)
+
+        self.assertEqual(
+            result.processed_path,
+            Path(sharded_name("processed", "faces_executor-test.jpg")),
+        )
+        self.assertEqual(result.faces_detected, 1)
+        self.assertEqual(len(result.boxes[0]), 4)
+
+    def test_unknown_kind(self):
+        """Test that misconfigured executors fail early."""
+        with self.assertRaises(ValueError):
+            build_executor({**DEFAULT_EXECUTOR_CONFIG, "KIND": "gpu"})
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    FACE_DETECTION_SAVE_UPLOADS=False,
+    FACE_DETECTION_EXECUTOR={"KIND": "thread", "WORKERS": 1, "QUEUE_SIZE": 1},
+)
+class UploadBackpressureTests(TestCase):
+    """Test cases for upload_image under a full detection queue."""
+
+    def setUp(self):
+        executor.reset_executor()
+
+    def tearDown(self):
+        executor.reset_executor()
+
+    def test_full_queue_returns_503(self):
+        """Test that uploads are rejected with Retry-After when the queue is full."""
+        release = threading.Event()
+        busy = executor.get_executor().submit(release.wait, 5)
+
+        response = self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        )
+        release.set()
+        busy.result()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+        response = self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["faces_detected"], 1)
+
+    def test_executor_failure_returns_json_error(self):
+        """Test that an executor that cannot take work answers with a JSON 500."""
+        executor.get_executor().shutdown()
+
+        response = self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        )
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("error", response.json())
@@ -0,0 +1,68 @@
+import asyncio
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from redis.asyncio import Redis
+
+from face_detector.fanout import PubSubStandIn, run_fanout_benchmarks
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+class FanoutTests(SimpleTestCase):
+    """Test cases for the channel layer fan-out benchmark."""
+
+    def test_stand_in_publishes_to_subscribers(self):
+        """Test that the stand-in delivers published messages and counts commands."""
+        stand_in = PubSubStandIn()
+        url = stand_in.start()
+        self.addCleanup(stand_in.stop)
+
+        async def publish():
+            client = Redis.from_url(url)
+            pubsub = client.pubsub()
+            await pubsub.subscribe("faces")
+            await pubsub.get_message(timeout=1)
+            receivers = await client.publish("faces", "hello")
+            message = await pubsub.get_message(timeout=1)
+            stats = await client.info("commandstats")
+            await pubsub.aclose()
+            await client.aclose()
+            return receivers, message, stats
+
+        receivers, message, stats = asyncio.run(publish())
+
+        self.assertEqual(receivers, 1)
+        self.assertEqual(message["data"], b"hello")
+        self.assertEqual(stats["cmdstat_publish"]["calls"], 1)
+
+    def test_every_client_receives_every_broadcast(self):
+        """Test that pub/sub publishes once per broadcast whatever the client count."""
+        report = run_fanout_benchmarks(["pubsub", "memory"], [1, 20], 3, interval=0)
+
+        for name, summary in report["results"].items():
+            with self.subTest(case=name):
+                self.assertEqual(summary["delivered"], summary["expected"])
+                self.assertIn("p99_ms", summary)
+        self.assertEqual(report["results"]["pubsub/20"]["ops_per_message"], 1)
+        self.assertGreater(
+            report["results"]["pubsub/20"]["connect_ops"],
+            report["results"]["pubsub/1"]["connect_ops"],
+        )
+        self.assertEqual(report["results"]["memory/20"]["connect_ops"], 0)
+
+    def test_redis_layer_needs_redis(self):
+        """Test that the stand-in is not used for the Lua based Redis layer."""
+        with self.assertRaises(ValueError):
+            run_fanout_benchmarks(["redis"], [1], 1)
+        with self.assertRaises(CommandError):
+            call_command("fanout_benchmark", "--layers", "redis", stdout=StringIO())
+
+    @override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+    def test_in_memory_layer_needs_one_worker(self):
+        """Test that serve refuses workers the in-memory layer cannot reach."""
+        with self.assertRaises(CommandError):
+            call_command("serve", "--workers", "2", stdout=StringIO())
@@ -0,0 +1,132 @@
+import json
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from face_detector import cache, history
+from face_detector.cache import content_hash
+from face_detector.history import HistoryWriter, decode_cursor, page
+from face_detector.models import DetectionRecord
+from face_detector.views import detections, upload_image
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+def new_record(created_at, faces=1, profile="default", digest="0" * 32):
+    return DetectionRecord(
+        created_at=created_at,
+        content_hash=digest,
+        width=640,
+        height=480,
+        faces_detected=faces,
+        boxes=[[0, 0, 10, 10]] * faces,
+        profile=profile,
+    )
+
+
+class HistoryTests(TestCase):
+    """Test cases for writing and paging the detection history."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.now = timezone.now()
+
+    def test_writer_inserts_in_batches(self):
+        """Test that buffered records are inserted on flush and excess ones dropped."""
+        writer = HistoryWriter(batch_size=2, flush_interval=60, max_pending=5)
+        for _ in range(7):
+            writer.add(new_record(self.now))
+
+        self.assertEqual(writer.flush(), 5)
+        self.assertEqual(DetectionRecord.objects.count(), 5)
+        self.assertEqual(writer.flush(), 0)
+
+    def test_keyset_pages(self):
+        """Test that pages cover every record once, newest first, across ties."""
+        DetectionRecord.objects.bulk_create(
+            [new_record(self.now - timedelta(seconds=i // 3)) for i in range(8)]
+        )
+        expected = list(
+            DetectionRecord.objects.order_by("-created_at", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+
+        seen, cursor = [], None
+        for _ in range(3):
+            records, cursor = page(DetectionRecord.objects.all(), 3, cursor)
+            seen.extend(record.pk for record in records)
+
+        self.assertIsNone(cursor)
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        """Test that malformed cursors are rejected."""
+        for cursor in ("not a cursor", "W10"):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decode_cursor(cursor)
+
+    def test_detections_view_filters(self):
+        """Test that the list view filters and pages records."""
+        DetectionRecord.objects.bulk_create(
+            [
+                new_record(self.now - timedelta(minutes=10), faces=0),
+                new_record(self.now - timedelta(minutes=5), faces=2, profile="fast"),
+                new_record(self.now, faces=3, digest="f" * 32),
+            ]
+        )
+
+        def get(**params):
+            response = detections(self.factory.get("/detections", params))
+            return response.status_code, json.loads(response.content)
+
+        status, data = get(min_faces=2, limit=1)
+        self.assertEqual(status, 200)
+        self.assertEqual([r["faces_detected"] for r in data["results"]], [3])
+        status, data = get(min_faces=2, limit=1, cursor=data["next_cursor"])
+        self.assertEqual([r["faces_detected"] for r in data["results"]], [2])
+        self.assertIsNone(data["next_cursor"])
+
+        _, data = get(profile="fast")
+        self.assertEqual(len(data["results"]), 1)
+        _, data = get(content_hash="f" * 32)
+        self.assertEqual(data["results"][0]["faces_detected"], 3)
+        since = (self.now - timedelta(minutes=7)).isoformat()
+        _, data = get(since=since, until=self.now.isoformat())
+        self.assertEqual([r["faces_detected"] for r in data["results"]], [2])
+
+        for params in ({"limit": "0"}, {"faces": "many"}, {"since": "yesterday"}):
+            with self.subTest(params=params):
+                self.assertEqual(get(**params)[0], 400)
+
+    @override_settings(
+        CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+        FACE_DETECTION_SAVE_UPLOADS=False,
+        FACE_DETECTION_RESULT_CACHE={"ENABLED": False},
+        FACE_DETECTION_HISTORY={"ENABLED": True, "FLUSH_INTERVAL": 3600},
+    )
+    def test_uploads_are_recorded(self):
+        """Test that served uploads end up in the history with their timings."""
+        cache.reset_result_cache()
+        self.addCleanup(history.reset_writer)
+        request = self.factory.post(
+            "/image",
+            {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE), "source": "cam-1"},
+        )
+
+        self.assertEqual(upload_image(request).status_code, 200)
+        history.get_writer().flush()
+
+        record = DetectionRecord.objects.get()
+        self.assertEqual(record.content_hash, content_hash(FACE_IMAGE))
+        self.assertEqual((record.width, record.height), (540, 360))
+        self.assertEqual(record.faces_detected, 1)
+        self.assertEqual(record.source, "cam-1")
+        self.assertIn("detect", record.timings)
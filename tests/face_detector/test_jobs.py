@@ -0,0 +1,150 @@
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from face_detector import executor, jobs
+from face_detector.jobs import JobBackend, LocalJobBackend, new_job, run_job
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+def wait_for_job(job_id: str, timeout: float = 10) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get_backend().get(job_id)
+        if job["status"] in (jobs.DONE, jobs.FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout} seconds")
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    FACE_DETECTION_JOBS={"BACKEND": "local", "WORKERS": 1},
+)
+class AsyncUploadTests(TestCase):
+    """Test cases for uploads processed as background jobs."""
+
+    def setUp(self):
+        jobs.reset_backend()
+        self.channel_layer = get_channel_layer()
+        async_to_sync(self.channel_layer.group_add)("faces", "test-channel")
+
+    def tearDown(self):
+        jobs.reset_backend()
+
+    def test_async_upload_returns_job_and_notifies(self):
+        """Test that an async upload is accepted and completed by a worker."""
+        response = self.client.post(
+            "/image?async=1", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        )
+
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertTrue(data["status_url"].endswith(f"/jobs/{data['job_id']}"))
+
+        job = wait_for_job(data["job_id"])
+        self.assertEqual(job["status"], jobs.DONE)
+
+        message = async_to_sync(self.channel_layer.receive)("test-channel")
+        self.assertEqual(message["type"], "face_detection_notification")
+        self.assertEqual(message["job_id"], data["job_id"])
+        self.assertEqual(message["faces_detected"], job["faces_detected"])
+
+        status = self.client.get(f"/jobs/{data['job_id']}").json()
+        self.assertEqual(status["status"], jobs.DONE)
+        self.assertEqual(status["image_url"], job["image_url"])
+
+    def test_jobs_detect_on_the_detection_executor(self):
+        """Test that job detection goes through the bounded executor."""
+        with patch(
+            "face_detector.jobs.get_executor", wraps=executor.get_executor
+        ) as get_executor:
+            response = self.client.post(
+                "/image?async=1", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+            )
+            job = wait_for_job(response.json()["job_id"])
+
+        self.assertEqual(job["status"], jobs.DONE)
+        get_executor.assert_called_once()
+
+    def test_failed_job_is_reported(self):
+        """Test that a job failing in the worker is marked as failed."""
+        backend = jobs.get_backend()
+        job = new_job("uploaded/missing.jpg", "http://testserver/media/")
+
+        job = run_job(backend, backend.save(job))
+
+        self.assertEqual(job["status"], jobs.FAILED)
+        self.assertIn("error", self.client.get(f"/jobs/{job['job_id']}").json())
+        message = async_to_sync(self.channel_layer.receive)("test-channel")
+        self.assertEqual(message["type"], "face_detection_job_failed")
+
+    def test_unknown_job(self):
+        """Test that polling an unknown job id returns 404."""
+        response = self.client.get("/jobs/00000000-0000-0000-0000-000000000000")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_sync_upload_is_still_default(self):
+        """Test that uploads without the async flag are processed inline."""
+        response = self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("faces_detected", response.json())
+
+
+class LocalJobBackendTests(TestCase):
+    """Test cases for the in-process job store."""
+
+    def test_oldest_jobs_are_evicted(self):
+        """Test that the local store keeps a bounded number of jobs."""
+        backend = LocalJobBackend(workers=1, max_jobs=2)
+        first, second, third = (new_job(f"uploaded/{i}.jpg", "") for i in range(3))
+        for job in (first, second, third):
+            backend.save(job)
+
+        self.assertIsNone(backend.get(first["job_id"]))
+        self.assertIsNotNone(backend.get(third["job_id"]))
+        backend.shutdown()
+
+    @override_settings(
+        FACE_DETECTION_JOBS={
+            "BACKEND": "local",
+            "WORKERS": 1,
+            "QUEUE_SIZE": 1,
+            "RETRY_AFTER": 7,
+        }
+    )
+    def test_full_queue_is_rejected(self):
+        """Test that async uploads beyond the local queue size get a 503."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with patch("face_detector.jobs.run_job", lambda backend, job: release.wait()):
+            accepted = self.client.post(
+                "/image?async=1", {"image": SimpleUploadedFile("a.jpg", FACE_IMAGE)}
+            )
+            rejected = self.client.post(
+                "/image?async=1", {"image": SimpleUploadedFile("b.jpg", FACE_IMAGE)}
+            )
+
+        self.assertEqual(accepted.status_code, 202)
+        self.assertEqual(rejected.status_code, 503)
+        self.assertEqual(rejected["Retry-After"], "7")
+
+    def test_backends_implement_the_interface(self):
+        """Test that the backend interface cannot be used on its own."""
+        with self.assertRaises(TypeError):
+            JobBackend()
@@ -0,0 +1,162 @@
+import atexit
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from face_detector import cache, metrics
+from face_detector.metrics import Registry, render_prometheus
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+class RegistryTests(SimpleTestCase):
+    """Test cases for the in-process metrics registry."""
+
+    def test_prometheus_exposition(self):
+        """Test that counters and cumulative histogram buckets are rendered."""
+        registry = Registry()
+        registry.inc("face_detection_requests_total", view="upload_image", status=200)
+        registry.observe("face_detection_stage_seconds", 0.003, stage="detect")
+        registry.observe("face_detection_stage_seconds", 20, stage="detect")
+
+        text = render_prometheus(registry.collect())
+
+        self.assertIn("# TYPE face_detection_requests_total counter", text)
+        self.assertRegex(
+            text,
+            r'face_detection_requests_total\{status="200",view="upload_image\w*"\} 1',
+        )
+        self.assertIn(
+            'face_detection_stage_seconds_bucket{stage="detect",le="0.0025"} 0', text
+        )
+        self.assertIn(
+            'face_detection_stage_seconds_bucket{stage="detect",le="0.005"} 1', text
+        )
+        self.assertIn(
+            'face_detection_stage_seconds_bucket{stage="detect",le="+Inf"} 2', text
+        )
+        self.assertIn('face_detection_stage_seconds_count{stage="detect"} 2', text)
+
+    def test_processes_sharing_a_directory_are_added_up(self):
+        """Test that snapshots of other processes are aggregated."""
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        other = Registry()
+        other.inc("face_detection_faces_total", 3)
+        (directory / "metrics-1.json").write_text(json.dumps(other.snapshot()))
+
+        registry = Registry(str(directory))
+        self.addCleanup(atexit.unregister, registry.close)
+        registry.inc("face_detection_faces_total", 2)
+
+        self.assertEqual(
+            registry.collect()["counters"],
+            {metrics._series("face_detection_faces_total", {}): 5},
+        )
+
+    def test_snapshots_of_exited_processes_are_dropped(self):
+        """Test that the snapshot of a process that exited is removed."""
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        exited = subprocess.run(
+            [sys.executable, "-c", "import os; print(os.getpid())"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        other = Registry()
+        other.inc("face_detection_faces_total", 3)
+        stale = directory / f"metrics-{exited.stdout.strip()}.json"
+        stale.write_text(json.dumps(other.snapshot()))
+
+        registry = Registry(str(directory))
+        self.addCleanup(atexit.unregister, registry.close)
+        registry.inc("face_detection_faces_total", 2)
+
+        self.assertEqual(
+            registry.collect()["counters"],
+            {metrics._series("face_detection_faces_total", {}): 2},
+        )
+        self.assertFalse(stale.exists())
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    FACE_DETECTION_ASYNC_VIEWS=False,
+    FACE_DETECTION_RESULT_CACHE={"ENABLED": False},
+)
+class MetricsEndpointTests(TestCase):
+    """Test cases for the Server-Timing header and the /metrics endpoint."""
+
+    def setUp(self):
+        cache.reset_result_cache()
+        metrics.reset_registry()
+        self.addCleanup(metrics.reset_registry)
+
+    def test_upload_reports_stages(self):
+        """Test that uploads are timed per stage and counted."""
+        response = self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        stages = [part.split(";")[0] for part in response["Server-Timing"].split(", ")]
+        for stage in ("validate", "executor", "decode", "detect", "total"):
+            self.assertIn(stage, stages)
+
+        text = self.client.get("/metrics").content.decode()
+        self.assertRegex(
+            text,
+            r'face_detection_requests_total\{status="200",view="upload_image\w*"\} 1',
+        )
+        self.assertIn("face_detection_faces_total 1", text)
+        self.assertIn(f"face_detection_upload_bytes_total {len(FACE_IMAGE)}", text)
+        self.assertIn('face_detection_stage_seconds_count{stage="detect"} 1', text)
+        self.assertIn(
+            "face_detection_executor_tasks_total"
+            '{executor="detection",outcome="submitted"} 1',
+            text,
+        )
+        self.assertRegex(
+            text,
+            r"face_detection_classifier_pool_total"
+            r'\{cascade="[^"]+",outcome="(hit|miss)"\} 1',
+        )
+
+    @override_settings(FACE_DETECTION_RESULT_CACHE={"ENABLED": True})
+    def test_result_cache_outcomes(self):
+        """Test that result cache hits and misses are exported."""
+        cache.reset_result_cache()
+        self.addCleanup(cache.reset_result_cache)
+        for _ in range(2):
+            self.client.post(
+                "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+            )
+
+        text = self.client.get("/metrics").content.decode()
+        self.assertIn('face_detection_result_cache_total{outcome="miss"} 1', text)
+        self.assertIn('face_detection_result_cache_total{outcome="local_hit"} 1', text)
+
+    def test_errors_are_counted_by_status(self):
+        """Test that rejected uploads are counted with their status code."""
+        self.client.post("/image", {})
+
+        text = self.client.get("/metrics").content.decode()
+        self.assertRegex(
+            text,
+            r'face_detection_requests_total\{status="400",view="upload_image\w*"\} 1',
+        )
+
+    @override_settings(FACE_DETECTION_METRICS={"ENABLED": False})
+    def test_disabled(self):
+        """Test that the endpoint is not available when metrics are disabled."""
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
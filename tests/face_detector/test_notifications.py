@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase, override_settings
+
+from face_detector.notifications import (
+    FACES_GROUP,
+    job_group,
+    min_faces_group,
+    source_group,
+    subscription_groups,
+    target_groups,
+)
+
+JOB_ID = "6f1c2b7e-4a5d-4c1e-9b2a-0d3e4f5a6b7c"
+
+
+@override_settings(FACE_DETECTION_MIN_FACES_GROUPS=(1, 2, 5, 10))
+class NotificationRoutingTests(SimpleTestCase):
+    """Test cases for routing notifications to targeted groups."""
+
+    def test_message_goes_to_one_group_per_filter(self):
+        """Test that a message targets its job, source and face count bucket."""
+        groups = target_groups(
+            {"job_id": JOB_ID, "source": "camera-1", "faces_detected": 3}
+        )
+
+        self.assertEqual(
+            groups, [job_group(JOB_ID), source_group("camera-1"), min_faces_group(2)]
+        )
+
+    def test_message_without_faces_has_no_bucket(self):
+        """Test that uploads without faces skip the face count groups."""
+        self.assertEqual(target_groups({"faces_detected": 0}), [])
+
+    def test_min_faces_joins_buckets_upwards(self):
+        """Test that a face count subscription joins its bucket and the ones above."""
+        self.assertEqual(
+            subscription_groups({"min_faces": 3}),
+            [min_faces_group(2), min_faces_group(5), min_faces_group(10)],
+        )
+
+    def test_job_and_source_filters(self):
+        """Test that job ids and the source tag select their groups."""
+        self.assertEqual(
+            subscription_groups({"job_ids": [JOB_ID], "source": "camera-1"}),
+            [job_group(JOB_ID), source_group("camera-1")],
+        )
+
+    def test_no_filters_receive_everything(self):
+        """Test that an empty subscription falls back to the faces group."""
+        self.assertEqual(subscription_groups({}), [FACES_GROUP])
+
+    def test_malformed_filters_are_rejected(self):
+        """Test that filters unusable as group names are rejected."""
+        for filters in (
+            {"job_ids": "not a list"},
+            {"job_ids": ["not a uuid"]},
+            {"source": "has spaces"},
+            {"min_faces": 0},
+            {"min_faces": True},
+        ):
+            with self.subTest(filters=filters), self.assertRaises(ValueError):
+                subscription_groups(filters)
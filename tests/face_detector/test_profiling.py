@@ -0,0 +1,126 @@
+import pstats
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from face_detector import cache, profiling
+from face_detector.profiling import load_profiles
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+PROFILE_DIRECTORY = tempfile.mkdtemp()
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    FACE_DETECTION_RESULT_CACHE={"ENABLED": False},
+    FACE_DETECTION_PROFILING={
+        "ENABLED": True,
+        "TOKEN": "secret",
+        "DIRECTORY": PROFILE_DIRECTORY,
+        "MAX_PROFILES": 2,
+    },
+)
+class ProfilingTests(TestCase):
+    """Test cases for opt-in request profiling."""
+
+    def setUp(self):
+        cache.reset_result_cache()
+        self.addCleanup(shutil.rmtree, PROFILE_DIRECTORY, ignore_errors=True)
+
+    def upload(self, status=200, remote_addr="127.0.0.1", **headers):
+        response = self.client.post(
+            "/image",
+            {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)},
+            headers=headers,
+            REMOTE_ADDR=remote_addr,
+        )
+        self.assertEqual(response.status_code, status)
+
+    def test_header_captures_profile(self):
+        """Test that a request with the profiling header is profiled."""
+        self.upload(**{"X-Face-Detection-Profile": "secret"})
+
+        (profile,) = load_profiles()
+        self.assertEqual((profile["width"], profile["height"]), (540, 360))
+        self.assertEqual(profile["faces"], 1)
+        self.assertIn("detect", profile["timings"])
+        self.assertTrue(Path(PROFILE_DIRECTORY, f"{profile['id']}.prof").exists())
+
+    def test_wrong_token_is_not_profiled(self):
+        """Test that the header only works with the configured token."""
+        self.upload(**{"X-Face-Detection-Profile": "guess"})
+
+        self.assertEqual(load_profiles(), [])
+
+    def test_header_without_token_is_local_only(self):
+        """Test that without a token only local requests can ask for a profile."""
+        with self.settings(
+            FACE_DETECTION_PROFILING={"ENABLED": True, "DIRECTORY": PROFILE_DIRECTORY}
+        ):
+            self.upload(remote_addr="203.0.113.7", **{"X-Face-Detection-Profile": "1"})
+            self.assertEqual(load_profiles(), [])
+
+            self.upload(**{"X-Face-Detection-Profile": "1"})
+            self.assertEqual(len(load_profiles()), 1)
+
+    def test_one_profile_at_a_time(self):
+        """Test that requests are not profiled while another one is."""
+        with profiling._profiler_lock:
+            self.upload(**{"X-Face-Detection-Profile": "secret"})
+
+        self.assertEqual(load_profiles(), [])
+
+    def test_sampling_and_rotation(self):
+        """Test that sampled requests are profiled and old profiles rotated out."""
+        with self.settings(
+            FACE_DETECTION_PROFILING={
+                "ENABLED": True,
+                "SAMPLE_RATE": 1.0,
+                "DIRECTORY": PROFILE_DIRECTORY,
+                "MAX_PROFILES": 2,
+            }
+        ):
+            for _ in range(3):
+                self.upload()
+            self.assertEqual(len(load_profiles()), 2)
+            self.assertEqual(len(list(Path(PROFILE_DIRECTORY).glob("*.prof"))), 2)
+
+    def test_disabled_by_default(self):
+        """Test that nothing is captured unless profiling is enabled."""
+        with self.settings(FACE_DETECTION_PROFILING={"DIRECTORY": PROFILE_DIRECTORY}):
+            self.upload(**{"X-Face-Detection-Profile": "1"})
+
+        self.assertEqual(load_profiles(), [])
+
+    def test_command_summarizes_profiles(self):
+        """Test that the profiles command lists captured profiles."""
+        self.upload(**{"X-Face-Detection-Profile": "secret"})
+        (profile,) = load_profiles()
+
+        output = StringIO()
+        call_command("profiles", "--functions", "5", stdout=output)
+
+        self.assertIn(profile["id"], output.getvalue())
+        self.assertIn("540x360", output.getvalue())
+        self.assertIn("cumulative", output.getvalue())
+
+    @patch("face_detector.views.get_executor")
+    def test_profiled_detection_runs_inline(self, get_executor):
+        """Test that profiled requests detect in the profiled thread."""
+        self.upload(**{"X-Face-Detection-Profile": "secret"})
+
+        get_executor.assert_not_called()
+        (profile,) = load_profiles()
+        stats = pstats.Stats(str(Path(PROFILE_DIRECTORY, f"{profile['id']}.prof")))
+        self.assertTrue(
+            any(function == "detect_faces" for _, _, function in stats.stats)
+        )
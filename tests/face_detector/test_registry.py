@@ -0,0 +1,116 @@
+import threading
+from unittest.mock import patch
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from face_detector import registry
+from face_detector.profiles import get_profile, profile_names
+from face_detector.registry import ClassifierPool
+
+
+class ClassifierPoolTests(TestCase):
+    """Test cases for the bounded CascadeClassifier pool."""
+
+    def setUp(self):
+        registry.reset()
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_acquire_reuses_idle_classifier(self):
+        """Test that a returned classifier is handed out again as a pool hit."""
+        pool = registry.get_pool()
+
+        with pool.acquire() as first:
+            pass
+        with pool.acquire() as second:
+            pass
+
+        self.assertIs(first, second)
+        stats = pool.stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["waits"], 0)
+
+    def test_concurrent_borrowers_get_distinct_classifiers(self):
+        """Test that two threads never share a classifier while the pool has room."""
+        pool = ClassifierPool(registry.get_pool().cascade_path, size=2)
+
+        with pool.acquire() as first, pool.acquire() as second:
+            self.assertIsNot(first, second)
+        self.assertEqual(pool.stats()["created"], 2)
+
+    def test_acquire_waits_when_pool_is_exhausted(self):
+        """Test that the pool is bounded and counts waiting borrowers."""
+        pool = ClassifierPool(registry.get_pool().cascade_path, size=1)
+        borrowed = threading.Event()
+        released = threading.Event()
+
+        def borrow():
+            with pool.acquire():
+                borrowed.set()
+                released.wait(1)
+
+        worker = threading.Thread(target=borrow)
+        worker.start()
+        borrowed.wait(1)
+        with self.assertRaises(TimeoutError):
+            with pool.acquire(timeout=0.01):
+                pass
+        released.set()
+        worker.join()
+
+        with pool.acquire(timeout=1):
+            pass
+        self.assertEqual(pool.stats()["created"], 1)
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_invalid_cascade_is_rejected(self):
+        """Test that a missing cascade file fails loudly, not by finding nothing."""
+        pool = ClassifierPool("does-not-exist.xml", size=1)
+
+        with self.assertRaises(ValueError):
+            pool.prime()
+        self.assertEqual(pool.created, 0)
+
+    @override_settings(FACE_DETECTOR_POOL_SIZE=3)
+    def test_warm_up_fills_default_pool(self):
+        """Test that warming up preloads the default pool and profile cascades."""
+        registry.warm_up()
+
+        stats = {pool["cascade"]: pool for pool in registry.pool_stats()}
+        default = stats["haarcascade_frontalface_default.xml"]
+        self.assertEqual(default["created"], 3)
+        self.assertEqual(default["idle"], 3)
+        cascades = {get_profile(name).cascade for name in profile_names()}
+        self.assertEqual(set(stats), cascades)
+        self.assertTrue(all(pool["created"] >= 1 for pool in stats.values()))
+
+    @override_settings(FACE_DETECTOR_WARM_UP=False)
+    def test_warm_up_can_be_disabled(self):
+        """Test that warm-up is skipped when disabled in settings."""
+        registry.warm_up()
+
+        self.assertEqual(registry.pool_stats(), [])
+
+    def test_get_detector_returns_shared_instance(self):
+        """Test that the registry hands out a single detector per process."""
+        detector = registry.get_detector()
+
+        self.assertIs(detector, registry.get_detector())
+        faces = detector.detect_faces(np.zeros((64, 64, 3), dtype=np.uint8))
+        self.assertEqual(len(faces), 0)
+
+    @patch("face_detector.registry.CascadeClassifier")
+    def test_cascade_parsed_once_per_pool_slot(self, mock_cascade):
+        """Test that repeated detections do not reload the cascade."""
+        mock_cascade.return_value.empty.return_value = False
+        pool = registry.get_pool()
+
+        for _ in range(5):
+            with pool.acquire():
+                pass
+
+        mock_cascade.assert_called_once()
@@ -0,0 +1,132 @@
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from face_detector import background, cache, rendering
+from face_detector.rendering import RenderCache
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+class RenderCacheTests(TestCase):
+    """Test cases for the size-capped cache of rendered images."""
+
+    def test_least_recently_used_images_are_evicted(self):
+        """Test that the cache stays under its byte limit."""
+        render_cache = RenderCache(max_bytes=10)
+        render_cache.set("a", b"aaaa")
+        render_cache.set("b", b"bbbb")
+        render_cache.get("a")
+        render_cache.set("c", b"cccc")
+
+        self.assertEqual(render_cache.get("a"), b"aaaa")
+        self.assertIsNone(render_cache.get("b"))
+        self.assertEqual(render_cache.stats()["bytes"], 8)
+
+    def test_oversized_images_are_not_cached(self):
+        """Test that an image larger than the cache is skipped."""
+        render_cache = RenderCache(max_bytes=3)
+        render_cache.set("a", b"aaaa")
+
+        self.assertIsNone(render_cache.get("a"))
+        self.assertEqual(render_cache.stats()["bytes"], 0)
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    FACE_DETECTION_ASYNC_VIEWS=False,
+    FACE_DETECTION_RESULT_CACHE={"ENABLED": False},
+    FACE_DETECTION_RENDER={"LAZY": True, "PERSIST": False},
+)
+class LazyRenderingTests(TestCase):
+    """Test cases for rendering annotated images on first download."""
+
+    def setUp(self):
+        cache.reset_result_cache()
+        rendering.reset_render_cache()
+        self.addCleanup(rendering.reset_render_cache)
+
+    def upload(self, **fields):
+        response = self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE), **fields}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def processed_path(self, data):
+        return data["image_url"].split("/media/")[1]
+
+    def test_upload_stores_boxes_only(self):
+        """Test that no image is written until the image URL is requested."""
+        data = self.upload()
+        path = self.processed_path(data)
+
+        background.shutdown()
+
+        self.assertEqual(len(data["boxes"]), 1)
+        self.assertFalse(default_storage.exists(path))
+        self.assertTrue(default_storage.exists(rendering.record_name(path)))
+
+    def test_original_is_saved_off_the_response_path(self):
+        """Test that uploads do not wait for the original, downloads do."""
+        saved = threading.Event()
+        save_upload = rendering.save_upload
+
+        def slow_save(name, content):
+            saved.wait(10)
+            return save_upload(name, content)
+
+        with patch("face_detector.rendering.save_upload", slow_save):
+            path = self.processed_path(self.upload())
+            self.assertFalse(default_storage.exists(rendering.record_name(path)))
+            threading.Timer(0.1, saved.set).start()
+
+            self.assertEqual(self.client.get(f"/media/{path}").status_code, 200)
+
+    def test_first_download_renders_and_caches(self):
+        """Test that the image is rendered once and then served from the cache."""
+        path = self.processed_path(self.upload(format="png", max_dimension="100"))
+
+        with patch("face_detector.views.render", wraps=rendering.render) as render:
+            first = self.client.get(f"/media/{path}")
+            second = self.client.get(f"/media/{path}")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["Content-Type"], "image/png")
+        self.assertTrue(first.content.startswith(b"\x89PNG"))
+        self.assertEqual(second.content, first.content)
+        render.assert_called_once()
+        self.assertFalse(default_storage.exists(path))
+
+    @override_settings(FACE_DETECTION_RENDER={"LAZY": True, "PERSIST": True})
+    def test_rendered_image_is_persisted(self):
+        """Test that rendered images are written to the media directory if enabled."""
+        path = self.processed_path(self.upload())
+
+        self.client.get(f"/media/{path}")
+        background.shutdown()
+
+        self.assertTrue(default_storage.exists(path))
+
+    def test_unknown_image(self):
+        """Test that images without a render record are not found."""
+        response = self.client.get(
+            "/media/processed/faces_00000000-0000-0000-0000-000000000000.jpg"
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(FACE_DETECTION_RENDER={"LAZY": False})
+    def test_eager_rendering(self):
+        """Test that the image is written at upload time when lazy rendering is off."""
+        path = self.processed_path(self.upload())
+
+        self.assertTrue(default_storage.exists(path))
+        self.assertEqual(self.client.get(f"/media/{path}").status_code, 200)
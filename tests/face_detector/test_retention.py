@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from face_detector import cache, rendering
+from face_detector.retention import oldest, shard, sharded_name, sweep
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    FACE_DETECTION_RETENTION={
+        "SHARD_DEPTH": 2,
+        "BATCH_SIZE": 2,
+        "BATCH_PAUSE": 0,
+        "DIRECTORIES": {"uploaded": {"TTL": 3600, "MAX_BYTES": 25}},
+    },
+)
+class RetentionTests(TestCase):
+    """Test cases for media sharding and the media sweeper."""
+
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+
+    def write(self, name: str, size: int, age: float) -> Path:
+        path = Path(MEDIA_ROOT) / sharded_name("uploaded", name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+        return path
+
+    def test_sharded_name(self):
+        """Test that files are spread over stable hashed subdirectories."""
+        name = sharded_name("processed", "faces_1.jpg")
+
+        self.assertRegex(name, r"^processed/[0-9a-f]{2}/[0-9a-f]{2}/faces_1\.jpg$")
+        self.assertEqual(name, sharded_name("processed", "faces_1.jpg"))
+        with self.settings(FACE_DETECTION_RETENTION={"SHARD_DEPTH": 0}):
+            self.assertEqual(shard("faces_1.jpg"), "")
+            self.assertEqual(
+                sharded_name("processed", "faces_1.jpg"), "processed/faces_1.jpg"
+            )
+
+    def test_sweep_deletes_expired_then_oldest(self):
+        """Test that expired files go first, then the oldest until under the cap."""
+        expired = self.write("expired.jpg", 10, age=7200)
+        oldest = self.write("oldest.jpg", 10, age=300)
+        older = self.write("older.jpg", 10, age=200)
+        newest = self.write("newest.jpg", 10, age=100)
+
+        stats = sweep("uploaded", ttl=3600, max_bytes=15, batch_size=1, prune_grace=0)
+
+        self.assertEqual((stats.files, stats.bytes), (4, 40))
+        self.assertEqual((stats.expired, stats.evicted, stats.freed_bytes), (1, 2, 30))
+        self.assertFalse(expired.exists() or oldest.exists() or older.exists())
+        self.assertTrue(newest.exists())
+        self.assertFalse(expired.parent.exists())
+
+    def test_oldest_keeps_a_bounded_heap(self):
+        """Test that only the files needed to cover the excess are picked."""
+        files = [(float(mtime), 10, str(mtime)) for mtime in (5, 1, 4, 2, 3, 0)]
+
+        self.assertEqual(
+            [path for _, _, path in oldest(iter(files), 25)], ["0", "1", "2"]
+        )
+
+    def test_recent_empty_directories_are_kept(self):
+        """Test that a shard directory another writer just created survives."""
+        self.write("expired.jpg", 10, age=7200)
+        fresh = Path(MEDIA_ROOT) / "uploaded" / "ab" / "cd"
+        fresh.mkdir(parents=True)
+
+        sweep("uploaded", ttl=3600)
+        self.assertTrue(fresh.exists())
+
+        stale = time.time() - 600
+        for directory in (fresh, fresh.parent):
+            os.utime(directory, (stale, stale))
+        sweep("uploaded", ttl=3600)
+        self.assertFalse(fresh.parent.exists())
+
+    def test_dry_run_keeps_files(self):
+        """Test that a dry run only reports what would be deleted."""
+        expired = self.write("expired.jpg", 10, age=7200)
+
+        stats = sweep("uploaded", ttl=3600, dry_run=True)
+
+        self.assertEqual((stats.expired, stats.freed_bytes), (1, 10))
+        self.assertTrue(expired.exists())
+
+    def test_command_sweeps_configured_directories(self):
+        """Test that the command applies the configured limits."""
+        expired = self.write("expired.jpg", 10, age=7200)
+        kept = self.write("kept.jpg", 10, age=0)
+
+        output = StringIO()
+        call_command("sweep_media", stdout=output)
+
+        self.assertFalse(expired.exists())
+        self.assertTrue(kept.exists())
+        self.assertIn(
+            "uploaded: 2 files, 20 bytes. Deleted 1 expired", output.getvalue()
+        )
+
+    @override_settings(
+        CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+        FACE_DETECTION_ASYNC_VIEWS=False,
+        FACE_DETECTION_RESULT_CACHE={"ENABLED": False},
+        FACE_DETECTION_RENDER={"LAZY": True, "PERSIST": False},
+    )
+    def test_sharded_image_is_served_until_swept(self):
+        """Test that lazily rendered images are served from their shard and expire."""
+        cache.reset_result_cache()
+        rendering.reset_render_cache()
+        self.addCleanup(rendering.reset_render_cache)
+        response = self.client.post(
+            "/image", {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE)}
+        )
+        image_url = response.json()["image_url"]
+        self.assertRegex(image_url, r"/media/processed/[0-9a-f]{2}/[0-9a-f]{2}/faces_")
+
+        self.assertEqual(self.client.get(image_url).status_code, 200)
+
+        rendering.reset_render_cache()
+        sweep("uploaded", max_bytes=0)
+        self.assertEqual(self.client.get(image_url).status_code, 404)
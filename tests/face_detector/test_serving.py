@@ -0,0 +1,124 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import resolve
+
+from face_detection import settings_production
+from face_detector.serving import RequestLimit, bind_socket, preload
+
+
+class ServingTests(SimpleTestCase):
+    """Test cases for the pre-forking production server."""
+
+    def test_bind_socket(self):
+        """Test that the shared socket listens on the given address."""
+        with self.assertRaises(ValueError):
+            bind_socket("localhost")
+        sock = bind_socket("127.0.0.1:0")
+        self.addCleanup(sock.close)
+
+        self.assertEqual(sock.getsockname()[0], "127.0.0.1")
+        self.assertEqual(sock.getsockopt(socket.SOL_SOCKET, socket.SO_ACCEPTCONN), 1)
+
+    def test_request_limit(self):
+        """Test that the limit is reported once, counting HTTP requests only."""
+        calls = []
+
+        async def application(scope, receive, send):
+            pass
+
+        limited = RequestLimit(application, 2, lambda: calls.append(True))
+        for scope_type in ("http", "websocket", "http", "http"):
+            async_to_sync(limited)({"type": scope_type}, None, None)
+
+        self.assertEqual(limited.requests, 3)
+        self.assertEqual(calls, [True])
+
+    def test_preload_refuses_imported_reactor(self):
+        """Test that workers are not forked with a shared Twisted reactor."""
+        with patch.dict(sys.modules, {"twisted.internet.reactor": object()}):
+            with self.assertRaises(RuntimeError):
+                preload("face_detection.asgi.application")
+
+    def test_production_settings(self):
+        """Test that the production settings leave out unused apps and middleware."""
+        self.assertFalse(settings_production.DEBUG)
+        self.assertNotIn("daphne", settings_production.INSTALLED_APPS)
+        for middleware in settings_production.MIDDLEWARE:
+            self.assertNotRegex(middleware, "sessions|auth|messages")
+
+    @override_settings(
+        CHANNEL_LAYERS={
+            "default": {"BACKEND": "channels_redis.pubsub.RedisPubSubChannelLayer"}
+        },
+        FACE_DETECTION_JOBS={"BACKEND": "local"},
+    )
+    def test_serve_refuses_local_jobs_with_workers(self):
+        """Test that jobs kept in one worker's memory are not used with several."""
+        with self.assertRaisesMessage(CommandError, "local job backend"):
+            call_command("serve", "--workers", "2")
+
+    def test_production_serves_video_outputs(self):
+        """Test that video job outputs have a route without static media serving."""
+        self.assertEqual(settings_production.FACE_DETECTION_JOBS["BACKEND"], "redis")
+        match = resolve(f"/media/processed/ab/cd/video_{uuid.uuid4()}.jsonl")
+        self.assertEqual(match.url_name, "video_output")
+
+    def test_serve(self):
+        """Test that workers serve requests, are recycled and stop on SIGTERM."""
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "face_detection.settings_production",
+            "FACE_DETECTION_METRICS_DIR": tempfile.mkdtemp(),
+        }
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "manage.py",
+                "serve",
+                "--bind",
+                f"127.0.0.1:{port}",
+                "--workers",
+                "2",
+                "--max-requests",
+                "2",
+            ],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        self.addCleanup(server.kill)
+
+        statuses = []
+        deadline = time.monotonic() + 30
+        while len(statuses) < 6 and time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(
+                    f"http://127.0.0.1:{port}/metrics", timeout=5
+                ) as response:
+                    statuses.append(response.status)
+            except OSError:
+                time.sleep(0.2)
+        server.send_signal(signal.SIGTERM)
+        output, _ = server.communicate(timeout=30)
+
+        self.assertEqual(statuses, [200] * 6, output)
+        self.assertEqual(server.returncode, 0, output)
+        # Six requests with a limit of two per worker recycle at least one worker
+        self.assertIn("exited with 0", output)
+        self.assertTrue(output.rstrip().endswith("Stopped"), output)
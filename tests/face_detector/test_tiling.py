@@ -0,0 +1,107 @@
+import numpy as np
+from cv2 import imread
+from django.test import TestCase, override_settings
+
+from face_detector import registry, tiling
+from face_detector.benchmark import synthetic_image
+from face_detector.detector import FaceDetector
+from face_detector.tiling import non_max_suppression, split_tiles, uses_tiles
+
+FACE_PHOTO = imread("tests/face_detector/testdata/face1.jpg")
+
+
+class TilingTests(TestCase):
+    """Test cases for splitting images into tiles and merging their boxes."""
+
+    def test_tiles_cover_the_image_with_overlap(self):
+        """Test that tiles overlap and the last ones end at the image edge."""
+        tiles = split_tiles(1000, 500, tile_size=400, overlap=100)
+
+        self.assertEqual(sorted({x for x, _, _, _ in tiles}), [0, 300, 600])
+        self.assertEqual(sorted({y for _, y, _, _ in tiles}), [0, 100])
+        self.assertTrue(all(w == 400 and h == 400 for _, _, w, h in tiles))
+
+    def test_small_images_are_a_single_tile(self):
+        """Test that an image smaller than a tile is not split."""
+        self.assertEqual(split_tiles(300, 200, 400, 100), [(0, 0, 300, 200)])
+
+    def test_overlap_must_be_smaller_than_tiles(self):
+        """Test that a useless tiling is refused."""
+        with self.assertRaises(ValueError):
+            split_tiles(1000, 1000, 400, 400)
+
+    def test_nms_merges_seam_duplicates(self):
+        """Test that duplicates and partial boxes inside a face are dropped."""
+        boxes = [
+            [100, 100, 50, 50],
+            [102, 101, 49, 50],
+            [120, 100, 30, 50],
+            [300, 300, 40, 40],
+        ]
+
+        kept = non_max_suppression(boxes, threshold=0.5)
+
+        self.assertEqual(kept.tolist(), [[100, 100, 50, 50], [300, 300, 40, 40]])
+
+    @override_settings(
+        FACE_DETECTION_TILING={"ENABLED": True, "MIN_PIXELS": 1000, "TILE_SIZE": 512}
+    )
+    def test_fallback_for_small_images(self):
+        """Test that images under the thresholds use a single detection call."""
+        self.assertFalse(uses_tiles(20, 20))
+        self.assertFalse(uses_tiles(500, 500))
+        self.assertTrue(uses_tiles(1000, 600))
+        with self.settings(FACE_DETECTION_TILING={"ENABLED": False}):
+            self.assertFalse(uses_tiles(10000, 10000))
+
+    def test_tiling_is_opt_in(self):
+        """Test that large photos are not tiled by default."""
+        self.assertFalse(uses_tiles(6000, 4000))
+
+
+@override_settings(
+    FACE_DETECTION_PROFILES={"default": {"min_size": 30}},
+    FACE_DETECTION_DEFAULT_PROFILE="default",
+)
+class TiledDetectionTests(TestCase):
+    """Test cases for detecting faces tile by tile."""
+
+    def setUp(self):
+        registry.reset()
+        tiling.reset_tile_executor()
+        self.addCleanup(tiling.reset_tile_executor)
+
+    def detect(self, img, **config):
+        with self.settings(FACE_DETECTION_TILING=config):
+            tiling.reset_tile_executor()
+            return np.asarray(FaceDetector().detect_faces(img)).reshape(-1, 4)
+
+    def test_tiled_detection_matches_a_single_call(self):
+        """Test that tiling finds every face once, including faces on seams."""
+        img = synthetic_image(1600, 1200, 4, FACE_PHOTO)
+
+        single = self.detect(img, ENABLED=False)
+        tiled = self.detect(
+            img, ENABLED=True, MIN_PIXELS=0, TILE_SIZE=700, OVERLAP=300, WORKERS=3
+        )
+
+        self.assertEqual(len(single), 4)
+        self.assertEqual(len(tiled), 4)
+        for box in single:
+            distances = np.abs(tiled[:, :2] - box[:2]).sum(axis=1)
+            self.assertLess(distances.min(), 20)
+
+    def test_face_wider_than_the_overlap_on_a_seam(self):
+        """Test that a face cut by every tile is found by the full frame pass."""
+        img = synthetic_image(1600, 1200, 1, FACE_PHOTO)
+        ((x, y, w, h),) = self.detect(img)
+        # The first tile ends in the middle of the face, the second starts after
+        # its left edge, so no tile holds the whole face
+        tile_size = x + w // 2
+
+        tiled = self.detect(
+            img, ENABLED=True, MIN_PIXELS=0, TILE_SIZE=tile_size, OVERLAP=w // 4
+        )
+
+        distances = np.abs(tiled - [x, y, w, h]).sum(axis=1)
+        self.assertLess(distances.min(), 40)
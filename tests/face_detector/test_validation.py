@@ -0,0 +1,140 @@
+import io
+import struct
+import zlib
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from face_detector import cache
+from face_detector.batch import start_item
+from face_detector.registry import get_detector
+from face_detector.validation import (
+    UploadRejected,
+    get_magic,
+    image_dimensions,
+    inspect_image,
+)
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+def png_header(width: int, height: int) -> bytes:
+    """Build a PNG that declares the given size but carries no pixel data."""
+    chunks = b""
+    for kind, data in (
+        (b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        (b"IDAT", zlib.compress(b"")),
+        (b"IEND", b""),
+    ):
+        chunks += struct.pack(">I", len(data)) + kind + data
+        chunks += struct.pack(">I", zlib.crc32(kind + data))
+    return b"\x89PNG\r\n\x1a\n" + chunks
+
+
+class InspectImageTests(TestCase):
+    """Test cases for checking uploads before they are decoded."""
+
+    def test_magic_instance_is_reused(self):
+        """Test that the libmagic database is loaded once per process."""
+        self.assertIs(get_magic(), get_magic())
+
+    def test_dimensions_come_from_the_header(self):
+        """Test that the size is read without decoding the image."""
+        stream = io.BytesIO(png_header(640, 480))
+
+        self.assertEqual(image_dimensions(stream), (640, 480))
+        self.assertEqual(stream.tell(), 0)
+
+    def test_unreadable_headers_have_no_dimensions(self):
+        """Test that truncated images are left to the decoder to reject."""
+        self.assertIsNone(image_dimensions(io.BytesIO(FACE_IMAGE[:200])))
+
+    def test_accepted_image(self):
+        """Test that an image within the limits is described by its header."""
+        header = inspect_image(io.BytesIO(FACE_IMAGE), len(FACE_IMAGE))
+
+        self.assertEqual(
+            (header.content_type, header.width, header.height),
+            ("image/jpeg", 540, 360),
+        )
+
+    @override_settings(FACE_DETECTION_UPLOAD_LIMITS={"MAX_PIXELS": 1_000_000})
+    def test_too_many_pixels(self):
+        """Test that images declaring too many pixels are refused."""
+        content = png_header(2000, 1000)
+        with self.assertRaisesMessage(UploadRejected, "2000x1000") as raised:
+            inspect_image(io.BytesIO(content), len(content))
+        self.assertEqual(raised.exception.status, 413)
+
+    def test_decompression_bomb(self):
+        """Test that headers far beyond any sane size are refused."""
+        content = png_header(100_000, 100_000)
+        with self.assertRaises(UploadRejected) as raised:
+            inspect_image(io.BytesIO(content), len(content))
+        self.assertEqual(raised.exception.status, 413)
+
+    @override_settings(FACE_DETECTION_UPLOAD_LIMITS={"MAX_BYTES": 1000})
+    def test_too_many_bytes(self):
+        """Test that the size limit is checked before reading anything."""
+        stream = io.BytesIO(FACE_IMAGE)
+        with self.assertRaises(UploadRejected) as raised:
+            inspect_image(stream, len(FACE_IMAGE))
+        self.assertEqual(raised.exception.status, 413)
+        self.assertEqual(stream.tell(), 0)
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    FACE_DETECTION_ASYNC_VIEWS=False,
+    FACE_DETECTION_RESULT_CACHE={"ENABLED": False},
+)
+class UploadLimitTests(TestCase):
+    """Test cases for the limits applied by the upload endpoints."""
+
+    def setUp(self):
+        cache.reset_result_cache()
+
+    @patch("face_detector.views.detect_bytes")
+    def test_bomb_upload_is_refused_before_decoding(self, detect_bytes):
+        """Test that a decompression bomb never reaches the detector."""
+        response = self.client.post(
+            "/image",
+            {"image": SimpleUploadedFile("bomb.png", png_header(50_000, 50_000))},
+        )
+
+        self.assertEqual(response.status_code, 413)
+        detect_bytes.assert_not_called()
+
+    @override_settings(FACE_DETECTION_UPLOAD_LIMITS={"MAX_BYTES": 1000})
+    def test_oversized_body_is_refused(self):
+        """Test that bodies larger than the limit are refused from their length."""
+        response = self.client.post(
+            "/image", {"image": SimpleUploadedFile("big.jpg", b"x" * 100_000)}
+        )
+
+        self.assertEqual(response.status_code, 413)
+
+    def test_malformed_content_length(self):
+        """Test that a Content-Length that is not a number is a bad request."""
+        response = self.client.post(
+            "/image",
+            {"image": SimpleUploadedFile("face.jpg", b"x")},
+            CONTENT_LENGTH="many",
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(FACE_DETECTION_UPLOAD_LIMITS={"MAX_PIXELS": 1_000_000})
+    def test_batch_member_with_too_many_pixels(self):
+        """Test that batch members are checked against the pixel limit too."""
+        item = start_item(
+            get_detector(), "bomb.png", png_header(2000, 1000), "/media/"
+        )()
+
+        self.assertFalse(item["success"])
+        self.assertIn("exceeds", item["error"])
@@ -0,0 +1,159 @@
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from face_detector import jobs, registry
+from face_detector.video import BoxTracker, process_video
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+def write_test_video(path: Path, frames: int = 12, shift: int = 2) -> None:
+    """Write a clip of the face fixture panning to the right."""
+    image = cv2.imread("tests/face_detector/testdata/face1.jpg")
+    height, width = image.shape[:2]
+    writer = cv2.VideoWriter(
+        str(path), cv2.VideoWriter_fourcc(*"mp4v"), 10, (width, height)
+    )
+    for index in range(frames):
+        matrix = np.float32([[1, 0, index * shift], [0, 1, 0]])
+        writer.write(cv2.warpAffine(image, matrix, (width, height)))
+    writer.release()
+
+
+class ProcessVideoTests(TestCase):
+    """Test cases for frame by frame video processing."""
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.video_path = self.tmp_dir / "clip.mp4"
+        write_test_video(self.video_path)
+
+    def test_detects_on_keyframes_and_tracks_in_between(self):
+        """Test that detection runs every N frames and boxes follow the face."""
+        progress = []
+
+        summary = process_video(
+            registry.get_detector().detect_faces,
+            self.video_path,
+            self.tmp_dir / "out",
+            "clip",
+            detect_every=5,
+            annotate=True,
+            progress=lambda done, total: progress.append((done, total)),
+            progress_every=4,
+        )
+
+        self.assertEqual(summary["frames"], 12)
+        self.assertEqual(summary["keyframes"], 3)
+        self.assertEqual(summary["max_faces"], 1)
+        self.assertTrue((self.tmp_dir / "out" / summary["video"]).exists())
+        self.assertEqual(progress, [(4, 12), (8, 12), (12, 12), (12, 12)])
+
+        lines = (self.tmp_dir / "out" / summary["results"]).read_text().splitlines()
+        frames = [json.loads(line) for line in lines]
+        self.assertEqual([f["frame"] for f in frames if f["keyframe"]], [0, 5, 10])
+        first_x = frames[0]["boxes"][0][0]
+        tracked_x = frames[4]["boxes"][0][0]
+        self.assertAlmostEqual(tracked_x - first_x, 8, delta=3)
+
+    def test_unreadable_video(self):
+        """Test that files OpenCV cannot open are rejected."""
+        broken = self.tmp_dir / "broken.mp4"
+        broken.write_bytes(b"not a video")
+
+        with self.assertRaises(ValueError):
+            process_video(
+                registry.get_detector().detect_faces,
+                broken,
+                self.tmp_dir,
+                "broken",
+                detect_every=5,
+            )
+
+    def test_tracker_keeps_boxes_without_features(self):
+        """Test that boxes over flat areas stay where they were detected."""
+        gray = np.zeros((50, 50), dtype=np.uint8)
+        tracker = BoxTracker(gray, [[10, 10, 20, 20]])
+
+        self.assertEqual(tracker.update(gray), [[10, 10, 20, 20]])
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    FACE_DETECTION_JOBS={"BACKEND": "local", "WORKERS": 1},
+    FACE_DETECTION_VIDEO={"PROGRESS_EVERY": 100},
+)
+class UploadVideoTests(TestCase):
+    """Test cases for the video upload endpoint."""
+
+    def setUp(self):
+        jobs.reset_backend()
+        self.addCleanup(jobs.reset_backend)
+        tmp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        write_test_video(tmp_dir / "clip.mp4")
+        self.video = (tmp_dir / "clip.mp4").read_bytes()
+
+    def test_video_job_reports_results(self):
+        """Test that an uploaded clip is processed as a job with notifications."""
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_add)("faces", "test-channel")
+
+        response = self.client.post(
+            "/video",
+            {"video": SimpleUploadedFile("clip.mp4", self.video), "detect_every": "4"},
+        )
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        deadline = time.monotonic() + 30
+        while jobs.get_backend().get(job_id)["status"] not in (jobs.DONE, jobs.FAILED):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+        status = self.client.get(f"/jobs/{job_id}").json()
+        self.assertEqual(status["status"], jobs.DONE)
+        self.assertEqual(status["frames"], 12)
+        self.assertEqual(status["keyframes"], 3)
+        self.assertIsNone(status["video_url"])
+        results = self.client.get(urlparse(status["results_url"]).path)
+        self.assertEqual(results.status_code, 200)
+        self.assertEqual(len(b"".join(results.streaming_content).splitlines()), 12)
+
+        progress = async_to_sync(channel_layer.receive)("test-channel")
+        self.assertEqual(progress["type"], "face_detection_progress_notification")
+        result = async_to_sync(channel_layer.receive)("test-channel")
+        self.assertEqual(result["type"], "face_detection_video_notification")
+        payload = json.loads(result["text"])
+        self.assertEqual(payload["results_url"], status["results_url"])
+
+    def test_non_video_upload_is_rejected(self):
+        """Test that only video files are accepted."""
+        response = self.client.post(
+            "/video", {"video": SimpleUploadedFile("clip.mp4", b"plain text")}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_detect_every(self):
+        """Test that the keyframe interval must be positive."""
+        response = self.client.post(
+            "/video",
+            {"video": SimpleUploadedFile("clip.mp4", self.video), "detect_every": "0"},
+        )
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,154 @@
+import json
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+
+from face_detector import cache
+from face_detector.views import upload_image, upload_image_async
+
+FACE_IMAGE = Path("tests/face_detector/testdata/face1.jpg").read_bytes()
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    FACE_DETECTION_SAVE_UPLOADS=False,
+    FACE_DETECTION_RESULT_CACHE={"ENABLED": False},
+)
+class UploadImageViewTests(TestCase):
+    """Test cases for the sync and async upload views."""
+
+    def setUp(self):
+        cache.reset_result_cache()
+        self.factory = RequestFactory()
+        self.channel_layer = get_channel_layer()
+        async_to_sync(self.channel_layer.flush)()
+        async_to_sync(self.channel_layer.group_add)("faces", "test-channel")
+
+    def upload_request(self, content=FACE_IMAGE, name="face.jpg"):
+        return self.factory.post("/image", {"image": SimpleUploadedFile(name, content)})
+
+    def test_sync_view_detects_and_notifies(self):
+        """Test that the sync view returns the result and notifies clients."""
+        response = upload_image(self.upload_request())
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        message = async_to_sync(self.channel_layer.receive)("test-channel")
+        self.assertEqual(message["type"], "face_detection_notification")
+        payload = json.loads(message["text"])
+        self.assertEqual(payload["image_url"], data["image_url"])
+        self.assertEqual(payload["faces_detected"], data["faces_detected"])
+
+    def test_async_view_detects_and_notifies(self):
+        """Test that the async view returns the result and notifies in background."""
+
+        async def upload():
+            response = await upload_image_async(self.upload_request())
+            message = await self.channel_layer.receive("test-channel")
+            return response, message
+
+        response, message = async_to_sync(upload)()
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data["faces_detected"], 1)
+        self.assertEqual(json.loads(message["text"])["image_url"], data["image_url"])
+
+    def test_boxes_only_output(self):
+        """Test that boxes only uploads return the boxes without an image."""
+        request = self.factory.post(
+            "/image",
+            {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE), "output": "boxes"},
+        )
+
+        response = upload_image(request)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data["faces_detected"], 1)
+        self.assertEqual(len(data["boxes"][0]), 4)
+        self.assertNotIn("image_url", data)
+
+    def test_output_format(self):
+        """Test that the annotated image is encoded in the requested format."""
+        request = self.factory.post(
+            "/image",
+            {
+                "image": SimpleUploadedFile("face.jpg", FACE_IMAGE),
+                "format": "png",
+                "max_dimension": "200",
+            },
+        )
+
+        data = json.loads(upload_image(request).content)
+
+        self.assertTrue(data["image_url"].endswith(".png"))
+        self.assertEqual(len(data["boxes"]), 1)
+
+    def test_invalid_output_options(self):
+        """Test that invalid output options are rejected."""
+        for options in ({"output": "pdf"}, {"format": "gif"}, {"quality": "high"}):
+            with self.subTest(options=options):
+                request = self.factory.post(
+                    "/image",
+                    {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE), **options},
+                )
+                self.assertEqual(upload_image(request).status_code, 400)
+
+    def test_source_tag_routes_notification(self):
+        """Test that uploads with a source tag notify the source group."""
+        async_to_sync(self.channel_layer.group_add)("faces.source.cam-1", "cam-channel")
+        request = self.factory.post(
+            "/image",
+            {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE), "source": "cam-1"},
+        )
+
+        response = upload_image(request)
+
+        self.assertEqual(response.status_code, 200)
+        message = async_to_sync(self.channel_layer.receive)("cam-channel")
+        self.assertEqual(json.loads(message["text"])["source"], "cam-1")
+
+    def test_invalid_source_tag(self):
+        """Test that source tags unusable for routing are rejected."""
+        request = self.factory.post(
+            "/image",
+            {"image": SimpleUploadedFile("face.jpg", FACE_IMAGE), "source": "a b"},
+        )
+
+        self.assertEqual(upload_image(request).status_code, 400)
+
+    def test_detection_profile(self):
+        """Test that uploads pick a configured profile and unknown ones are rejected."""
+        for profile, status in (("fast", 200), ("accurate", 200), ("unknown", 400)):
+            with self.subTest(profile=profile):
+                request = self.factory.post(
+                    "/image",
+                    {
+                        "image": SimpleUploadedFile("face.jpg", FACE_IMAGE),
+                        "profile": profile,
+                    },
+                )
+                self.assertEqual(upload_image(request).status_code, status)
+
+    def test_async_view_rejects_non_images(self):
+        """Test that validation errors are returned by the async view."""
+        response = async_to_sync(upload_image_async)(
+            self.upload_request(b"plain text", "notes.txt")
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_view_reports_undecodable_images(self):
+        """Test that detection failures are mapped to error responses."""
+        response = async_to_sync(upload_image_async)(
+            self.upload_request(FACE_IMAGE[:200], "broken.jpg")
+        )
+
+        self.assertEqual(response.status_code, 500)